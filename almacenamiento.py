@@ -0,0 +1,489 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import streamlit as st
+
+import motor_plantillas
+
+
+# =====================================================
+# ALMACENAMIENTO DE DOCUMENTOS GENERADOS
+# =====================================================
+# Cada contenido se guarda una sola vez como blob con su SHA-256 por
+# nombre (blobs/ab/abcd...). Cada proceso tiene un manifiesto que
+# relaciona nombre de archivo -> huella, así que dos procesos (o dos
+# guardados) con el mismo documento comparten el blob.
+#
+# Backends, según ALMACENAMIENTO en secrets:
+#   "local" (por defecto): disco bajo procesos/ o DIR_ALMACENAMIENTO.
+#   "s3": cualquier servicio compatible con S3 (AWS, MinIO, etc.), que
+#         sobrevive a los redespliegues del contenedor.
+#
+# Cada entrada del manifiesto es un objeto propio,
+# <ID>/manifiesto/<nombre>.json, escrito de forma atómica. Así la página,
+# la cola de render, la conversión a PDF, los lotes y otras réplicas pueden
+# guardar documentos del mismo proceso a la vez sin leer y reescribir un
+# archivo compartido (antes se perdían entradas). El manifiesto.json de
+# una sola pieza del formato anterior se sigue leyendo; sus entradas ceden
+# ante las individuales.
+
+DIR_PROCESOS = os.path.join(motor_plantillas.BASE_DIR, "procesos")
+
+# Servidos por Streamlit con enableStaticServing (ver .streamlit/config.toml)
+DIR_ESTATICO = os.path.join(motor_plantillas.BASE_DIR, "static")
+DIR_EXPORTACIONES = os.path.join(DIR_ESTATICO, "exportaciones")
+VIGENCIA_ENLACE = 3600      # segundos que vale un enlace de descarga
+# Streamlit responde 404 en /app/static para archivos más grandes
+# (MAX_APP_STATIC_FILE_SIZE)
+LIMITE_ESTATICO = 200 * 1024 * 1024
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+CARPETA_MANIFIESTO = "manifiesto"
+TAM_BLOQUE = 1024 * 1024
+
+_PATRON_HUELLA = re.compile(rb"[0-9a-f]{64}")
+
+
+class ArchivoDemasiadoGrande(ValueError):
+
+    def __init__(self, nombre, tamano, limite):
+        self.nombre = nombre
+        self.tamano = tamano
+        self.limite = limite
+        super().__init__(
+            f"{nombre} pesa {tamano / 2 ** 20:,.0f} MB y el almacenamiento local solo puede "
+            f"entregar descargas de hasta {limite / 2 ** 20:,.0f} MB. Configure "
+            f"ALMACENAMIENTO = \"s3\" para descargar archivos más grandes."
+        )
+
+
+def huella(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _validar_nombre(nombre):
+    if not nombre or "/" in nombre or "\\" in nombre or nombre in (".", ".."):
+        raise ValueError(f"Nombre de archivo no válido: {nombre!r}")
+    return nombre
+
+
+def _clave_blob(huella_contenido):
+    return f"blobs/{huella_contenido[:2]}/{huella_contenido}"
+
+
+def _clave_derivado(huella_origen, extension):
+    return f"derivados/{extension}/{huella_origen[:2]}/{huella_origen}.{extension}"
+
+
+def _clave_manifiesto(id_proceso):
+    return f"{_validar_nombre(id_proceso)}/{NOMBRE_MANIFIESTO}"
+
+
+def _prefijo_entradas(id_proceso):
+    return f"{_validar_nombre(id_proceso)}/{CARPETA_MANIFIESTO}/"
+
+
+class Almacenamiento:
+    # Los backends implementan las operaciones por clave (_existe,
+    # _escribir, _leer, _leer_bloques, _claves, _borrar, _enlace,
+    # _publicar); la deduplicación y el manifiesto son comunes.
+    # limite_enlace: tamaño máximo que puede entregar un enlace (None: sin
+    # límite).
+
+    limite_enlace = None
+
+    def guardar_blob(self, contenido):
+        huella_contenido = huella(contenido)
+        clave = _clave_blob(huella_contenido)
+        if not self._existe(clave):
+            self._escribir(clave, contenido)
+        return huella_contenido
+
+    def manifiesto(self, id_proceso):
+        datos = self._leer(_clave_manifiesto(id_proceso))
+        manifiesto = json.loads(datos) if datos else {}
+
+        prefijo = _prefijo_entradas(id_proceso)
+        for clave in self._claves(prefijo):
+            if clave.endswith(".json"):
+                datos = self._leer(clave)
+                if datos:
+                    manifiesto[clave[len(prefijo):-len(".json")]] = json.loads(datos)
+        return manifiesto
+
+    def guardar_documento(self, id_proceso, nombre, contenido, origen=None):
+        # origen: huella del documento del que se derivó (el DOCX de un PDF)
+        _validar_nombre(nombre)
+        huella_contenido = self.guardar_blob(contenido)
+
+        entrada = {
+            "huella": huella_contenido,
+            "tamano": len(contenido),
+            "guardado_en": datetime.now(timezone.utc).isoformat(timespec="seconds")
+        }
+        if origen:
+            entrada["origen"] = origen
+        self._escribir(
+            f"{_prefijo_entradas(id_proceso)}{nombre}.json",
+            json.dumps(entrada, ensure_ascii=False, indent=1).encode("utf-8")
+        )
+
+        return huella_contenido
+
+    def leer_derivado(self, huella_origen, extension):
+        # Derivados (p. ej. el PDF de un DOCX) por la huella del original:
+        # el mismo contenido no se vuelve a convertir. El derivado guarda la
+        # huella de su blob; los anteriores guardaban el contenido completo.
+        datos = self._leer(_clave_derivado(huella_origen, extension))
+        if datos is None or not _PATRON_HUELLA.fullmatch(datos):
+            return datos
+        return self._leer(_clave_blob(datos.decode("ascii")))
+
+    def guardar_derivado(self, huella_origen, extension, contenido):
+        # El contenido queda una sola vez, como blob: guardarlo luego en el
+        # manifiesto de un proceso no lo duplica
+        huella_contenido = self.guardar_blob(contenido)
+        self._escribir(_clave_derivado(huella_origen, extension), huella_contenido.encode("ascii"))
+        return huella_contenido
+
+    def documentos(self, id_proceso):
+        # [(nombre, entrada_del_manifiesto)] en orden alfabético
+        return sorted(self.manifiesto(id_proceso).items())
+
+    def _entrada(self, id_proceso, nombre):
+        entrada = self.manifiesto(id_proceso).get(nombre)
+        if entrada is None:
+            raise FileNotFoundError(f"{id_proceso}/{nombre}")
+        return entrada
+
+    def iterar_documento(self, id_proceso, nombre, tam_bloque=TAM_BLOQUE):
+        entrada = self._entrada(id_proceso, nombre)
+        return self._leer_bloques(_clave_blob(entrada["huella"]), tam_bloque)
+
+    def purgar(self):
+        # Borra los blobs que ya no figuran en ningún manifiesto (versiones
+        # reemplazadas) y sus derivados. Llamar fuera de horario: un guardado en curso puede
+        # haber escrito su blob sin haber actualizado todavía el manifiesto.
+        usados = set()
+        for clave in self._claves(""):
+            partes = clave.split("/")
+            if len(partes) == 2 and partes[1] == NOMBRE_MANIFIESTO:
+                usados.update(
+                    entrada["huella"]
+                    for entrada in json.loads(self._leer(clave)).values()
+                )
+            elif len(partes) == 3 and partes[1] == CARPETA_MANIFIESTO and partes[2].endswith(".json"):
+                usados.add(json.loads(self._leer(clave))["huella"])
+
+        borrados = 0
+        for clave in [*self._claves("blobs/"), *self._claves("derivados/")]:
+            if clave.rsplit("/", 1)[-1].split(".")[0] not in usados:
+                self._borrar(clave)
+                borrados += 1
+
+        # Exportaciones publicadas en el almacenamiento (S3); sus enlaces
+        # vencen a la hora
+        for clave in list(self._claves("exportaciones/")):
+            self._borrar(clave)
+            borrados += 1
+        return borrados
+
+    def enlace_descarga(self, id_proceso, nombre):
+        # URL para que el navegador descargue el archivo directamente del
+        # almacenamiento, sin pasar los bytes por la sesión de Streamlit
+        entrada = self._entrada(id_proceso, nombre)
+        self._verificar_limite(nombre, entrada["tamano"])
+        return self._enlace(_clave_blob(entrada["huella"]), nombre)
+
+    def publicar_exportacion(self, ruta, nombre):
+        # Publica un archivo temporal (el ZIP de una exportación) y devuelve
+        # su URL de descarga; el temporal deja de pertenecer a quien llama
+        self._verificar_limite(nombre, os.path.getsize(ruta))
+        return self._publicar(ruta, nombre)
+
+    def _verificar_limite(self, nombre, tamano):
+        if self.limite_enlace is not None and tamano > self.limite_enlace:
+            raise ArchivoDemasiadoGrande(nombre, tamano, self.limite_enlace)
+
+
+# =====================================================
+# DISCO LOCAL
+# =====================================================
+
+def limpiar_exportaciones():
+    # Borra enlaces y exportaciones vencidos bajo static/exportaciones
+    limite = time.time() - VIGENCIA_ENLACE
+
+    for raiz, carpetas, archivos in os.walk(DIR_EXPORTACIONES, topdown=False):
+        for nombre in archivos:
+            ruta = os.path.join(raiz, nombre)
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        if raiz != DIR_EXPORTACIONES and not os.listdir(raiz):
+            os.rmdir(raiz)
+
+
+class AlmacenamientoLocal(Almacenamiento):
+    # Los enlaces son archivos bajo static/ con un nombre imposible de
+    # adivinar que vencen en VIGENCIA_ENLACE; el servidor de estáticos no
+    # verifica la sesión, así que para documentos sensibles conviene S3.
+
+    limite_enlace = LIMITE_ESTATICO
+
+    def __init__(self, raiz=DIR_PROCESOS):
+        self.raiz = raiz
+
+    def _ruta(self, clave):
+        return os.path.join(self.raiz, *clave.split("/"))
+
+    def _existe(self, clave):
+        return os.path.exists(self._ruta(clave))
+
+    def _escribir(self, clave, contenido):
+        # Temporal y renombrado: un lector nunca ve un archivo a medias
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        with open(temporal, "wb") as archivo:
+            archivo.write(contenido)
+
+        os.replace(temporal, ruta)
+
+    def _leer(self, clave):
+        try:
+            with open(self._ruta(clave), "rb") as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            return None
+
+    def _leer_bloques(self, clave, tam_bloque):
+        with open(self._ruta(clave), "rb") as archivo:
+            while True:
+                bloque = archivo.read(tam_bloque)
+                if not bloque:
+                    break
+                yield bloque
+
+    def _claves(self, prefijo):
+        base = self._ruta(prefijo) if prefijo else self.raiz
+        for raiz, carpetas, archivos in os.walk(base):
+            carpetas[:] = [c for c in carpetas if not c.startswith(".")]
+            for nombre in archivos:
+                if not nombre.endswith(".tmp"):
+                    ruta = os.path.relpath(os.path.join(raiz, nombre), self.raiz)
+                    yield ruta.replace(os.sep, "/")
+
+    def _borrar(self, clave):
+        os.remove(self._ruta(clave))
+
+    def _enlace(self, clave, nombre):
+        # Enlace duro del blob bajo static/ (sin copiar bytes); el servidor
+        # de estáticos lo entrega por trozos desde disco
+        limpiar_exportaciones()
+
+        token = secrets.token_urlsafe(16)
+        carpeta = os.path.join(DIR_EXPORTACIONES, token)
+        os.makedirs(carpeta, exist_ok=True)
+        destino = os.path.join(carpeta, nombre)
+
+        try:
+            os.link(self._ruta(clave), destino)
+        except OSError:
+            with open(destino, "wb") as archivo:
+                for bloque in self._leer_bloques(clave, TAM_BLOQUE):
+                    archivo.write(bloque)
+
+        # El enlace duro comparte la fecha del blob; se renueva para que la
+        # limpieza cuente la vigencia desde ahora
+        os.utime(destino)
+        return f"app/static/exportaciones/{token}/{nombre}"
+
+    def _publicar(self, ruta, nombre):
+        limpiar_exportaciones()
+
+        token = secrets.token_urlsafe(16)
+        carpeta = os.path.join(DIR_EXPORTACIONES, token)
+        os.makedirs(carpeta, exist_ok=True)
+        shutil.move(ruta, os.path.join(carpeta, nombre))
+        return f"app/static/exportaciones/{token}/{nombre}"
+
+
+# =====================================================
+# S3 Y COMPATIBLES
+# =====================================================
+# Un PUT de S3 es atómico (el objeto aparece completo o no aparece), así
+# que no hace falta temporal y renombrado. Solo se usan put_object,
+# get_object, head_object, list_objects_v2, delete_object y
+# generate_presigned_url, de modo que sirve cualquier cliente con esa
+# interfaz. Las descargas son URL prefirmadas que vencen, sin límite de
+# tamaño; conviene además una regla de ciclo de vida que borre
+# exportaciones/ a diario.
+
+class AlmacenamientoS3(Almacenamiento):
+
+    def __init__(self, bucket, prefijo="", cliente=None, **opciones_cliente):
+        if cliente is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("El almacenamiento S3 requiere el paquete boto3.")
+            cliente = boto3.client("s3", **opciones_cliente)
+
+        self.cliente = cliente
+        self.bucket = bucket
+        self.prefijo = f"{prefijo.strip('/')}/" if prefijo.strip("/") else ""
+
+    def _clave(self, clave):
+        return f"{self.prefijo}{clave}"
+
+    @staticmethod
+    def _no_existe(error):
+        codigo = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return codigo in ("404", "NoSuchKey", "NotFound")
+
+    def _existe(self, clave):
+        try:
+            self.cliente.head_object(Bucket=self.bucket, Key=self._clave(clave))
+            return True
+        except Exception as e:
+            if self._no_existe(e):
+                return False
+            raise
+
+    def _escribir(self, clave, contenido):
+        self.cliente.put_object(Bucket=self.bucket, Key=self._clave(clave), Body=contenido)
+
+    def _leer(self, clave):
+        try:
+            respuesta = self.cliente.get_object(Bucket=self.bucket, Key=self._clave(clave))
+        except Exception as e:
+            if self._no_existe(e):
+                return None
+            raise
+        return respuesta["Body"].read()
+
+    def _leer_bloques(self, clave, tam_bloque):
+        cuerpo = self.cliente.get_object(Bucket=self.bucket, Key=self._clave(clave))["Body"]
+        try:
+            yield from cuerpo.iter_chunks(tam_bloque)
+        finally:
+            cuerpo.close()
+
+    def _claves(self, prefijo):
+        parametros = {"Bucket": self.bucket, "Prefix": self._clave(prefijo)}
+        while True:
+            respuesta = self.cliente.list_objects_v2(**parametros)
+            for objeto in respuesta.get("Contents", []):
+                yield objeto["Key"][len(self.prefijo):]
+            if not respuesta.get("IsTruncated"):
+                break
+            parametros["ContinuationToken"] = respuesta["NextContinuationToken"]
+
+    def _borrar(self, clave):
+        self.cliente.delete_object(Bucket=self.bucket, Key=self._clave(clave))
+
+    def _publicar(self, ruta, nombre):
+        # put_object lee el archivo por partes; no pasa por memoria
+        clave = f"exportaciones/{secrets.token_urlsafe(16)}/{nombre}"
+        with open(ruta, "rb") as archivo:
+            self.cliente.put_object(Bucket=self.bucket, Key=self._clave(clave), Body=archivo)
+        os.remove(ruta)
+        return self._enlace(clave, nombre)
+
+    def _enlace(self, clave, nombre):
+        # URL prefirmada: el navegador descarga directo del bucket
+        return self.cliente.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._clave(clave),
+                "ResponseContentDisposition": f'attachment; filename="{nombre}"'
+            },
+            ExpiresIn=VIGENCIA_ENLACE
+        )
+
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+@st.cache_resource
+def obtener_almacenamiento():
+    if st.secrets.get("ALMACENAMIENTO", "local") == "s3":
+        return AlmacenamientoS3(
+            st.secrets["S3_BUCKET"],
+            st.secrets.get("S3_PREFIJO", ""),
+            endpoint_url=st.secrets.get("S3_ENDPOINT_URL"),
+            region_name=st.secrets.get("S3_REGION"),
+            aws_access_key_id=st.secrets.get("S3_ACCESS_KEY_ID"),
+            aws_secret_access_key=st.secrets.get("S3_SECRET_ACCESS_KEY")
+        )
+
+    return AlmacenamientoLocal(st.secrets.get("DIR_ALMACENAMIENTO", DIR_PROCESOS))
+
+
+@st.cache_data(ttl=VIGENCIA_ENLACE // 2, show_spinner=False)
+def enlace_documento(id_proceso, nombre, huella_contenido):
+    # Un enlace por versión del documento (la huella va en la llave) y se
+    # renueva antes de que venza
+    return obtener_almacenamiento().enlace_descarga(id_proceso, nombre)
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+# python almacenamiento.py migrar
+# python almacenamiento.py purgar
+#
+# migrar sube al almacenamiento configurado los archivos que quedaron
+# sueltos en procesos/<ID>/ antes de existir los manifiestos; purgar borra
+# los blobs sin referencia.
+
+def migrar_carpetas(raiz=DIR_PROCESOS, almacenamiento=None):
+    almacenamiento = almacenamiento or obtener_almacenamiento()
+    migrados = 0
+
+    for id_proceso in sorted(os.listdir(raiz)):
+        carpeta = os.path.join(raiz, id_proceso)
+        if id_proceso.startswith(".") or id_proceso == "blobs" or not os.path.isdir(carpeta):
+            continue
+
+        for nombre in sorted(os.listdir(carpeta)):
+            ruta = os.path.join(carpeta, nombre)
+            if nombre == NOMBRE_MANIFIESTO or nombre.endswith(".tmp") or not os.path.isfile(ruta):
+                continue
+
+            with open(ruta, "rb") as archivo:
+                almacenamiento.guardar_documento(id_proceso, nombre, archivo.read())
+
+            if isinstance(almacenamiento, AlmacenamientoLocal) and almacenamiento.raiz == raiz:
+                os.remove(ruta)
+            migrados += 1
+
+    return migrados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Administra el almacenamiento de documentos.")
+    parser.add_argument("accion", choices=["migrar", "purgar"])
+    args = parser.parse_args(argv)
+
+    if args.accion == "migrar":
+        print(f"{migrar_carpetas()} archivos migrados")
+    else:
+        print(f"{obtener_almacenamiento().purgar()} blobs sin referencia borrados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,42 @@
 import streamlit as st
 from datetime import date
-from num2words import num2words
-from database import conectar_db
-from convertir_rubros import datos_rubros
-from actividades_planeacion import actividades_planeacion
+from database import (
+    estadisticas_pool,
+    estadisticas_consultas,
+    reiniciar_estadisticas_consultas,
+    reiniciar_contador_consultas,
+    consultas_en_rerun
+)
+from estado_proceso import (
+    LLAVES_FORMULARIO,
+    cargar_estado_proceso,
+    cargar_manifiesto,
+    formulario_proceso,
+    invalidar_estado_proceso
+)
+from consecutivos import reservar_id
+import motor_plantillas
+import generacion_lote
+import exportacion_zip
+import almacenamiento
+import conversion_pdf
+import repositorio
+import migraciones
+import listado_procesos
+import busqueda
+import medicion
+import reportes
+import ejecucion_presupuestal
+import cola_render
+import instantaneas
+import catalogo
+from letras import valor_en_letras
+from moneda import formatear_moneda, leer_monto
+from estructura_presupuestal import estructura_presupuestal
 
 # IMPORTS PARA GENERAR Y GUARDAR ARCHIVOS
-import os
+import time
 import io
-from docxtpl import DocxTemplate
 
 
 # =====================================================
@@ -20,6 +48,20 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+reiniciar_contador_consultas()
+INICIO_SCRIPT = time.perf_counter()
+
+# Las migraciones corren en el despliegue (python migraciones.py aplicar);
+# aquí solo se verifica que la base esté al día
+try:
+    migraciones.asegurar_esquema()
+except migraciones.EsquemaDesactualizado as e:
+    st.error(str(e))
+    st.stop()
+
+# Hilos de la cola de render (se inician una sola vez por proceso)
+cola_render.iniciar_trabajadores()
+
 # =====================================================
 # ESTILOS CORPORATIVOS
 # =====================================================
@@ -93,222 +135,22 @@ with st.sidebar:
 # FUNCIONES BASE
 # =====================================================
 
-from docxtpl import DocxTemplate
-import io
-
-def generar_id():
-    conn = conectar_db()
-    cursor = conn.cursor()
-    year = date.today().year
+def cargar_proceso(id_proceso):
+    # Deja en session_state los valores guardados de las tres etapas; lo
+    # que traía la sesión de otro proceso se descarta
+    for llave in LLAVES_FORMULARIO:
+        st.session_state.pop(llave, None)
 
-    cursor.execute(
-        "SELECT COUNT(*) FROM procesos WHERE id_proceso LIKE %s",
-        (f"%-{year}",)
-    )
-
-    total = cursor.fetchone()[0]
-    conn.close()
-    return f"{total+1:03d}-{year}"
+    st.session_state.update(formulario_proceso(id_proceso))
+    st.session_state.ID_PROCESO = id_proceso
+    st.session_state.etapa_actual = "1 Estudio Previo"
+    st.session_state.pagina = "Inicio"
 
 
 def proceso_existe(id_proceso):
-    conn = conectar_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT 1 FROM procesos WHERE id_proceso = %s",
-        (id_proceso,)
-    )
-    existe = cursor.fetchone()
-    conn.close()
-    return existe is not None
-
-
-def valor_en_letras(valor):
-    if valor == 0:
-        return ""
-    texto = num2words(valor, lang="es")
-    texto = texto.replace("uno", "un")
-    return texto.upper() + " DE PESOS M/CTE"
-
-
-def procesar_moneda(key):
-    valor_texto = st.session_state.get(key, "")
-    limpio = valor_texto.replace("$", "").replace(",", "").strip()
-
-    if limpio.isdigit():
-        numero = int(limpio)
-        formateado = f"$ {numero:,.0f}"
-        return numero, formateado
-
-    return 0, ""
-
-
-# =====================================================
-# ESTRUCTURA PRESUPUESTAL GLOBAL
-# =====================================================
-
-estructura_presupuestal = {
-
-    "4100": {
-        "nombre": "REGISTROS PUBLICOS",
-        "programas": {
-            "4100-4110": "FUNCIONAMIENTO SISTEMAS",
-            "4100-4111": "BRIGADAS DE REGISTRO",
-            "4100-4112": "COSTUBRE MERCANTIL",
-            "4100-4113": "BRIGADA DE REGISTRO DE PROPONENTES",
-            "4100-4114": "JORNADAS DE RENOVACIONES",
-            "4100-4115": "CONFERENCIAS TALLER",
-            "4100-4116": "REVISORIA FISCAL",
-            "4100-4117": "PARTE TECNICA PROYECTO RUE",
-            "4100-4118": "PROYECTO COMUNICACIONES",
-            "4100-4119": "OTRAS NECESIDADES DE SISTEMAS",
-            "4100-4120": "NOMINA",
-            "4100-4121": "FUNCIONAMIENTO FACA",
-            "4100-4122": "FUNCIONAMIENTO FUNZA",
-            "4100-4123": "FUNCIONAMIENTO VILLETA",
-            "4100-4124": "FUNCIONAMIENTO PACHO",
-            "4100-4125": "FUNCIONAMIENTO GENERAL",
-            "4100-4126": "LISTA CONTRALORES Y PERITOS"
-        }
-    },
-
-    "4120": {"nombre": "NOMINA JURIDICA", "programas": {}},
-
-    "4200": {
-        "nombre": "MASC - METODOS ALTERNATIVOS DE SOLUCION",
-        "programas": {
-            "4200-4210": "CURSO FORMACION DE CONCILIADORES",
-            "4200-4211": "EDUCACION CONTINUADA",
-            "4200-4212": "SERVICIO SOCIAL DEL CENTRO DE CONCILIACION",
-            "4200-4213": "PLEGABLES INFORMATIVOS",
-            "4200-4214": "SEMINARIO TALLER CAPACITACION",
-            "4200-4215": "JORNADA CONCILIACION ESCOLAR",
-            "4200-4216": "NOMINA",
-            "4200-4217": "FUNCIONAMIENTO MASC",
-            "4200-4218": "SERVICIO DE CONCILIACION Y ARBITRAJE",
-            "4200-4220": "INVESTIGACION",
-            "4200-4221": "CURSO DE FORMACION DE CONCILIADORES PRIV"
-        }
-    },
-
-    "4201": {"nombre": "METODOS ALTERNATIVO SOL Y CON", "programas": {}},
-
-    "4300": {
-        "nombre": "CIVICOS, SOCIALES Y CULTURALES",
-        "programas": {
-            "4300-4310": "DESARROLLO CULTURAL, DEPORTIVO Y SOCIAL",
-            "4300-4311": "PROMOCION A LA GESTION CIVICA SOCIAL",
-            "4300-4312": "ACTIVIDADES CULTURALES DEPORTIVAS",
-            "4300-4313": "NOMINA",
-            "4300-4314": "FUNCIONAMIENTO",
-            "4300-4317": "CONSTRUYENDO FUTURO",
-            "4300-4320": "CONSULTORIO JURIDICO",
-            "4300-4321": "ELECCION DE GREMIOS"
-        }
-    },
-
-    "4400": {
-        "nombre": "MEJORAMIENTO DEL ENTORNO",
-        "programas": {
-            "4400-4410": "VEEDURIAS",
-            "4400-4411": "CENSO",
-            "4400-4412": "NOMINA",
-            "4400-4413": "FUNCIONAMIENTO",
-            "4400-4414": "ESTUDIOS E INVESTIGACIONES",
-            "4400-4415": "MEJORAMIENTO Y CONSERVACION DEL MEDIO",
-            "4400-4416": "SEGURIDAD, CONVIVENCIA Y PROMOCION CIUDADANA",
-            "4400-4417": "GESTION Y FORTALECIMIENTO A LA COMPETITIVIDAD EMPRESARIAL",
-            "4400-4418": "PROGRAMA DE INTERNACIONALIZACION",
-            "4400-4420": "VEEDURIAS CIUDADANAS"
-        }
-    },
-
-    "4500": {
-        "nombre": "DESARROLLO EMPRESARIAL",
-        "programas": {
-            "4500-4510": "FERIAS, RUEDAS Y EVENTOS",
-            "4500-4511": "FERIAS CAMARA DE FACATATIVA",
-            "4500-4512": "OBLIGACIONES TRIBUTARIAS",
-            "4500-4513": "CAPACITACION",
-            "4500-4514": "LUSTRABOTAS",
-            "4500-4515": "PANADEROS",
-            "4500-4516": "SALONES DE BELLEZA",
-            "4500-4517": "FORTALECIMIENTO SECTOR TURISTICO",
-            "4500-4518": "PROYECTO AGRO ECO TURISTICO",
-            "4500-4519": "MEGA PROYECTO INDUSTRIAL",
-            "4500-4520": "RUEDA DE NEGOCIOS",
-            "4500-4521": "APORTES Y CONTRIBUCIONES",
-            "4500-4522": "CARTILLA INFORMATIVA",
-            "4500-4523": "SEGUNDA EMISION CARTILLA TENDERO",
-            "4500-4524": "SUSCRIPCION CONVENIOS",
-            "4500-4525": "CENTRO DE ATENCION EMPRESARIAL",
-            "4500-4526": "NOMINA",
-            "4500-4527": "FUNCIONAMIENTO",
-            "4500-4528": "PROMOCION Y APOYO EMPRENDIMIENTO",
-            "4500-4529": "APOYO DESARROLLO AGROINDUSTRIAL",
-            "4500-4530": "GESTION DE PROYECTOS",
-            "4500-4531": "PROGRAMA DE INNOVACION",
-            "4500-4532": "NOMINA GESTION PROYECTOS"
-        }
-    },
-
-    "4600": {
-        "nombre": "PROMOCION DEL COMERCIO",
-        "programas": {
-            "4600-4609": "FERIAS, RUEDAS, MISIONES Y ENCUENTROS",
-            "4600-4610": "CAMPANAS COMERCIALES",
-            "4600-4611": "NOMINA",
-            "4600-4612": "FUNCIONAMIENTO"
-        }
-    },
-
-    "4700": {
-        "nombre": "GESTION ESTRATEGICA",
-        "programas": {
-            "4700-4704": "FUNCIONAMIENTO CONTROL INTERNO",
-            "4700-4705": "GESTION DE CALIDAD",
-            "4700-4707": "CONTROL INTERNO",
-            "4700-4708": "PLANEACION INSTITUCIONAL",
-            "4700-4709": "GESTION DOCUMENTAL",
-            "4700-4710": "PROMOCION INSTITUCIONAL E IMAGEN CORPORATIVA",
-            "4700-4711": "CAMPANA AFILIACION MTTO Y EVENTOS AFILIADOS",
-            "4700-4712": "ELABORACION DE CREDENCIALES",
-            "4700-4713": "ELABORACION PORTAFOLIO AFILIADOS",
-            "4700-4714": "NOMINA",
-            "4700-4715": "FUNCIONAMIENTO PRESIDENCIA EJECUTIVA",
-            "4700-4716": "FUNCIONAMIENTO JUNTA DIRECTIVA PUBLICO",
-            "4700-4720": "FORMACION EMPRESARIAL",
-            "4700-4721": "HOJAS VERDES",
-            "4700-4726": "FUNCIONAMIENTO JUNTA DIRECTIVA PRIVADO"
-        }
-    },
-
-    "4800": {
-        "nombre": "GESTION ADMINISTRATIVA",
-        "programas": {
-            "4800-4806": "NOMINA APRENDIZ SENA",
-            "4800-4807": "FUNCIONAMIENTO TALENTO HUMANO",
-            "4800-4809": "GESTION DEL TALENTO HUMANO",
-            "4800-4810": "NOMINA",
-            "4800-4811": "FUNCIONAMIENTO GENERAL PUBLICO",
-            "4800-4812": "FUNCIONAMIENTO FUNZA",
-            "4800-4813": "FUNCIONAMIENTO VILLETA",
-            "4800-4814": "FUNCIONAMIENTO PACHO",
-            "4800-4815": "JURIDICA",
-            "4800-4816": "GESTION INFRAESTRUCTURA FISICA",
-            "4800-4821": "FUNCIONAMIENTO GENERAL PRIVADO",
-            "4800-4890": "INVERSION PUBLICA",
-            "4800-4892": "INVERSION PRIVADA"
-        }
-    },
-
-    "9999": {
-        "nombre": "OTROS",
-        "programas": {
-            "9999-9999": "OTROS NO CODIFICADOS"
-        }
-    }
-}
+    if not id_proceso:
+        return False
+    return cargar_estado_proceso(id_proceso)["proceso"] is not None
 
 
 # =====================================================
@@ -317,170 +159,71 @@ estructura_presupuestal = {
 
 def generar_estudio_previo_docxtpl(contexto):
 
-    doc = DocxTemplate("plantillas/estudio_previo.docx")
-    doc.render(contexto)
-
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-
-    return buffer
-
-
-# =====================================================
-# CONTROL DE ID, ESTADOS Y NAVEGACIÓN
-# =====================================================
-
-# ---------------------------------------------
-# ID DEL PROCESO
-# ---------------------------------------------
-if "ID_PROCESO" not in st.session_state:
-    st.session_state.ID_PROCESO = generar_id()
-
-ID = st.session_state.ID_PROCESO
-
-
-# ---------------------------------------------
-# CONTROL DE ETAPA
-# ---------------------------------------------
-if "etapa_actual" not in st.session_state:
-    st.session_state.etapa_actual = "1 Estudio Previo"
-
-
-# ---------------------------------------------
-# CONTROL CONFIRMACIÓN
-# ---------------------------------------------
-if "confirmar_generacion" not in st.session_state:
-    st.session_state.confirmar_generacion = False
-
-
-# ---------------------------------------------
-# CONTROL DE PÁGINA (NUEVO — PARA SIDEBAR)
-# ---------------------------------------------
-if "pagina" not in st.session_state:
-    st.session_state.pagina = "Inicio"
-
-# =====================================================
-# MÓDULO PROCESOS (ANTES DE LAS ETAPAS)
-# =====================================================
-
-if st.session_state.pagina == "Proceso":
-
-    st.title("📁 PROCESOS REGISTRADOS")
-
-    try:
-        conn = conectar_db()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT id_proceso, fecha_estudio
-            FROM procesos
-            ORDER BY fecha_estudio DESC
-        """)
-
-        registros = cursor.fetchall()
-        conn.close()
-
-        if registros:
-
-            opciones = {
-                f"{r[0]} - {r[1]}": r[0]
-                for r in registros
-            }
-
-            seleccion = st.selectbox(
-                "Seleccione un proceso",
-                list(opciones.keys())
-            )
-
-            if st.button("CARGAR PROCESO"):
-                st.session_state.ID_PROCESO = opciones[seleccion]
-                st.session_state.etapa_actual = "1 Estudio Previo"
-                st.session_state.pagina = "Inicio"
-                st.rerun()
-
-        else:
-            st.info("No existen procesos registrados.")
-
-    except Exception as e:
-        st.error(f"Error consultando procesos: {e}")
-
-    # 🔴 MUY IMPORTANTE
-    st.stop()
-
-
-# =====================================================
-# NAVEGACIÓN ETAPAS (SOLO EN MÓDULO INICIO)
-# =====================================================
-
-if st.session_state.pagina == "Inicio":
-
-    etapas_lista = [
-        "1 Estudio Previo",
-        "2 Planeación",
-        "3 Contratación",
-        "4 Ejecución"
-    ]
-
-    etapa = st.radio(
-        "",
-        etapas_lista,
-        horizontal=True,
-        index=etapas_lista.index(st.session_state.etapa_actual),
-        key="radio_etapas"
+    return io.BytesIO(
+        motor_plantillas.renderizar("estudio_previo", contexto, estricto=True)
     )
 
-    # Mantener sincronizado el estado
-    st.session_state.etapa_actual = etapa
-
-    st.markdown(
-        f"""
-        <div class="banner-id">
-        ID_PROCESO generado automáticamente: {ID}
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
 
 # =====================================================
-# ETAPA 1 — ESTUDIO PREVIO
+# SECCIONES ETAPA 1 (FRAGMENTOS)
 # =====================================================
-if (
-    st.session_state.etapa_actual == "1 Estudio Previo"
-    and st.session_state.pagina == "Inicio"
-):
+# Cada sección es un st.fragment: interactuar con uno de sus widgets solo
+# vuelve a ejecutar esa sección, no todo el script. Los valores se leen
+# luego desde st.session_state por la clave de cada widget.
+
+OPCIONES_GARANTIAS = {
+    "Anticipo": "1. Anticipo: Buen manejo y correcta inversión del 100%.",
+    "Cumplimiento": "2. Cumplimiento: 20% del valor del contrato.",
+    "Salarios y Prestaciones": "3. Salarios y Prestaciones: 15% del contrato.",
+    "Responsabilidad Civil Extracontractual": "4. RCE: 200 SMLMV.",
+    "Estabilidad de la Obra": "5. Estabilidad: 20% por 5 años.",
+    "Calidad del Servicio": "6. Calidad del Servicio: 30% con vigencia adicional."
+}
 
-    proceso_ya_guardado = proceso_existe(ID)
+MESES = [
+    "Enero", "Febrero", "Marzo", "Abril",
+    "Mayo", "Junio", "Julio", "Agosto",
+    "Septiembre", "Octubre", "Noviembre", "Diciembre"
+]
 
-    st.markdown("### ETAPA 1 — ESTUDIO PREVIO")
 
-      # =====================================================
-    # CAMPOS PRINCIPALES (ANCHO COMPLETO)
-    # =====================================================
+@st.fragment
+@medicion.cronometrar("Etapa 1 — texto")
+def seccion_texto():
 
-    objeto = st.text_area(
+    st.text_area(
         "2. DESCRIPCIÓN DEL OBJETO A CONTRATAR, CON SUS ESPECIFICACIONES",
         height=200,
         placeholder="Describa el objeto contractual",
         key="objeto"
     )
 
-    justificacion = st.text_area(
+    st.text_area(
         "JUSTIFICACIÓN",
         height=200,
         placeholder="Fundamente técnica, jurídica y financieramente el proceso",
         key="justificacion"
     )
 
-    necesidad = st.text_area(
+    st.text_area(
         "1. DESCRIPCIÓN DE LA NECESIDAD QUE LA ENTIDAD PRETENDE SATISFACER CON LA CONTRATACIÓN",
         height=220,
         placeholder="Describa la necesidad que se pretende satisfacer",
         key="necesidad"
     )
-    # =====================================================
-    # BLOQUE ECONÓMICO
-    # =====================================================
+
+    # El objeto se repite en la sección 2.1 (fuera de este fragmento): solo
+    # cuando cambia se vuelve a ejecutar la página completa.
+    objeto = st.session_state.get("objeto", "")
+    if st.session_state.get("objeto_reflejado", objeto) != objeto:
+        st.session_state.objeto_reflejado = objeto
+        st.rerun(scope="app")
+    st.session_state.objeto_reflejado = objeto
+
+
+@st.fragment
+@medicion.cronometrar("Etapa 1 — económico")
+def seccion_economica():
 
     st.markdown("### INFORMACIÓN ECONÓMICA Y PLAZO")
 
@@ -490,27 +233,36 @@ if (
         st.text_input(
             "VALOR ($)",
             key="valor_ep",
-            placeholder="Ej: 25,000,000"
+            placeholder="Ej: 25.000.000"
         )
 
-        valor, _ = procesar_moneda("valor_ep")
+        valor, _ = leer_monto(st.session_state.get("valor_ep"))
 
         if valor > 0:
             st.success(valor_en_letras(valor))
 
     with col2:
-        plazo = st.number_input("PLAZO", min_value=1, value=1)
+        st.number_input("PLAZO", min_value=1, key="plazo")
 
     with col3:
-        unidad_plazo = st.selectbox("UNIDAD", ["Días", "Meses"])
+        st.selectbox("UNIDAD", ["Días", "Meses"], key="unidad_plazo")
 
-    fecha_estudio = st.date_input("FECHA ESTUDIO", value=date.today())
+    st.date_input("FECHA ESTUDIO", key="fecha_estudio")
 
-    st.markdown("---")
+    # El saldo del rubro y su aviso (sección presupuestal, otro fragmento)
+    # dependen del valor y de la vigencia: solo cuando cambian se vuelve a
+    # ejecutar la página completa.
+    fecha = st.session_state.get("fecha_estudio")
+    reflejo = (valor, fecha.year if fecha else None)
+    if st.session_state.get("economico_reflejado", reflejo) != reflejo:
+        st.session_state.economico_reflejado = reflejo
+        st.rerun(scope="app")
+    st.session_state.economico_reflejado = reflejo
 
-    # =====================================================
-    # TIPO DE PRESUPUESTO
-    # =====================================================
+
+@st.fragment
+@medicion.cronometrar("Etapa 1 — presupuestal")
+def seccion_presupuestal():
 
     st.markdown("### PRESUPUESTO")
 
@@ -522,54 +274,43 @@ if (
     )
 
     st.markdown("---")
-    # =====================================================
-    # INFORMACIÓN PRESUPUESTAL (COMPLETA Y CONSOLIDADA)
-    # =====================================================
 
-    
-    
     # ===================== FILA 1 =====================
     col1, col2 = st.columns(2)
-    
+
     with col1:
         centro_label = st.selectbox(
             "CENTRO DE COSTOS",
-            [f"{c} - {d['nombre']}" for c, d in estructura_presupuestal.items()],
+            catalogo.ETIQUETAS_CENTROS,
             key="centro_costos_select"
         )
         centro_codigo = centro_label.split(" - ")[0]
-    
+
     with col2:
-        programas = estructura_presupuestal[centro_codigo]["programas"]
-    
+        programas = catalogo.programas_de_centro(centro_codigo)
+
         if programas:
             programa_label = st.selectbox(
                 "PROGRAMA",
-                [f"{c} - {n}" for c, n in programas.items()],
+                programas,
                 key="programa_select"
             )
             programa_codigo = programa_label.split(" - ")[0]
         else:
-            programa_label = None
             programa_codigo = None
             st.selectbox("PROGRAMA", ["NO APLICA"], disabled=True)
-    
-    
+
     # ===================== FILA 2 =====================
     col3, col4 = st.columns(2)
-    
+
     # ===================== COLUMNA 4 — RUBRO =====================
     with col4:
-    
+
         if programa_codigo:
-    
-            # Filtrar rubros según programa seleccionado
-            rubros_filtrados = [
-                f"{rubro} - {descripcion}"
-                for prog, rubro, descripcion in datos_rubros
-                if prog == programa_codigo
-            ]
-    
+
+            # Rubros del programa seleccionado (índice precalculado)
+            rubros_filtrados = catalogo.rubros_de_programa(programa_codigo)
+
             if rubros_filtrados:
                 rubro_label = st.selectbox(
                     "RUBRO",
@@ -578,36 +319,33 @@ if (
                 )
                 rubro_codigo = rubro_label.split(" - ")[0]
             else:
-                rubro_label = None
                 rubro_codigo = None
                 st.selectbox(
                     "RUBRO",
                     ["No hay rubros disponibles para este programa"],
                     disabled=True
                 )
-    
+
         else:
-            rubro_label = None
             rubro_codigo = None
             st.selectbox(
                 "RUBRO",
                 ["Seleccione primero un programa"],
                 disabled=True
             )
-    
+
     # ===================== COLUMNA 3 — ACTIVIDAD =====================
     with col3:
 
         if presupuesto_tipo == "INVERSIÓN" and programa_codigo and rubro_codigo:
 
-            actividades_filtradas = [
-                f"{codigo} - {descripcion}"
-                for prog, rub, codigo, descripcion in actividades_planeacion
-                if prog == programa_codigo and rub == rubro_codigo
-            ]
+            actividades_filtradas = catalogo.actividades_de(
+                programa_codigo,
+                rubro_codigo
+            )
 
             if actividades_filtradas:
-                actividad_planeacion = st.selectbox(
+                st.selectbox(
                     "ACTIVIDAD DE PLANEACIÓN",
                     actividades_filtradas,
                     key="actividad_planeacion"
@@ -626,15 +364,42 @@ if (
                 disabled=True
             )
 
-    # =====================================================
-    # SEPARADOR VISUAL
-    # =====================================================
+    # ===================== SALDO DEL RUBRO =====================
+    if programa_codigo and rubro_codigo:
+        try:
+            vigencia = st.session_state.get("fecha_estudio", date.today()).year
+            saldo = ejecucion_presupuestal.saldo_rubro(
+                vigencia,
+                centro_codigo,
+                programa_codigo,
+                rubro_codigo
+            )
 
-    st.divider()
+            texto_saldo = f"Comprometido en {vigencia}: {formatear_moneda(saldo['comprometido'])}"
+            if saldo["disponible"] is not None:
+                texto_saldo += f" · Disponible: {formatear_moneda(saldo['disponible'])}"
+
+            st.caption(texto_saldo)
+
+            # Un proceso ya guardado libera su compromiso anterior al
+            # guardar, así que el aviso solo es exacto para uno nuevo
+            valor, _ = leer_monto(st.session_state.get("valor_ep"))
+            if (
+                saldo["disponible"] is not None
+                and not st.session_state.get("ID_PROCESO")
+                and valor > saldo["disponible"]
+            ):
+                st.warning(
+                    "El valor supera el disponible del rubro; el estudio previo no se podrá guardar."
+                )
 
-    # =====================================================
-    # 2. DESCRIPCIÓN DEL OBJETO (ANCHO COMPLETO)
-    # =====================================================
+        except Exception as e:
+            st.caption(f"Saldo del rubro no disponible: {e}")
+
+
+@st.fragment
+@medicion.cronometrar("Etapa 1 — objeto y características")
+def seccion_objeto():
 
     st.markdown("## 2. DESCRIPCIÓN DEL OBJETO A CONTRATAR, CON SUS ESPECIFICACIONES")
 
@@ -645,14 +410,16 @@ if (
         disabled=True
     )
 
-    caracteristicas_tecnicas = st.text_area(
+    st.text_area(
         "2.2 CARACTERÍSTICAS TÉCNICAS DEL BIEN",
-        height=150
+        height=150,
+        key="caracteristicas_tecnicas"
     )
 
-    # =====================================================
-    # 2.3 FUNDAMENTOS JURÍDICOS
-    # =====================================================
+
+@st.fragment
+@medicion.cronometrar("Etapa 1 — fundamentos jurídicos")
+def seccion_fundamentos():
 
     st.markdown("### 2.3 FUNDAMENTOS JURÍDICOS")
 
@@ -721,278 +488,739 @@ if (
                 disabled=True
             )
 
-    st.markdown("---")
 
-    # =====================================================
-    # 3. CONDICIONES DEL FUTURO CONTRATO
-    # =====================================================
+@st.fragment
+@medicion.cronometrar("Etapa 1 — condiciones del contrato")
+def seccion_condiciones():
 
     st.markdown("## 3. CONDICIONES DEL FUTURO CONTRATO")
 
-    meses = [
-        "Enero", "Febrero", "Marzo", "Abril",
-        "Mayo", "Junio", "Julio", "Agosto",
-        "Septiembre", "Octubre", "Noviembre", "Diciembre"
-    ]
-
     meses_seleccionados = st.multiselect(
         "3.1 OPORTUNIDAD (Mes de suscripción en 2026)",
-        meses,
-        max_selections=2
+        MESES,
+        max_selections=2,
+        key="meses_oportunidad"
     )
 
-    oportunidad = ""
     if meses_seleccionados:
-        oportunidad = " y ".join(meses_seleccionados) + " de 2026"
-        st.success(f"Suscripción prevista para: {oportunidad}")
+        st.success(f"Suscripción prevista para: {oportunidad_de(meses_seleccionados)}")
 
-    forma_pago = st.text_area(
+    st.text_area(
         "3.3 FORMA DE PAGO",
         height=120,
         key="forma_pago"
     )
 
-    analisis = st.text_area(
+    st.text_area(
         "3.4 ANÁLISIS DE LAS CONDICIONES Y PRECIOS DEL MERCADO",
         height=120,
         key="analisis"
     )
 
-    st.markdown("---")
 
-    # =====================================================
-    # 5. IDENTIFICACIÓN DEL RIESGO Y GARANTÍAS
-    # =====================================================
+@st.fragment
+@medicion.cronometrar("Etapa 1 — garantías")
+def seccion_garantias():
 
     st.markdown("## 5. IDENTIFICACIÓN DEL RIESGO Y GARANTÍAS")
 
-    opciones_garantias = {
-        "Anticipo": "1. Anticipo: Buen manejo y correcta inversión del 100%.",
-        "Cumplimiento": "2. Cumplimiento: 20% del valor del contrato.",
-        "Salarios y Prestaciones": "3. Salarios y Prestaciones: 15% del contrato.",
-        "Responsabilidad Civil Extracontractual": "4. RCE: 200 SMLMV.",
-        "Estabilidad de la Obra": "5. Estabilidad: 20% por 5 años.",
-        "Calidad del Servicio": "6. Calidad del Servicio: 30% con vigencia adicional."
-    }
-
     garantias_seleccionadas = st.multiselect(
         "GARANTÍAS EXIGIDAS",
-        list(opciones_garantias.keys()),
+        list(OPCIONES_GARANTIAS.keys()),
         key="garantias_select"
     )
 
     if garantias_seleccionadas:
-        texto_garantias = "\n\n".join(
-            [opciones_garantias[g] for g in garantias_seleccionadas]
-        )
-
         st.text_area(
             "Detalle de Garantías Seleccionadas",
-            value=texto_garantias,
+            value=texto_garantias_de(garantias_seleccionadas),
             height=200,
             disabled=True
         )
 
-    st.markdown("---")
 
-       # =====================================================
-    # BOTONES GUARDAR Y DESCARGAR
-    # =====================================================
+@st.fragment(run_every=2)
+def estado_generacion_estudio():
+    # Sondea el trabajo de render encolado al guardar; al terminar vuelve a
+    # ejecutar la página completa para que el fragmento deje de sondear.
+    try:
+        trabajo = cola_render.estado_trabajo(st.session_state.trabajo_estudio)
+    except Exception as e:
+        st.warning(f"No fue posible consultar la generación: {e}")
+        return
 
-    col_btn1, col_btn2 = st.columns(2)
+    if trabajo is None or trabajo["estado"] == cola_render.TERMINADO:
+        st.session_state.trabajo_estudio = None
+        cargar_manifiesto.clear()
+        st.rerun(scope="app")
 
-    # Variable de control para mostrar descarga
-    if "estudio_guardado" not in st.session_state:
-        st.session_state.estudio_guardado = False
+    elif trabajo["estado"] == cola_render.ERROR:
+        st.session_state.trabajo_estudio = None
+        st.error(f"Error al generar el documento: {trabajo['error']}")
 
-    # ==========================================
-    # BOTÓN GUARDAR ESTUDIO PREVIO
-    # ==========================================
-    with col_btn1:
+    else:
+        st.info("Generando el documento del estudio previo...")
 
-        if st.button("GUARDAR ESTUDIO PREVIO", use_container_width=True):
 
-            try:
-                conn = conectar_db()
-                cursor = conn.cursor()
+def oportunidad_de(meses_seleccionados):
+    if not meses_seleccionados:
+        return ""
+    return " y ".join(meses_seleccionados) + " de 2026"
 
-                # ------------------------------------------
-                # INSERTAR O ACTUALIZAR PROCESO
-                # ------------------------------------------
-                cursor.execute("""
-                    INSERT INTO procesos
-                    (id_proceso, objeto, necesidad, justificacion, valor, plazo, fecha_estudio, estado)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id_proceso)
-                    DO UPDATE SET
-                        objeto = EXCLUDED.objeto,
-                        necesidad = EXCLUDED.necesidad,
-                        justificacion = EXCLUDED.justificacion,
-                        valor = EXCLUDED.valor,
-                        plazo = EXCLUDED.plazo,
-                        fecha_estudio = EXCLUDED.fecha_estudio,
-                        estado = EXCLUDED.estado
-                """, (
-                    ID,
-                    st.session_state.get("objeto", ""),
-                    st.session_state.get("necesidad", ""),
-                    st.session_state.get("justificacion", ""),
-                    valor if 'valor' in locals() else 0,
-                    plazo if 'plazo' in locals() else "",
-                    fecha_estudio,
-                    "ETAPA 1"
-                ))
-
-                conn.commit()
-                conn.close()
 
-                # ------------------------------------------
-                # CREAR CARPETA procesos/ID
-                # ------------------------------------------
-                BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-                RUTA_PROCESOS = os.path.join(BASE_DIR, "procesos")
-                os.makedirs(RUTA_PROCESOS, exist_ok=True)
+def texto_garantias_de(garantias_seleccionadas):
+    return "\n\n".join(
+        [OPCIONES_GARANTIAS[g] for g in garantias_seleccionadas]
+    )
 
-                ruta_proceso = os.path.join(RUTA_PROCESOS, ID)
-                os.makedirs(ruta_proceso, exist_ok=True)
 
-                # ------------------------------------------
-                # GENERAR Y GUARDAR ESTUDIO PREVIO
-                # ------------------------------------------
-                contexto = {
-                    "ID_PROCESO": ID,
-                    "OBJETO": st.session_state.get("objeto", ""),
-                    "JUSTIFICACION": st.session_state.get("justificacion", ""),
-                    "NECESIDAD": st.session_state.get("necesidad", ""),
-                    "VALOR": valor if 'valor' in locals() else 0,
-                    "PLAZO": plazo if 'plazo' in locals() else "",
-                    "FECHA_ESTUDIO": fecha_estudio.strftime("%d/%m/%Y")
-                }
-
-                ruta_plantilla = os.path.join(
-                    BASE_DIR,
-                    "plantillas",
-                    "estudio_previo.docx"
-                )
+# =====================================================
+# CONTROL DE ID, ESTADOS Y NAVEGACIÓN
+# =====================================================
 
-                doc = DocxTemplate(ruta_plantilla)
-                doc.render(contexto)
+# ---------------------------------------------
+# ID DEL PROCESO (SE RESERVA AL PRIMER GUARDADO)
+# ---------------------------------------------
+if "ID_PROCESO" not in st.session_state:
+    st.session_state.ID_PROCESO = None
 
-                nombre_archivo = f"Estudio_Previo_{ID}.docx"
-                ruta_archivo = os.path.join(ruta_proceso, nombre_archivo)
+ID = st.session_state.ID_PROCESO
 
-                doc.save(ruta_archivo)
 
-                st.session_state.estudio_guardado = True
+# ---------------------------------------------
+# CONTROL DE ETAPA
+# ---------------------------------------------
+if "etapa_actual" not in st.session_state:
+    st.session_state.etapa_actual = "1 Estudio Previo"
 
-                st.success("Estudio previo guardado correctamente.")
 
-            except Exception as e:
-                try:
-                    conn.rollback()
-                    conn.close()
-                except:
-                    pass
+# ---------------------------------------------
+# CONTROL CONFIRMACIÓN
+# ---------------------------------------------
+if "confirmar_generacion" not in st.session_state:
+    st.session_state.confirmar_generacion = False
 
-                st.error(f"Error al guardar proceso: {e}")
 
-# ==========================================
-# BOTÓN DESCARGAR (VISIBLE SI YA SE GUARDÓ)
-# ==========================================
+# ---------------------------------------------
+# CONTROL DE PÁGINA (NUEVO — PARA SIDEBAR)
+# ---------------------------------------------
+if "pagina" not in st.session_state:
+    st.session_state.pagina = "Inicio"
 
-with col_btn2:
+# =====================================================
+# MÓDULO PROCESOS (ANTES DE LAS ETAPAS)
+# =====================================================
 
-    if st.session_state.get("estudio_guardado", False):
+if st.session_state.pagina == "Proceso":
 
-        try:
-            # ------------------------------------------
-            # Definir ruta del archivo ya generado
-            # ------------------------------------------
-            BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    st.title("📁 PROCESOS REGISTRADOS")
+
+    # ---------------------------------------------
+    # FILTROS (SE RESUELVEN EN EL SERVIDOR)
+    # ---------------------------------------------
+    f1, f2, f3, f4 = st.columns(4)
+
+    with f1:
+        filtro_vigencia = st.number_input(
+            "VIGENCIA",
+            min_value=2000,
+            max_value=2100,
+            value=None,
+            step=1,
+            placeholder="Todas"
+        )
+
+    with f2:
+        filtro_estado = st.selectbox(
+            "ESTADO",
+            listado_procesos.ESTADOS,
+            index=None,
+            placeholder="Todos"
+        )
+
+    with f3:
+        filtro_modalidad = st.selectbox(
+            "MODALIDAD",
+            listado_procesos.MODALIDADES,
+            index=None,
+            placeholder="Todas"
+        )
+
+    with f4:
+        filtro_centro = st.selectbox(
+            "CENTRO DE COSTOS",
+            catalogo.ETIQUETAS_CENTROS,
+            index=None,
+            placeholder="Todos"
+        )
+
+    filtro_texto = st.text_input(
+        "BUSCAR EN OBJETO / NECESIDAD / JUSTIFICACIÓN",
+        placeholder="Ej: mantenimiento aire acondicionado"
+    )
+
+    filtros = {
+        "vigencia": filtro_vigencia,
+        "estado": filtro_estado,
+        "modalidad": filtro_modalidad,
+        "centro_costos": filtro_centro.split(" - ")[0] if filtro_centro else None,
+        "texto": filtro_texto
+    }
+
+    # Pila de llaves de página; se reinicia cuando cambian los filtros
+    if st.session_state.get("filtros_listado") != filtros:
+        st.session_state.filtros_listado = filtros
+        st.session_state.llaves_pagina = [None]
+
+    llaves = st.session_state.llaves_pagina
+
+    try:
+        registros, siguiente = listado_procesos.listar_procesos(
+            despues_de=llaves[-1],
+            **filtros
+        )
+
+        if registros:
+
+            opciones = {
+                f"{r[0]} - {r[1]} - {(r[4] or '')[:80]}": r[0]
+                for r in registros
+            }
 
-            ruta_archivo = os.path.join(
-                BASE_DIR,
-                "procesos",
-                ID,
-                f"Estudio_Previo_{ID}.docx"
+            seleccion = st.selectbox(
+                "Seleccione un proceso",
+                list(opciones.keys())
             )
 
-            # ------------------------------------------
-            # Verificar que el archivo exista
-            # ------------------------------------------
-            if os.path.exists(ruta_archivo):
+            if st.button("CARGAR PROCESO"):
+                cargar_proceso(opciones[seleccion])
+                st.rerun()
 
-                with open(ruta_archivo, "rb") as archivo:
-                    st.download_button(
-                        label="DESCARGAR ESTUDIO PREVIO",
-                        data=archivo,
-                        file_name=f"Estudio_Previo_{ID}.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        use_container_width=True,
-                        key=f"descargar_{ID}"
-                    )
+        else:
+            st.info("No existen procesos registrados.")
 
-            else:
-                st.warning("El archivo del estudio previo no fue encontrado.")
+        p1, p2, p3 = st.columns([1, 2, 1])
+
+        with p1:
+            if st.button("◀ ANTERIOR", disabled=len(llaves) == 1):
+                llaves.pop()
+                st.rerun()
+
+        with p2:
+            st.caption(f"Página {len(llaves)}")
+
+        with p3:
+            if st.button("SIGUIENTE ▶", disabled=siguiente is None):
+                llaves.append(siguiente)
+                st.rerun()
+
+    except Exception as e:
+        st.error(f"Error consultando procesos: {e}")
+
+    # ---------------------------------------------
+    # BÚSQUEDA POR CONTENIDO (RESULTADOS POR RELEVANCIA)
+    # ---------------------------------------------
+    st.divider()
+    st.markdown("### BÚSQUEDA POR CONTENIDO")
+
+    texto_busqueda = st.text_input(
+        "Encuentre procesos anteriores por lo que se compró o contrató",
+        placeholder='Ej: "aire acondicionado" mantenimiento -vehículos',
+        key="texto_busqueda"
+    )
+
+    try:
+        for r in busqueda.buscar_procesos(texto_busqueda):
+
+            with st.expander(f"{r['id_proceso']} - {r['fecha_estudio']} — {r['fragmento']}"):
+
+                st.markdown("**JUSTIFICACIÓN**")
+                st.code(r["justificacion"] or "", language=None, wrap_lines=True)
+
+                st.markdown("**ANÁLISIS DE MERCADO**")
+                st.code(r["analisis"] or "", language=None, wrap_lines=True)
+
+                if st.button("CARGAR ESTE PROCESO", key=f"cargar_busqueda_{r['id_proceso']}"):
+                    cargar_proceso(r["id_proceso"])
+                    st.rerun()
+
+    except Exception as e:
+        st.error(f"Error en la búsqueda: {e}")
+
+    # 🔴 MUY IMPORTANTE
+    st.stop()
+
+
+# =====================================================
+# MÓDULO CONTRATOS (GENERACIÓN POR LOTE)
+# =====================================================
+
+if st.session_state.pagina == "Contratos":
+
+    st.title("📑 PAQUETES CONTRACTUALES POR LOTE")
+
+    texto_ids = st.text_area(
+        "IDs de proceso (uno por línea o separados por coma)",
+        height=150,
+        placeholder="001-2026\n002-2026"
+    )
+
+    ids_lote = [
+        i.strip()
+        for i in texto_ids.replace(",", "\n").splitlines()
+        if i.strip()
+    ]
+
+    if st.button("GENERAR PAQUETES", disabled=not ids_lote):
+
+        barra = st.progress(0.0, text="Generando paquetes...")
+
+        def avanzar(hechos, total, id_proceso):
+            barra.progress(hechos / total, text=f"{hechos}/{total} — {id_proceso}")
+
+        try:
+            resultados = generacion_lote.generar_lote(ids_lote, progreso=avanzar)
+            cargar_manifiesto.clear()
+
+            st.dataframe(
+                [
+                    {
+                        "ID_PROCESO": id_proceso,
+                        "ESTADO": "ERROR" if error else "INCOMPLETO" if faltantes else "OK",
+                        "DETALLE": error or ruta,
+                        "CAMPOS EN BLANCO": generacion_lote.describir_faltantes(faltantes)
+                    }
+                    for id_proceso, (ruta, error, faltantes) in resultados.items()
+                ],
+                use_container_width=True
+            )
+
+            if any(faltantes for _, _, faltantes in resultados.values()):
+                st.warning(
+                    "Algunos documentos quedaron con campos en blanco: "
+                    "complete los datos del proceso y vuelva a generar."
+                )
 
         except Exception as e:
-            st.error(f"Error al generar descarga: {e}")
-       # ==========================================
-    # BOTÓN DESCARGAR ESTUDIO PREVIO
-    # ==========================================
+            st.error(f"Error en la generación por lote: {e}")
 
-    with col_btn2:
+    st.stop()
 
-        if proceso_existe(ID):
+
+# =====================================================
+# MÓDULO REPORTES (LEE SOLO RESÚMENES PRECALCULADOS)
+# =====================================================
+
+if st.session_state.pagina == "Reportes":
+
+    st.title("📊 REPORTES")
+
+    try:
+        resumen = reportes.leer_resumen()
+
+        por_estado = resumen["estado"]
+
+        m1, m2 = st.columns(2)
+        m1.metric("PROCESOS", f"{int(por_estado['cantidad'].sum()):,}")
+        m2.metric("VALOR TOTAL", formatear_moneda(por_estado['valor_total'].sum()))
+
+        st.markdown("### VALOR POR CENTRO DE COSTOS")
+        por_centro = resumen["centro"].rename(
+            index=lambda c: f"{c} - {estructura_presupuestal[c]['nombre']}"
+            if c in estructura_presupuestal else c
+        )
+        st.bar_chart(por_centro["valor_total"])
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("### VALOR POR PROGRAMA")
+            st.bar_chart(resumen["programa"]["valor_total"])
+
+        with col2:
+            st.markdown("### VALOR POR RUBRO")
+            st.bar_chart(resumen["rubro"]["valor_total"])
+
+        col3, col4 = st.columns(2)
+
+        with col3:
+            st.markdown("### PROCESOS POR MODALIDAD")
+            st.bar_chart(resumen["modalidad"]["cantidad"])
+
+        with col4:
+            st.markdown("### PROCESOS POR ESTADO")
+            st.bar_chart(por_estado["cantidad"])
+
+        st.markdown("### PROCESOS POR MES")
+        st.line_chart(resumen["mes"]["cantidad"])
+
+    except Exception as e:
+        st.error(f"Error consultando reportes: {e}")
+
+    st.stop()
+
+
+# =====================================================
+# MÓDULO CONFIGURACIÓN (MONITOREO)
+# =====================================================
+
+if st.session_state.pagina == "Configuracion":
+
+    st.title("⚙ CONFIGURACIÓN")
+
+    st.markdown("### POOL DE CONEXIONES")
+
+    try:
+        st.json(estadisticas_pool())
+    except Exception as e:
+        st.error(f"Error consultando el pool: {e}")
+
+    st.markdown("### COLA DE RENDER")
+    st.json(cola_render.estadisticas_trabajadores())
+
+    st.markdown(f"### TIEMPO DE SERVIDOR POR INTERACCIÓN (ÚLTIMAS {medicion.VENTANA} EJECUCIONES)")
+    st.dataframe(medicion.tiempos(), use_container_width=True)
+
+    st.markdown("### LATENCIA POR CONSULTA (DESDE EL ARRANQUE)")
+    st.dataframe(estadisticas_consultas(), use_container_width=True)
+
+    if st.button("REINICIAR ESTADÍSTICAS DE CONSULTAS"):
+        reiniciar_estadisticas_consultas()
+        st.rerun()
+
+    st.stop()
+
+
+# =====================================================
+# NAVEGACIÓN ETAPAS (SOLO EN MÓDULO INICIO)
+# =====================================================
+
+if st.session_state.pagina == "Inicio":
+
+    etapas_lista = [
+        "1 Estudio Previo",
+        "2 Planeación",
+        "3 Contratación",
+        "4 Ejecución"
+    ]
+
+    etapa = st.radio(
+        "",
+        etapas_lista,
+        horizontal=True,
+        index=etapas_lista.index(st.session_state.etapa_actual),
+        key="radio_etapas"
+    )
+
+    # Mantener sincronizado el estado
+    st.session_state.etapa_actual = etapa
+
+    texto_banner = (
+        f"ID_PROCESO generado automáticamente: {ID}"
+        if ID
+        else "ID_PROCESO: se asignará al guardar el Estudio Previo"
+    )
+
+    st.markdown(
+        f"""
+        <div class="banner-id">
+        {texto_banner}
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+# =====================================================
+# ETAPA 1 — ESTUDIO PREVIO
+# =====================================================
+if (
+    st.session_state.etapa_actual == "1 Estudio Previo"
+    and st.session_state.pagina == "Inicio"
+):
+
+    proceso_ya_guardado = proceso_existe(ID)
+
+    st.markdown("### ETAPA 1 — ESTUDIO PREVIO")
+
+    # =====================================================
+    # CAMPOS PRINCIPALES (ANCHO COMPLETO)
+    # =====================================================
+    seccion_texto()
+
+    # =====================================================
+    # BLOQUE ECONÓMICO
+    # =====================================================
+    seccion_economica()
+
+    st.markdown("---")
+
+    # =====================================================
+    # INFORMACIÓN PRESUPUESTAL (COMPLETA Y CONSOLIDADA)
+    # =====================================================
+    seccion_presupuestal()
+
+    # =====================================================
+    # SEPARADOR VISUAL
+    # =====================================================
+
+    st.divider()
+
+    # =====================================================
+    # 2. DESCRIPCIÓN DEL OBJETO (ANCHO COMPLETO)
+    # =====================================================
+    seccion_objeto()
+
+    # =====================================================
+    # 2.3 FUNDAMENTOS JURÍDICOS
+    # =====================================================
+    seccion_fundamentos()
+
+    st.markdown("---")
+
+    # =====================================================
+    # 3. CONDICIONES DEL FUTURO CONTRATO
+    # =====================================================
+    seccion_condiciones()
+
+    st.markdown("---")
+
+    # =====================================================
+    # 5. IDENTIFICACIÓN DEL RIESGO Y GARANTÍAS
+    # =====================================================
+    seccion_garantias()
+
+    st.markdown("---")
+
+    # =====================================================
+    # VALORES DEL FORMULARIO (DESDE session_state)
+    # =====================================================
+    valor, _ = leer_monto(st.session_state.get("valor_ep"))
+    plazo = st.session_state.get("plazo", 1)
+    fecha_estudio = st.session_state.get("fecha_estudio", date.today())
+    modalidad = st.session_state.get("modalidad_unica", "DIRECTA")
+    centro_codigo = st.session_state.get("centro_costos_select", "").split(" - ")[0]
+    programa_codigo = (st.session_state.get("programa_select") or "").split(" - ")[0] or None
+    rubro_codigo = (st.session_state.get("rubro_select") or "").split(" - ")[0] or None
+    caracteristicas_tecnicas = st.session_state.get("caracteristicas_tecnicas", "")
+    forma_pago = st.session_state.get("forma_pago", "")
+    analisis = st.session_state.get("analisis", "")
+
+    # Los campos que solo aplican en ciertas combinaciones quedan en
+    # session_state aunque el widget no se muestre
+    actividad = (
+        st.session_state.get("actividad_planeacion") or "No aplica"
+        if st.session_state.get("tipo_presupuesto") == "INVERSIÓN"
+        else "No aplica"
+    )
+    articulo = st.session_state.get("articulo_auto", "").replace("ARTÍCULO", "").strip()
+    numeral = st.session_state.get("numeral_dinamico", "")
+    literal = (
+        st.session_state.get("literal_dinamico", "")
+        if modalidad == "DIRECTA" and numeral == "2"
+        else "No aplica"
+    )
+
+    # =====================================================
+    # BOTONES GUARDAR Y DESCARGAR
+    # =====================================================
+
+    col_btn1, col_btn2 = st.columns(2)
+
+    # Contexto único para guardar y descargar: el motor de plantillas
+    # renderiza una sola vez por contenido y sirve la descarga desde caché.
+    contexto_estudio = {
+        "ID_PROCESO": ID,
+        "OBJETO": st.session_state.get("objeto", ""),
+        "JUSTIFICACION": st.session_state.get("justificacion", ""),
+        "NECESIDAD": st.session_state.get("necesidad", ""),
+        "CENTRO_COSTOS": st.session_state.get("centro_costos_select", ""),
+        "PROGRAMA": st.session_state.get("programa_select") or "",
+        "RUBRO": st.session_state.get("rubro_select") or "",
+        "CODIGO_PLANEACION": actividad,
+        "CARACTERISTICAS_TECNICAS": caracteristicas_tecnicas,
+        "MODALIDAD": modalidad,
+        "ARTICULO": articulo,
+        "NUMERAL": numeral,
+        "LITERAL": literal,
+        "VALOR": formatear_moneda(valor, simbolo=False),
+        "VALOR_LETRAS": valor_en_letras(valor, sufijo=""),
+        "PLAZO": generacion_lote.plazo_texto(plazo, st.session_state.get("unidad_plazo", "Días")),
+        "FECHA_ESTUDIO": fecha_estudio.strftime("%d/%m/%Y"),
+        "OPORTUNIDAD": " y ".join(st.session_state.get("meses_oportunidad") or []),
+        "FORMA_PAGO": forma_pago,
+        "ANALISIS": analisis,
+        "GARANTIAS": ", ".join(st.session_state.get("garantias_select") or [])
+    }
+
+    # ==========================================
+    # BOTÓN GUARDAR ESTUDIO PREVIO
+    # ==========================================
+    with col_btn1:
+
+        if st.button("GUARDAR ESTUDIO PREVIO", use_container_width=True):
 
             try:
                 # ------------------------------------------
-                # Construcción del contexto
+                # VALIDAR CONTRA LA PLANTILLA (ANTES DE ESCRIBIR NADA)
                 # ------------------------------------------
-                contexto = {
-                    "ID_PROCESO": ID,
-                    "OBJETO": st.session_state.get("objeto", ""),
-                    "JUSTIFICACION": st.session_state.get("justificacion", ""),
-                    "NECESIDAD": st.session_state.get("necesidad", ""),
-                    "VALOR": valor if 'valor' in locals() else 0,
-                    "PLAZO": plazo if 'plazo' in locals() else "",
-                    "FECHA_ESTUDIO": fecha_estudio.strftime("%d/%m/%Y")
-                }
+                motor_plantillas.validar_contexto("estudio_previo", contexto_estudio)
 
                 # ------------------------------------------
-                # Cargar plantilla institucional
+                # RESERVAR ID (SOLO EN EL PRIMER GUARDADO)
                 # ------------------------------------------
-                BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-                ruta_plantilla = os.path.join(
-                    BASE_DIR,
-                    "plantillas",
-                    "estudio_previo.docx"
-                )
-
-                doc = DocxTemplate(ruta_plantilla)
-                doc.render(contexto)
+                if not ID:
+                    ID = reservar_id()
+                    st.session_state.ID_PROCESO = ID
+                    contexto_estudio["ID_PROCESO"] = ID
 
                 # ------------------------------------------
-                # Generar archivo en memoria
+                # INSERTAR O ACTUALIZAR PROCESO
                 # ------------------------------------------
-                buffer = io.BytesIO()
-                doc.save(buffer)
-                buffer.seek(0)
+                migraciones.asegurar_esquema()
+
+                # Proceso, instantánea, ejecución presupuestal y trabajo de
+                # render en una sola transacción
+                with repositorio.transaccion() as cursor:
+                    repositorio.guardar_proceso(
+                        cursor,
+                        ID,
+                        objeto=st.session_state.get("objeto", ""),
+                        necesidad=st.session_state.get("necesidad", ""),
+                        justificacion=st.session_state.get("justificacion", ""),
+                        valor=valor,
+                        plazo=plazo,
+                        fecha_estudio=fecha_estudio,
+                        estado="ETAPA 1",
+                        modalidad=modalidad,
+                        centro_costos=centro_codigo,
+                        caracteristicas_tecnicas=caracteristicas_tecnicas,
+                        forma_pago=forma_pago,
+                        analisis=analisis,
+                        programa=programa_codigo,
+                        rubro=rubro_codigo
+                    )
 
-                # ------------------------------------------
-                # Botón de descarga
-                # ------------------------------------------
-                st.download_button(
-                    label="DESCARGAR ESTUDIO PREVIO",
-                    data=buffer,
-                    file_name=f"Estudio_Previo_{ID}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    use_container_width=True,
-                    key=f"descargar_estudio_{ID}"
-                )
+                    instantaneas.guardar_instantanea(
+                        cursor,
+                        ID,
+                        "ETAPA 1",
+                        instantaneas.formulario_de(st.session_state),
+                        contexto_estudio
+                    )
+
+                    ejecucion_presupuestal.comprometer_estudio(
+                        cursor,
+                        ID,
+                        fecha_estudio.year,
+                        centro_codigo,
+                        programa_codigo,
+                        rubro_codigo,
+                        valor
+                    )
+
+                    # ------------------------------------------
+                    # ENCOLAR GENERACIÓN DEL DOCUMENTO
+                    # ------------------------------------------
+                    st.session_state.trabajo_estudio = cola_render.encolar(
+                        cursor,
+                        ID,
+                        "estudio_previo",
+                        contexto_estudio,
+                        f"{ID}/Estudio_Previo_{ID}.docx"
+                    )
+
+                cola_render.despertar()
+                invalidar_estado_proceso()
+                reportes.invalidar_resumen()
+
+                st.success("Estudio previo guardado correctamente.")
+
+            except Exception as e:
+                st.error(f"Error al guardar proceso: {e}")
+
+        if st.session_state.get("trabajo_estudio"):
+            estado_generacion_estudio()
+
+    # ==========================================
+    # BOTÓN DESCARGAR ESTUDIO PREVIO
+    # ==========================================
+    with col_btn2:
+
+        if proceso_existe(ID):
+
+            try:
+                # El documento generado al guardar se descarga directo del
+                # almacenamiento; si aún no existe, se renderiza aquí
+                nombre_estudio = f"Estudio_Previo_{ID}.docx"
+                manifiesto = cargar_manifiesto(ID)
+                entrada = manifiesto.get(nombre_estudio)
+
+                if entrada and not st.session_state.get("trabajo_estudio"):
+                    st.link_button(
+                        "DESCARGAR ESTUDIO PREVIO",
+                        almacenamiento.enlace_documento(ID, nombre_estudio, entrada["huella"]),
+                        use_container_width=True
+                    )
+
+                    # PDF solo si salió de esta versión del DOCX
+                    nombre_pdf = conversion_pdf.nombre_pdf(nombre_estudio)
+                    entrada_pdf = manifiesto.get(nombre_pdf)
+
+                    if entrada_pdf and entrada_pdf.get("origen") == entrada["huella"]:
+                        st.link_button(
+                            "DESCARGAR PDF",
+                            almacenamiento.enlace_documento(ID, nombre_pdf, entrada_pdf["huella"]),
+                            use_container_width=True
+                        )
+
+                    elif conversion_pdf.disponible() and st.button("GENERAR PDF", use_container_width=True):
+                        with st.spinner("Convirtiendo a PDF..."):
+                            conversion_pdf.pdf_de_documento(ID, nombre_estudio).result(
+                                timeout=conversion_pdf.TIEMPO_MAX_CONVERSION
+                            )
+                        cargar_manifiesto.clear()
+                        st.rerun()
+
+                else:
+                    buffer = generar_estudio_previo_docxtpl(contexto_estudio)
+
+                    st.download_button(
+                        label="DESCARGAR ESTUDIO PREVIO",
+                        data=buffer,
+                        file_name=nombre_estudio,
+                        mime=motor_plantillas.MIME_DOCX,
+                        use_container_width=True,
+                        key=f"descargar_estudio_{ID}"
+                    )
 
             except Exception as e:
                 st.error(f"Error al generar el archivo para descarga: {e}")
+
+            # ------------------------------------------
+            # Exportar carpeta completa (ZIP por streaming)
+            # ------------------------------------------
+            if st.button("EXPORTAR CARPETA DEL PROCESO (ZIP)", use_container_width=True):
+
+                try:
+                    contexto_paquete = generacion_lote.contexto_documentos(
+                        ID,
+                        cargar_estado_proceso(ID)
+                    )
+
+                    documentos = (
+                        (
+                            f"generados/{prefijo}_{ID}.docx",
+                            motor_plantillas.renderizar(nombre, contexto_paquete)
+                        )
+                        for nombre, prefijo in generacion_lote.NOMBRES_ARCHIVO.items()
+                    )
+
+                    url = exportacion_zip.exportar_para_descarga(ID, documentos)
+                    st.link_button("DESCARGAR ZIP", url, use_container_width=True)
+
+                except Exception as e:
+                    st.error(f"Error al exportar la carpeta: {e}")
+
 # =====================================================
 # ETAPA 2 — PLANEACIÓN
 # =====================================================
@@ -1036,7 +1264,7 @@ if st.session_state.etapa_actual == "2 Planeación" and st.session_state.pagina
     with col4:
         st.text_input("VALOR PROPUESTA 1", key="valor1")
 
-    valor1, valor1_formateado = procesar_moneda("valor1")
+    valor1, valor1_formateado = leer_monto(st.session_state.get("valor1"))
 
     if valor1 > 0:
         st.write("Valor formateado:", valor1_formateado)
@@ -1095,7 +1323,7 @@ if st.session_state.etapa_actual == "2 Planeación" and st.session_state.pagina
     with col8:
         st.text_input("VALOR PROPUESTA 2", key="valor2")
 
-    valor2, valor2_formateado = procesar_moneda("valor2")
+    valor2, valor2_formateado = leer_monto(st.session_state.get("valor2"))
 
     if valor2 > 0:
         st.write("Valor formateado:", valor2_formateado)
@@ -1131,45 +1359,29 @@ if st.session_state.etapa_actual == "2 Planeación" and st.session_state.pagina
     if st.button("GUARDAR PLANEACIÓN", use_container_width=True):
 
         try:
-            conn = conectar_db()
-            cursor = conn.cursor()
-
-            cursor.execute(
-                "SELECT 1 FROM public.planeacion WHERE id_proceso = %s",
-                (ID,)
-            )
-
-            existe_planeacion = cursor.fetchone()
-
-            if existe_planeacion:
-                st.warning("La planeación ya fue registrada para este proceso.")
-            else:
-                cursor.execute("""
-                    INSERT INTO public.planeacion
-                    (
-                        id_proceso,
-                        tipo1, nombre1, identificacion1, valor1,
-                        representante1, cc_representante1,
-                        tipo2, nombre2, identificacion2, valor2,
-                        representante2, cc_representante2
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
+            with repositorio.transaccion() as cursor:
+                registrada = repositorio.registrar_planeacion(
+                    cursor,
                     ID,
-                    tipo1, nombre1, id1, valor1,
-                    representante1, cc_rep1,
-                    tipo2, nombre2, id2, valor2,
-                    representante2, cc_rep2
-                ))
+                    {
+                        "tipo": tipo1, "nombre": nombre1, "identificacion": id1, "valor": valor1,
+                        "representante": representante1, "cc_representante": cc_rep1
+                    },
+                    {
+                        "tipo": tipo2, "nombre": nombre2, "identificacion": id2, "valor": valor2,
+                        "representante": representante2, "cc_representante": cc_rep2
+                    }
+                )
 
-                conn.commit()
+            if registrada:
                 st.success("Planeación guardada correctamente.")
+            else:
+                st.warning("La planeación ya fue registrada para este proceso.")
 
-            conn.close()
+            invalidar_estado_proceso()
+            reportes.invalidar_resumen()
 
         except Exception as e:
-            conn.rollback()
-            conn.close()
             st.error(f"Error al guardar planeación: {e}")
             
 # =====================================================
@@ -1182,12 +1394,13 @@ if st.session_state.etapa_actual == "3 Contratación" and st.session_state.pagin
 
     tipo = st.selectbox(
         "TIPO CONTRATO",
-        ["Obra", "Consultoría", "Prestación de Servicios", "Suministro"]
+        ["Obra", "Consultoría", "Prestación de Servicios", "Suministro"],
+        key="tipo_contrato"
     )
 
-    supervisor = st.text_input("SUPERVISOR")
-    cdp = st.text_input("CDP")
-    fecha_firma = st.date_input("FECHA FIRMA")
+    supervisor = st.text_input("SUPERVISOR", key="supervisor")
+    cdp = st.text_input("CDP", key="cdp")
+    fecha_firma = st.date_input("FECHA FIRMA", key="fecha_firma")
 
     if st.button("GUARDAR CONTRATO"):
 
@@ -1195,23 +1408,22 @@ if st.session_state.etapa_actual == "3 Contratación" and st.session_state.pagin
             st.error("Debe guardar primero el Estudio Previo.")
         else:
             try:
-                conn = conectar_db()
-                cursor = conn.cursor()
-
-                cursor.execute("""
-                    INSERT INTO contratos
-                    (id_proceso, tipo_contrato, supervisor, cdp, fecha_firma)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    ID,
-                    tipo,
-                    supervisor,
-                    cdp,
-                    fecha_firma
-                ))
+                migraciones.asegurar_esquema()
+
+                with repositorio.transaccion() as cursor:
+                    repositorio.registrar_contrato(
+                        cursor,
+                        ID,
+                        tipo_contrato=tipo,
+                        supervisor=supervisor,
+                        cdp=cdp,
+                        fecha_firma=fecha_firma
+                    )
 
-                conn.commit()
-                conn.close()
+                    ejecucion_presupuestal.comprometer_contrato(cursor, ID)
+
+                invalidar_estado_proceso()
+                reportes.invalidar_resumen()
 
                 st.success("Contrato guardado correctamente.")
 
@@ -1225,6 +1437,11 @@ if st.session_state.etapa_actual == "3 Contratación" and st.session_state.pagin
 
 st.divider()
 st.success("Sistema operativo en PostgreSQL (Supabase).")
+medicion.registrar("Script completo", time.perf_counter() - INICIO_SCRIPT)
+st.caption(
+    f"Consultas a la base de datos en esta ejecución: {consultas_en_rerun()} · "
+    f"Tiempo de servidor: {st.session_state.tiempos_servidor['Script completo']} ms"
+)
 
 
 
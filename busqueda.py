@@ -0,0 +1,71 @@
+from database import conexion, ejecutar, nombrar_consulta
+from migraciones import asegurar_esquema
+
+
+# =====================================================
+# BÚSQUEDA DE TEXTO COMPLETO (ESPAÑOL, SIN TILDES)
+# =====================================================
+# procesos.busqueda es un tsvector generado y almacenado, con pesos
+# A (objeto) > B (necesidad, justificación) > C (textos de la Etapa 1),
+# indexado con GIN. unaccent no es IMMUTABLE, por eso se envuelve en
+# f_unaccent para poder usarlo en la columna generada (migraciones.py).
+
+LIMITE_RESULTADOS = 20
+
+CONSULTA_TEXTO = "websearch_to_tsquery('spanish', f_unaccent(%(texto)s))"
+
+CONDICION_TEXTO = f"busqueda @@ {CONSULTA_TEXTO}"
+
+# El ranking se calcula sobre las coincidencias del índice; los fragmentos
+# resaltados (ts_headline, costoso) solo sobre las filas ya limitadas. El
+# fragmento sale de los mismos campos del tsvector y con la misma
+# normalización (f_unaccent), para que toda coincidencia quede resaltada;
+# por eso se muestra sin tildes.
+SQL_BUSCAR = nombrar_consulta("buscar_procesos", f"""
+    WITH mejores AS (
+        SELECT id_proceso, fecha_estudio, objeto, necesidad, justificacion,
+               caracteristicas_tecnicas, forma_pago, analisis,
+               ts_rank_cd(busqueda, {CONSULTA_TEXTO}) AS rango
+        FROM procesos
+        WHERE {CONDICION_TEXTO}
+        ORDER BY rango DESC, fecha_estudio DESC
+        LIMIT %(limite)s
+    )
+    SELECT id_proceso, fecha_estudio, rango,
+           ts_headline(
+               'spanish',
+               f_unaccent(concat_ws(' ', objeto, necesidad, justificacion,
+                                    caracteristicas_tecnicas, forma_pago, analisis)),
+               {CONSULTA_TEXTO},
+               'MaxFragments=2, MaxWords=15, MinWords=5, FragmentDelimiter=" … ", '
+               'StartSel=**, StopSel=**'
+           ),
+           objeto, justificacion, analisis
+    FROM mejores
+    ORDER BY rango DESC, fecha_estudio DESC
+""")
+
+
+def buscar_procesos(texto, limite=LIMITE_RESULTADOS):
+    if not texto or not texto.strip():
+        return []
+
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_BUSCAR, {"texto": texto.strip(), "limite": limite})
+        filas = cursor.fetchall()
+
+    return [
+        {
+            "id_proceso": id_proceso,
+            "fecha_estudio": fecha,
+            "rango": rango,
+            "fragmento": fragmento,
+            "objeto": objeto,
+            "justificacion": justificacion,
+            "analisis": analisis
+        }
+        for id_proceso, fecha, rango, fragmento, objeto, justificacion, analisis in filas
+    ]
@@ -0,0 +1,107 @@
+from collections import defaultdict
+
+from convertir_rubros import datos_rubros
+from actividades_planeacion import actividades_planeacion
+from estructura_presupuestal import estructura_presupuestal
+
+
+# =====================================================
+# CATÁLOGO PRESUPUESTAL INDEXADO
+# =====================================================
+# Los índices y las etiquetas de los selectbox se calculan una sola vez al
+# importar el módulo; las consultas de la cascada CENTRO → PROGRAMA →
+# RUBRO → ACTIVIDAD son búsquedas directas en diccionarios.
+
+def _etiqueta(codigo, descripcion):
+    return f"{codigo} - {descripcion}"
+
+
+# ---------------------------------------------
+# CENTROS DE COSTOS Y PROGRAMAS
+# ---------------------------------------------
+ETIQUETAS_CENTROS = [
+    _etiqueta(codigo, datos["nombre"])
+    for codigo, datos in estructura_presupuestal.items()
+]
+
+PROGRAMAS_POR_CENTRO = {
+    codigo: [_etiqueta(c, n) for c, n in datos["programas"].items()]
+    for codigo, datos in estructura_presupuestal.items()
+}
+
+NOMBRE_PROGRAMA = {
+    programa: nombre
+    for datos in estructura_presupuestal.values()
+    for programa, nombre in datos["programas"].items()
+}
+
+
+# ---------------------------------------------
+# RUBROS
+# ---------------------------------------------
+RUBROS_POR_PROGRAMA = defaultdict(list)
+PROGRAMAS_POR_RUBRO = defaultdict(list)
+DESCRIPCION_RUBRO = {}
+PARES_PROGRAMA_RUBRO = set()
+
+for _programa, _rubro, _descripcion in datos_rubros:
+    RUBROS_POR_PROGRAMA[_programa].append(_etiqueta(_rubro, _descripcion))
+    PARES_PROGRAMA_RUBRO.add((_programa, _rubro))
+    PROGRAMAS_POR_RUBRO[_rubro].append(_programa)
+    DESCRIPCION_RUBRO.setdefault(_rubro, _descripcion)
+
+
+# ---------------------------------------------
+# ACTIVIDADES DE PLANEACIÓN
+# ---------------------------------------------
+ACTIVIDADES_POR_PROGRAMA_RUBRO = defaultdict(list)
+ACTIVIDADES_POR_CODIGO = defaultdict(list)
+
+for _fila in actividades_planeacion:
+    _programa, _rubro, _codigo, _descripcion = _fila
+    ACTIVIDADES_POR_PROGRAMA_RUBRO[(_programa, _rubro)].append(
+        _etiqueta(_codigo, _descripcion)
+    )
+    ACTIVIDADES_POR_CODIGO[_codigo].append(_fila)
+
+# Se congelan como dict normales para que una consulta no cree llaves vacías
+RUBROS_POR_PROGRAMA = dict(RUBROS_POR_PROGRAMA)
+PROGRAMAS_POR_RUBRO = dict(PROGRAMAS_POR_RUBRO)
+ACTIVIDADES_POR_PROGRAMA_RUBRO = dict(ACTIVIDADES_POR_PROGRAMA_RUBRO)
+ACTIVIDADES_POR_CODIGO = dict(ACTIVIDADES_POR_CODIGO)
+
+
+# =====================================================
+# CONSULTAS
+# =====================================================
+
+def programas_de_centro(centro):
+    return PROGRAMAS_POR_CENTRO.get(centro, [])
+
+
+def rubros_de_programa(programa):
+    return RUBROS_POR_PROGRAMA.get(programa, [])
+
+
+def programas_de_rubro(rubro):
+    return PROGRAMAS_POR_RUBRO.get(rubro, [])
+
+
+def actividades_de(programa, rubro):
+    return ACTIVIDADES_POR_PROGRAMA_RUBRO.get((programa, rubro), [])
+
+
+def actividad_por_codigo(codigo):
+    return ACTIVIDADES_POR_CODIGO.get(codigo, [])
+
+
+def centro_valido(centro):
+    return centro in PROGRAMAS_POR_CENTRO
+
+
+def programa_valido(centro, programa):
+    return programa in NOMBRE_PROGRAMA and programa.split("-")[0] == centro
+
+
+def rubro_valido(programa, rubro):
+    return (programa, rubro) in PARES_PROGRAMA_RUBRO
@@ -0,0 +1,218 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+from psycopg.types.json import Jsonb
+
+import conversion_pdf
+import motor_plantillas
+from almacenamiento import obtener_almacenamiento
+from database import conexion, ejecutar, nombrar_consulta
+from migraciones import asegurar_esquema
+
+
+# =====================================================
+# COLA DE RENDER EN SEGUNDO PLANO
+# =====================================================
+# Los trabajos se guardan en la tabla trabajos_render (no hace falta un
+# broker). Un pool de hilos del mismo proceso los toma con
+# FOR UPDATE SKIP LOCKED, renderiza la plantilla, guarda el documento en el
+# almacenamiento configurado y deja el estado en la tabla para que la página
+# lo consulte.
+#
+# Quien encola llama a despertar() después del commit: antes, el trabajador
+# no vería el trabajo y esperaría un sondeo completo. Las fallas del ciclo
+# (conexión, esquema) se registran con logging y se cuentan en
+# estadisticas_trabajadores() para la página de Configuración.
+
+TRABAJADORES = 2
+ESPERA_SONDEO = 5           # segundos entre sondeos cuando la cola está vacía
+ESPERA_ERROR = 10           # segundos de pausa tras un error de conexión
+VENCIMIENTO_EN_PROCESO = 600  # un trabajo tomado hace más que esto se reintenta
+RECUPERAR_CADA = 12         # sondeos entre búsquedas de trabajos vencidos
+MAX_INTENTOS = 3            # tomas de un trabajo antes de darlo por fallido
+
+PENDIENTE = "PENDIENTE"
+EN_PROCESO = "EN_PROCESO"
+TERMINADO = "TERMINADO"
+ERROR = "ERROR"
+
+SQL_ENCOLAR = nombrar_consulta("encolar_render", """
+    INSERT INTO trabajos_render (id_proceso, plantilla, contexto, destino)
+    VALUES (%s, %s, %s, %s)
+    RETURNING id
+""")
+
+SQL_ESTADO_TRABAJO = nombrar_consulta("estado_trabajo_render", """
+    SELECT estado, error, destino FROM trabajos_render WHERE id = %s
+""")
+
+SQL_TOMAR = nombrar_consulta("tomar_trabajo_render", """
+    UPDATE trabajos_render
+    SET estado = 'EN_PROCESO', tomado_en = now(), intentos = intentos + 1
+    WHERE id = (
+        SELECT id FROM trabajos_render
+        WHERE estado = 'PENDIENTE'
+        ORDER BY id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, id_proceso, plantilla, contexto, destino
+""")
+
+SQL_TERMINAR = nombrar_consulta("terminar_trabajo_render", """
+    UPDATE trabajos_render
+    SET estado = %s, error = %s, terminado_en = now()
+    WHERE id = %s
+""")
+
+# Un trabajo vencido vuelve a PENDIENTE; si ya agotó los intentos (por
+# ejemplo, una plantilla que tumba al trabajador cada vez) queda en ERROR
+SQL_RECUPERAR = nombrar_consulta("recuperar_trabajos_render", """
+    UPDATE trabajos_render
+    SET estado = CASE WHEN intentos >= %(maximo)s THEN 'ERROR' ELSE 'PENDIENTE' END,
+        error = CASE WHEN intentos >= %(maximo)s
+                     THEN 'Se agotaron los intentos de render.' ELSE error END,
+        terminado_en = CASE WHEN intentos >= %(maximo)s THEN now() END
+    WHERE estado = 'EN_PROCESO'
+      AND tomado_en < now() - make_interval(secs => %(vencimiento)s)
+""")
+
+_despertar = threading.Event()
+_log = logging.getLogger(__name__)
+
+_fallas = {"cantidad": 0, "ultima_en": None, "ultimo_error": None}
+_fallas_lock = threading.Lock()
+
+
+# =====================================================
+# PRODUCTOR
+# =====================================================
+
+def encolar(cursor, id_proceso, plantilla, contexto, destino):
+    # destino es "<ID>/<archivo>"; el documento queda en el manifiesto del
+    # proceso con el nombre del archivo. Con el cursor del guardado el trabajo
+    # solo existe si el guardado se confirma; después del commit, despertar().
+    ejecutar(cursor, SQL_ENCOLAR, (id_proceso, plantilla, Jsonb(contexto), destino))
+
+    return cursor.fetchone()[0]
+
+
+def despertar():
+    _despertar.set()
+
+
+def estado_trabajo(id_trabajo):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_ESTADO_TRABAJO, (id_trabajo,))
+        fila = cursor.fetchone()
+
+    if fila is None:
+        return None
+
+    estado, error, destino = fila
+    return {"estado": estado, "error": error, "destino": destino}
+
+
+# =====================================================
+# TRABAJADORES
+# =====================================================
+
+def procesar_uno():
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_TOMAR)
+        trabajo = cursor.fetchone()
+
+    if trabajo is None:
+        return False
+
+    id_trabajo, id_proceso, plantilla, contexto, destino = trabajo
+
+    try:
+        # El contexto lo arma la página completo; si falta un campo el
+        # trabajo queda en ERROR con la lista, en vez de un documento en blanco
+        contenido = motor_plantillas.renderizar(plantilla, contexto, estricto=True)
+        nombre = os.path.basename(destino)
+        obtener_almacenamiento().guardar_documento(id_proceso, nombre, contenido)
+
+        # El PDF sigue en la cola de conversión; si está llena se puede
+        # pedir después desde la página
+        if conversion_pdf.disponible():
+            try:
+                conversion_pdf.solicitar_pdf(contenido, id_proceso, conversion_pdf.nombre_pdf(nombre))
+            except conversion_pdf.ColaLlena:
+                pass
+        estado, error = TERMINADO, None
+    except Exception as e:
+        estado, error = ERROR, str(e)
+
+    with conexion() as conn:
+        ejecutar(conn.cursor(), SQL_TERMINAR, (estado, error, id_trabajo))
+
+    return True
+
+
+def recuperar_vencidos():
+    # Los trabajos de un trabajador que murió (reinicio, despliegue) quedan
+    # EN_PROCESO; cualquier trabajador vivo los devuelve a la cola
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_RECUPERAR, {
+            "vencimiento": VENCIMIENTO_EN_PROCESO,
+            "maximo": MAX_INTENTOS
+        })
+        return cursor.rowcount
+
+
+def _ciclo():
+    listo = False
+    sondeos = 0
+
+    while True:
+        try:
+            if not listo:
+                asegurar_esquema()
+                listo = True
+
+            if sondeos % RECUPERAR_CADA == 0:
+                recuperar_vencidos()
+            sondeos += 1
+
+            if not procesar_uno():
+                _despertar.wait(ESPERA_SONDEO)
+                _despertar.clear()
+
+        except Exception as e:
+            _log.exception("Falla en el trabajador de render %s", threading.current_thread().name)
+            with _fallas_lock:
+                _fallas["cantidad"] += 1
+                _fallas["ultima_en"] = datetime.now().isoformat(timespec="seconds")
+                _fallas["ultimo_error"] = f"{type(e).__name__}: {e}"
+            time.sleep(ESPERA_ERROR)
+
+
+@st.cache_resource
+def iniciar_trabajadores():
+    hilos = [
+        threading.Thread(target=_ciclo, name=f"render-{i}", daemon=True)
+        for i in range(TRABAJADORES)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    return hilos
+
+
+def estadisticas_trabajadores():
+    with _fallas_lock:
+        fallas = dict(_fallas)
+    return {
+        "trabajadores_vivos": sum(hilo.is_alive() for hilo in iniciar_trabajadores()),
+        "fallas_del_ciclo": fallas["cantidad"],
+        "ultima_falla_en": fallas["ultima_en"],
+        "ultimo_error": fallas["ultimo_error"]
+    }
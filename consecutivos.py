@@ -0,0 +1,97 @@
+from datetime import date
+
+from database import conexion, ejecutar, nombrar_consulta
+from migraciones import asegurar_esquema
+
+
+# =====================================================
+# CONSECUTIVOS DE PROCESO (NNN-AAAA)
+# =====================================================
+# Un contador por vigencia con incremento atómico. Dos sesiones nunca
+# reciben el mismo número; si una reserva no llega a guardarse queda un
+# hueco en la numeración, lo cual es aceptable. La tabla se crea (y se
+# alinea con los procesos existentes) en migraciones.py.
+
+SQL_RESERVAR = nombrar_consulta("reservar_consecutivo", """
+    INSERT INTO consecutivos_proceso (vigencia, ultimo)
+    VALUES (%s, %s)
+    ON CONFLICT (vigencia)
+    DO UPDATE SET ultimo = consecutivos_proceso.ultimo + EXCLUDED.ultimo
+    RETURNING ultimo
+""")
+
+# Para importaciones masivas: numera dentro de la misma transacción las filas
+# de una tabla temporal que llegan sin ID. Primero sube el contador por
+# encima de los IDs explícitos de la tabla para no chocar con ellos.
+SQL_ALINEAR_TABLA = """
+    INSERT INTO consecutivos_proceso (vigencia, ultimo)
+    SELECT split_part(id_proceso, '-', 2)::integer,
+           MAX(split_part(id_proceso, '-', 1)::integer)
+      FROM {tabla}
+     WHERE id_proceso IS NOT NULL
+     GROUP BY 1
+    ON CONFLICT (vigencia)
+    DO UPDATE SET ultimo = GREATEST(consecutivos_proceso.ultimo, EXCLUDED.ultimo)
+"""
+
+SQL_NUMERAR_TABLA = """
+    WITH pendientes AS (
+        SELECT fila,
+               EXTRACT(YEAR FROM fecha_estudio)::integer AS vigencia,
+               ROW_NUMBER() OVER w AS n,
+               COUNT(*) OVER (PARTITION BY EXTRACT(YEAR FROM fecha_estudio)) AS total
+          FROM {tabla}
+         WHERE id_proceso IS NULL
+        WINDOW w AS (PARTITION BY EXTRACT(YEAR FROM fecha_estudio) ORDER BY fila)
+    ),
+    reserva AS (
+        INSERT INTO consecutivos_proceso (vigencia, ultimo)
+        SELECT vigencia, COUNT(*) FROM pendientes GROUP BY vigencia
+        ON CONFLICT (vigencia)
+        DO UPDATE SET ultimo = consecutivos_proceso.ultimo + EXCLUDED.ultimo
+        RETURNING vigencia, ultimo
+    ),
+    numeros AS (
+        SELECT p.fila, p.vigencia, (r.ultimo - p.total + p.n)::text AS numero
+          FROM pendientes p
+          JOIN reserva r USING (vigencia)
+    )
+    UPDATE {tabla} t
+       SET id_proceso = lpad(n.numero, GREATEST(3, length(n.numero)), '0') || '-' || n.vigencia
+      FROM numeros n
+     WHERE t.fila = n.fila
+"""
+
+
+def formatear_id(numero, vigencia):
+    return f"{numero:03d}-{vigencia}"
+
+
+def reservar_ids(cantidad, vigencia=None):
+    if cantidad < 1:
+        return []
+
+    vigencia = vigencia or date.today().year
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_RESERVAR, (vigencia, cantidad))
+        ultimo = cursor.fetchone()[0]
+
+    return [
+        formatear_id(numero, vigencia)
+        for numero in range(ultimo - cantidad + 1, ultimo + 1)
+    ]
+
+
+def reservar_id(vigencia=None):
+    return reservar_ids(1, vigencia)[0]
+
+
+def asignar_ids_tabla(cursor, tabla):
+    # La tabla necesita las columnas fila, id_proceso y fecha_estudio
+    asegurar_esquema()
+    cursor.execute(SQL_ALINEAR_TABLA.format(tabla=tabla))
+    cursor.execute(SQL_NUMERAR_TABLA.format(tabla=tabla))
+    return cursor.rowcount
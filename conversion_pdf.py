@@ -0,0 +1,300 @@
+import argparse
+import atexit
+import importlib.util
+import os
+import queue
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, wait
+from functools import lru_cache
+
+import streamlit as st
+
+from almacenamiento import huella, obtener_almacenamiento
+
+
+# =====================================================
+# CONVERSIÓN A PDF CON LIBREOFFICE
+# =====================================================
+# CONVERTIDORES servidores unoserver (LibreOffice sin interfaz) se arrancan
+# una sola vez y quedan vivos: cada documento paga solo la conversión, no
+# el arranque de LibreOffice. Cada servidor lo atiende un hilo que toma
+# pedidos de una cola acotada; si la cola está llena, quien encola espera
+# hasta ESPERA_COLA (contrapresión) y luego recibe ColaLlena.
+#
+# El PDF se guarda una sola vez como blob; el derivado de la huella del
+# DOCX apunta a él, así que un DOCX idéntico nunca se convierte dos veces,
+# y se agrega al manifiesto del proceso junto al DOCX con esa huella como
+# "origen".
+#
+# Requiere LibreOffice y unoserver instalado con el Python de LibreOffice
+# (en Debian: libreoffice-writer-nogui, python3-uno y
+# "/usr/bin/python3 -m pip install unoserver"); UNOSERVER_COMANDO en
+# secrets si el ejecutable no está en el PATH. El paquete de pip trae el
+# cliente y el comando pero no LibreOffice: si falta alguno de los dos,
+# disponible() es False y la aplicación sigue solo con DOCX.
+#
+# Cada servidor escucha en puertos libres que elige el sistema, así que la
+# aplicación, la línea de comandos y varias réplicas en la misma máquina no
+# chocan.
+
+CONVERTIDORES = 2
+COLA_MAX = 8
+ESPERA_COLA = 30            # segundos que espera un productor con la cola llena
+ESPERA_ARRANQUE = 60        # segundos para que un servidor acepte conexiones
+TIEMPO_MAX_CONVERSION = 120  # unoserver reinicia LibreOffice si se excede
+
+COMANDO_SERVIDOR = "unoserver"
+EJECUTABLES_LIBREOFFICE = ("soffice", "libreoffice")
+
+
+class ColaLlena(RuntimeError):
+    pass
+
+
+class _Pedido:
+
+    def __init__(self, contenido, id_proceso, nombre):
+        self.contenido = contenido
+        self.huella = huella(contenido)
+        self.id_proceso = id_proceso
+        self.nombre = nombre
+        self.futuro = Future()
+
+
+_cola = queue.Queue(maxsize=COLA_MAX)
+_convertidores = []
+_lock = threading.Lock()
+
+
+def _comando():
+    return shlex.split(st.secrets.get("UNOSERVER_COMANDO", COMANDO_SERVIDOR))
+
+
+@lru_cache(maxsize=1)
+def _libreoffice_instalado():
+    if any(shutil.which(ejecutable) for ejecutable in EJECUTABLES_LIBREOFFICE):
+        return True
+    return importlib.util.find_spec("uno") is not None
+
+
+def disponible():
+    return shutil.which(_comando()[0]) is not None and _libreoffice_instalado()
+
+
+def _puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# =====================================================
+# SERVIDORES
+# =====================================================
+
+class _Convertidor:
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.puerto = None
+        # Perfil propio: dos LibreOffice no pueden compartir uno
+        self.perfil = os.path.join(tempfile.gettempdir(), f"unoserver_{os.getpid()}_{indice}")
+        self.proceso = None
+
+    def vivo(self):
+        return self.proceso is not None and self.proceso.poll() is None
+
+    def iniciar(self):
+        # Puertos nuevos en cada arranque: si otro proceso tomó uno entre la
+        # consulta y el arranque, el servidor termina y el siguiente pedido
+        # reintenta con otros
+        self.puerto = _puerto_libre()
+        self.proceso = subprocess.Popen(
+            _comando() + [
+                "--port", str(self.puerto),
+                "--uno-port", str(_puerto_libre()),
+                "--user-installation", f"file://{self.perfil}",
+                "--conversion-timeout", str(TIEMPO_MAX_CONVERSION),
+                "--quiet"
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+        limite = time.monotonic() + ESPERA_ARRANQUE
+        while time.monotonic() < limite:
+            if not self.vivo():
+                raise RuntimeError(f"El convertidor {self.indice} (puerto {self.puerto}) terminó al arrancar.")
+            try:
+                with socket.create_connection(("127.0.0.1", self.puerto), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.5)
+
+        self.detener()
+        raise RuntimeError(f"El convertidor {self.indice} (puerto {self.puerto}) no respondió.")
+
+    def detener(self):
+        if self.proceso is None:
+            return
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+        self.proceso = None
+
+    def convertir(self, contenido):
+        from unoserver.client import UnoClient
+
+        if not self.vivo():
+            self.iniciar()
+        return UnoClient(port=str(self.puerto)).convert(indata=contenido, convert_to="pdf")
+
+
+def _atender(convertidor):
+    # Arranca de una vez para que el primer documento no espere a
+    # LibreOffice; si falla, se reintenta con cada pedido y el error le
+    # llega a quien lo pidió
+    try:
+        convertidor.iniciar()
+    except Exception:
+        pass
+
+    while True:
+        pedido = _cola.get()
+        if not pedido.futuro.set_running_or_notify_cancel():
+            continue
+
+        try:
+            pdf = convertidor.convertir(pedido.contenido)
+            _guardar(pedido, pdf)
+            pedido.futuro.set_result(pdf)
+        except Exception as e:
+            # LibreOffice se reinicia con el siguiente pedido
+            convertidor.detener()
+            pedido.futuro.set_exception(e)
+
+
+def _detener_todos():
+    for convertidor in _convertidores:
+        convertidor.detener()
+
+
+def iniciar_convertidores(cantidad=CONVERTIDORES):
+    with _lock:
+        if not _convertidores and disponible():
+            for indice in range(cantidad):
+                convertidor = _Convertidor(indice)
+                threading.Thread(
+                    target=_atender,
+                    args=(convertidor,),
+                    name=f"pdf-{indice}",
+                    daemon=True
+                ).start()
+                _convertidores.append(convertidor)
+            atexit.register(_detener_todos)
+    return list(_convertidores)
+
+
+# =====================================================
+# PEDIDOS
+# =====================================================
+
+def _guardar(pedido, pdf):
+    almacenamiento = obtener_almacenamiento()
+    almacenamiento.guardar_derivado(pedido.huella, "pdf", pdf)
+    if pedido.id_proceso:
+        almacenamiento.guardar_documento(
+            pedido.id_proceso, pedido.nombre, pdf, origen=pedido.huella
+        )
+
+
+def nombre_pdf(nombre_docx):
+    return f"{os.path.splitext(nombre_docx)[0]}.pdf"
+
+
+def solicitar_pdf(contenido, id_proceso=None, nombre=None):
+    # Devuelve un Future con los bytes del PDF. Con id_proceso, el PDF queda
+    # además en el manifiesto del proceso con el nombre dado.
+    pedido = _Pedido(contenido, id_proceso, nombre)
+
+    pdf = obtener_almacenamiento().leer_derivado(pedido.huella, "pdf")
+    if pdf is not None:
+        if id_proceso:
+            obtener_almacenamiento().guardar_documento(
+                id_proceso, nombre, pdf, origen=pedido.huella
+            )
+        pedido.futuro.set_result(pdf)
+        return pedido.futuro
+
+    if not iniciar_convertidores():
+        raise RuntimeError("La conversión a PDF no está disponible (falta LibreOffice/unoserver).")
+
+    try:
+        _cola.put(pedido, timeout=ESPERA_COLA)
+    except queue.Full:
+        raise ColaLlena("La cola de conversión a PDF está llena; intente más tarde.")
+
+    return pedido.futuro
+
+
+def convertir_a_pdf(contenido, id_proceso=None, nombre=None, espera=None):
+    return solicitar_pdf(contenido, id_proceso, nombre).result(timeout=espera)
+
+
+def pdf_de_documento(id_proceso, nombre_docx):
+    # Convierte un DOCX ya guardado del proceso y devuelve el Future
+    almacenamiento = obtener_almacenamiento()
+    contenido = b"".join(almacenamiento.iterar_documento(id_proceso, nombre_docx))
+    return solicitar_pdf(contenido, id_proceso, nombre_pdf(nombre_docx))
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+# python conversion_pdf.py 001-2026 002-2026 --convertidores 4
+# Convierte todos los DOCX guardados de los procesos indicados.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera el PDF de los documentos de cada proceso.")
+    parser.add_argument("ids", nargs="+", help="IDs de proceso (NNN-AAAA)")
+    parser.add_argument("--convertidores", type=int, default=CONVERTIDORES)
+    args = parser.parse_args(argv)
+
+    if not disponible():
+        print("No se encontró unoserver/LibreOffice.", file=sys.stderr)
+        return 1
+
+    iniciar_convertidores(args.convertidores)
+    almacenamiento = obtener_almacenamiento()
+
+    # La cola acotada frena este bucle cuando los convertidores van atrás
+    futuros = {}
+    for id_proceso in args.ids:
+        for nombre, _ in almacenamiento.documentos(id_proceso):
+            if nombre.endswith(".docx"):
+                futuros[pdf_de_documento(id_proceso, nombre)] = f"{id_proceso}/{nombre}"
+
+    wait(futuros)
+
+    errores = 0
+    for futuro, documento in futuros.items():
+        if futuro.exception():
+            errores += 1
+            print(f"{documento}\tERROR\t{futuro.exception()}")
+        else:
+            print(f"{documento}\tOK\t{nombre_pdf(documento)}")
+
+    _detener_todos()
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,161 @@
+import threading
+import time
+
 import psycopg
 import streamlit as st
+from psycopg_pool import ConnectionPool
+
+
+# =====================================================
+# POOL DE CONEXIONES (UNO POR PROCESO)
+# =====================================================
+
+POOL_MIN = 1
+POOL_MAX = 5
+POOL_MAX_IDLE = 300      # segundos antes de cerrar conexiones ociosas
+POOL_TIMEOUT = 10        # segundos esperando una conexión libre
+
+
+# =====================================================
+# CONTADOR DE CONSULTAS POR RERUN
+# =====================================================
+# Streamlit ejecuta cada sesión en su propio hilo, así que un contador por
+# hilo equivale a un contador por rerun si se reinicia al inicio del script.
+
+_contador = threading.local()
+
+
+def reiniciar_contador_consultas():
+    _contador.total = 0
+
+
+def consultas_en_rerun():
+    return getattr(_contador, "total", 0)
+
+
+# =====================================================
+# LATENCIA POR CONSULTA
+# =====================================================
+# Cada execute se cronometra y se acumula por consulta: con el nombre
+# registrado en nombrar_consulta() o, si no tiene, con el comienzo del SQL.
+# Es global al proceso (todas las sesiones) y se consulta en la página de
+# Configuración.
+
+_latencias = {}
+_nombres = {}
+_lock_latencias = threading.Lock()
+
+
+def nombrar_consulta(nombre, sql):
+    _nombres[sql] = nombre
+    return sql
+
+
+def _clave_consulta(query):
+    if isinstance(query, str):
+        return _nombres.get(query) or " ".join(query.split())[:80]
+    return " ".join(str(query).split())[:80]
+
+
+def registrar_latencia(clave, segundos):
+    if not clave:
+        # Consulta vacía: la verificación de conexiones del pool
+        return
+    with _lock_latencias:
+        llamadas, total, maximo = _latencias.get(clave, (0, 0.0, 0.0))
+        _latencias[clave] = (llamadas + 1, total + segundos, max(maximo, segundos))
+
+
+def estadisticas_consultas():
+    with _lock_latencias:
+        filas = list(_latencias.items())
+
+    return [
+        {
+            "CONSULTA": clave,
+            "LLAMADAS": llamadas,
+            "MS_PROMEDIO": round(total / llamadas * 1000, 2),
+            "MS_MAX": round(maximo * 1000, 2),
+            "MS_TOTAL": round(total * 1000, 1)
+        }
+        for clave, (llamadas, total, maximo) in sorted(filas, key=lambda f: -f[1][1])
+    ]
+
+
+def reiniciar_estadisticas_consultas():
+    with _lock_latencias:
+        _latencias.clear()
+
+
+def _contar(query):
+    # La consulta vacía con que el pool verifica cada conexión al prestarla
+    # no cuenta para el presupuesto del rerun
+    clave = _clave_consulta(query)
+    if clave:
+        _contador.total = consultas_en_rerun() + 1
+    return clave
+
+
+class CursorContado(psycopg.Cursor):
+
+    def execute(self, query, params=None, **kwargs):
+        clave = _contar(query)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            registrar_latencia(clave, time.perf_counter() - inicio)
+
+    def executemany(self, query, params_seq, **kwargs):
+        clave = _contar(query)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            registrar_latencia(clave, time.perf_counter() - inicio)
+
+
+# =====================================================
+# SENTENCIAS PREPARADAS
+# =====================================================
+# Las consultas frecuentes se ejecutan con prepare=True: el servidor las
+# analiza y planifica una vez por conexión. El pooler de Supabase en modo
+# transacción (puerto 6543) no admite sentencias preparadas; ahí va
+# DB_SENTENCIAS_PREPARADAS = false en secrets.
+
+def sentencias_preparadas():
+    return bool(st.secrets.get("DB_SENTENCIAS_PREPARADAS", True))
+
+
+def ejecutar(cursor, sql, params=None):
+    return cursor.execute(sql, params, prepare=sentencias_preparadas())
+
+
+@st.cache_resource
+def obtener_pool():
+    parametros = {"cursor_factory": CursorContado}
+    if not sentencias_preparadas():
+        parametros["prepare_threshold"] = None
+
+    return ConnectionPool(
+        st.secrets["DATABASE_URL"],
+        min_size=int(st.secrets.get("DB_POOL_MIN", POOL_MIN)),
+        max_size=int(st.secrets.get("DB_POOL_MAX", POOL_MAX)),
+        max_idle=POOL_MAX_IDLE,
+        timeout=POOL_TIMEOUT,
+        check=ConnectionPool.check_connection,
+        kwargs=parametros,
+        name="gestion_contractual",
+        open=True
+    )
+
+
+def conexion():
+    # Uso: with conexion() as conn: ...
+    # Al salir hace commit, o rollback si hubo excepción, y devuelve la
+    # conexión al pool.
+    return obtener_pool().connection()
+
 
-def conectar_db():
-    return psycopg.connect(st.secrets["DATABASE_URL"])
+def estadisticas_pool():
+    return obtener_pool().get_stats()
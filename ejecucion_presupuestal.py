@@ -0,0 +1,279 @@
+import argparse
+import csv
+import sys
+
+from database import conexion, ejecutar, nombrar_consulta
+from migraciones import asegurar_esquema
+from moneda import formatear_moneda, parsear_monto
+
+
+# =====================================================
+# LIBRO DE EJECUCIÓN PRESUPUESTAL POR RUBRO
+# =====================================================
+# movimientos_presupuestales es el libro (solo se insertan filas) y
+# saldos_rubro lleva el acumulado por (vigencia, centro, programa, rubro).
+# Cada guardado registra solo la diferencia frente a lo que el proceso ya
+# tenía comprometido, dentro de la misma transacción del guardado, así que
+# consultar un saldo es leer una fila por llave primaria.
+#
+# saldos_rubro.apropiado es la apropiación del rubro en la vigencia (se
+# carga con cargar_apropiaciones o desde la línea de comandos). Si existe,
+# un guardado que deja el comprometido por encima de ella se rechaza con
+# SaldoInsuficiente y la transacción completa se revierte. Las reducciones
+# siempre se aceptan. La importación masiva sigue la misma regla.
+
+SQL_NETO_PROCESO = nombrar_consulta("neto_proceso", """
+    SELECT vigencia, centro_costos, programa, rubro, SUM(valor)
+    FROM movimientos_presupuestales
+    WHERE id_proceso = %s AND tipo = %s
+    GROUP BY vigencia, centro_costos, programa, rubro
+    HAVING SUM(valor) <> 0
+""")
+
+SQL_MOVIMIENTO = nombrar_consulta("movimiento_presupuestal", """
+    INSERT INTO movimientos_presupuestales
+    (id_proceso, tipo, vigencia, centro_costos, programa, rubro, valor)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+""")
+
+# La fila queda bloqueada hasta el commit: dos guardados sobre el mismo
+# rubro se validan uno después del otro
+SQL_ACUMULAR = nombrar_consulta("acumular_saldo_rubro", """
+    INSERT INTO saldos_rubro
+    (vigencia, centro_costos, programa, rubro, comprometido, contratado)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (vigencia, centro_costos, programa, rubro)
+    DO UPDATE SET
+        comprometido = saldos_rubro.comprometido + EXCLUDED.comprometido,
+        contratado = saldos_rubro.contratado + EXCLUDED.contratado
+    RETURNING comprometido, apropiado
+""")
+
+SQL_PROCESO_CONTRATO = nombrar_consulta("proceso_para_contrato", """
+    SELECT EXTRACT(YEAR FROM fecha_estudio)::integer, centro_costos,
+           programa, rubro, valor
+    FROM procesos
+    WHERE id_proceso = %s
+    FOR UPDATE
+""")
+
+SQL_SALDO_RUBRO = nombrar_consulta("saldo_rubro", """
+    SELECT comprometido, contratado, apropiado
+    FROM saldos_rubro
+    WHERE vigencia = %s AND centro_costos = %s
+      AND programa = %s AND rubro = %s
+""")
+
+SQL_APROPIAR = """
+    INSERT INTO saldos_rubro (vigencia, centro_costos, programa, rubro, apropiado)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (vigencia, centro_costos, programa, rubro)
+    DO UPDATE SET apropiado = EXCLUDED.apropiado
+"""
+
+# Encabezados del archivo de apropiaciones
+COLUMNAS_APROPIACION = ("VIGENCIA", "CENTRO_COSTOS", "PROGRAMA", "RUBRO", "APROPIADO")
+
+
+class SaldoInsuficiente(ValueError):
+
+    def __init__(self, llave, disponible, solicitado):
+        self.llave = llave
+        self.disponible = disponible
+        self.solicitado = solicitado
+        vigencia, centro, programa, rubro = llave
+        super().__init__(
+            f"El rubro {rubro} ({centro} / {programa}, {vigencia}) no tiene saldo: "
+            f"disponible {formatear_moneda(disponible)}, se requieren {formatear_moneda(solicitado)}."
+        )
+
+
+def _acumular(cursor, llave, delta, delta_contratado):
+    ejecutar(cursor, SQL_ACUMULAR, (*llave, delta, delta_contratado))
+    comprometido, apropiado = cursor.fetchone()
+
+    if delta > 0 and apropiado is not None and comprometido > apropiado:
+        raise SaldoInsuficiente(llave, apropiado - comprometido + delta, delta)
+
+
+def _mover(cursor, id_proceso, tipo, llave, delta):
+    ejecutar(cursor, SQL_MOVIMIENTO, (id_proceso, tipo, *llave, delta))
+    _acumular(cursor, llave, delta, delta if tipo == "CONTRATO" else 0)
+
+
+def registrar_compromiso(cursor, id_proceso, tipo, vigencia, centro, programa, rubro, valor):
+    # Deja el compromiso neto del proceso (para ese tipo) en `valor` sobre la
+    # llave indicada. Usa el cursor del guardado para quedar en su
+    # transacción. Sin rubro o con valor 0 solo se reversa lo anterior.
+    llave_nueva = (vigencia, centro, programa, rubro)
+    valor = valor or 0
+    if not all(llave_nueva):
+        valor = 0
+
+    ejecutar(cursor, SQL_NETO_PROCESO, (id_proceso, tipo))
+    anteriores = {tuple(fila[:4]): fila[4] for fila in cursor.fetchall()}
+
+    for llave, neto in anteriores.items():
+        if llave != llave_nueva:
+            _mover(cursor, id_proceso, tipo, llave, -neto)
+
+    delta = valor - anteriores.get(llave_nueva, 0)
+    if delta:
+        _mover(cursor, id_proceso, tipo, llave_nueva, delta)
+
+
+def _tiene_contrato(cursor, id_proceso):
+    ejecutar(cursor, SQL_NETO_PROCESO, (id_proceso, "CONTRATO"))
+    return cursor.fetchone() is not None
+
+
+def comprometer_estudio(cursor, id_proceso, vigencia, centro, programa, rubro, valor):
+    # Si el proceso ya tiene contrato, el nuevo valor del estudio se aplica
+    # al compromiso contractual en lugar de sumarse como estudio.
+    tipo = "CONTRATO" if _tiene_contrato(cursor, id_proceso) else "ESTUDIO"
+    registrar_compromiso(cursor, id_proceso, tipo, vigencia, centro, programa, rubro, valor)
+
+
+def comprometer_contrato(cursor, id_proceso):
+    # Pasa el compromiso del estudio previo a contratado. El proceso queda
+    # bloqueado hasta el commit para que dos guardados simultáneos no lean
+    # el mismo neto y lo muevan dos veces.
+    ejecutar(cursor, SQL_PROCESO_CONTRATO, (id_proceso,))
+    fila = cursor.fetchone()
+    if fila is None:
+        return
+
+    vigencia, centro, programa, rubro, valor = fila
+    registrar_compromiso(cursor, id_proceso, "ESTUDIO", vigencia, centro, programa, rubro, 0)
+    registrar_compromiso(cursor, id_proceso, "CONTRATO", vigencia, centro, programa, rubro, valor)
+
+
+def saldo_rubro(vigencia, centro, programa, rubro):
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_SALDO_RUBRO, (vigencia, centro, programa, rubro))
+        fila = cursor.fetchone()
+
+    comprometido, contratado, apropiado = fila or (0, 0, None)
+
+    return {
+        "comprometido": comprometido,
+        "contratado": contratado,
+        "apropiado": apropiado,
+        "disponible": None if apropiado is None else apropiado - comprometido
+    }
+
+
+def cargar_apropiaciones(filas):
+    # filas: (vigencia, centro, programa, rubro, apropiado). Reemplaza la
+    # apropiación de cada rubro sin tocar lo comprometido.
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(SQL_APROPIAR, list(filas))
+        return cursor.rowcount
+
+
+def leer_apropiaciones(ruta):
+    # CSV con COLUMNAS_APROPIACION; los montos admiten formato COP
+    with open(ruta, encoding="utf-8-sig", newline="") as archivo:
+        lector = csv.DictReader(archivo)
+        faltantes = [c for c in COLUMNAS_APROPIACION if c not in (lector.fieldnames or [])]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en {ruta}: {', '.join(faltantes)}")
+
+        filas = []
+        for numero, fila in enumerate(lector, start=2):
+            apropiado = parsear_monto(fila["APROPIADO"])
+            if apropiado is None:
+                raise ValueError(f"Fila {numero}: APROPIADO no es un monto válido.")
+            filas.append((
+                int(fila["VIGENCIA"]),
+                fila["CENTRO_COSTOS"].strip(),
+                fila["PROGRAMA"].strip(),
+                fila["RUBRO"].strip(),
+                apropiado
+            ))
+        return filas
+
+
+# =====================================================
+# IMPORTACIÓN MASIVA
+# =====================================================
+# Deja el compromiso neto de cada proceso importado igual a su fila, como
+# registrar_compromiso pero para todo el lote en una sentencia: el libro
+# recibe la diferencia entre lo deseado y lo que ya había (con reversos si
+# cambió el rubro, el valor o el tipo). Un proceso con contrato compromete
+# como CONTRATO.
+
+SQL_COMPROMETER_IMPORTACION = """
+    WITH deseado AS (
+        SELECT i.id_proceso,
+               CASE WHEN EXISTS (
+                   SELECT 1 FROM contratos c WHERE c.id_proceso = i.id_proceso
+               ) THEN 'CONTRATO' ELSE 'ESTUDIO' END AS tipo,
+               EXTRACT(YEAR FROM i.fecha_estudio)::integer AS vigencia,
+               i.centro_costos, i.programa, i.rubro, i.valor
+        FROM {tabla} i
+        WHERE i.centro_costos IS NOT NULL
+          AND i.programa IS NOT NULL
+          AND i.rubro IS NOT NULL
+          AND coalesce(i.valor, 0) <> 0
+    ),
+    actual AS (
+        SELECT m.id_proceso, m.tipo, m.vigencia, m.centro_costos,
+               m.programa, m.rubro, SUM(m.valor) AS valor
+        FROM movimientos_presupuestales m
+        JOIN {tabla} i ON i.id_proceso = m.id_proceso
+        GROUP BY m.id_proceso, m.tipo, m.vigencia, m.centro_costos, m.programa, m.rubro
+    ),
+    nuevos AS (
+        INSERT INTO movimientos_presupuestales
+        (id_proceso, tipo, vigencia, centro_costos, programa, rubro, valor)
+        SELECT id_proceso, tipo, vigencia, centro_costos, programa, rubro,
+               coalesce(d.valor, 0) - coalesce(a.valor, 0)
+        FROM deseado d
+        FULL JOIN actual a
+            USING (id_proceso, tipo, vigencia, centro_costos, programa, rubro)
+        WHERE coalesce(d.valor, 0) <> coalesce(a.valor, 0)
+        RETURNING tipo, vigencia, centro_costos, programa, rubro, valor
+    )
+    SELECT vigencia, centro_costos, programa, rubro,
+           SUM(valor),
+           coalesce(SUM(valor) FILTER (WHERE tipo = 'CONTRATO'), 0)
+    FROM nuevos
+    GROUP BY vigencia, centro_costos, programa, rubro
+"""
+
+
+def comprometer_importacion(cursor, tabla):
+    # Llamar después de cargar procesos y contratos del lote. Un rubro que
+    # queda sobre su apropiación levanta SaldoInsuficiente y revierte toda
+    # la importación.
+    cursor.execute(SQL_COMPROMETER_IMPORTACION.format(tabla=tabla))
+    for vigencia, centro, programa, rubro, delta, delta_contratado in cursor.fetchall():
+        _acumular(cursor, (vigencia, centro, programa, rubro), delta, delta_contratado)
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+# python ejecucion_presupuestal.py apropiaciones.csv
+# Columnas: VIGENCIA, CENTRO_COSTOS, PROGRAMA, RUBRO, APROPIADO
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga la apropiación de cada rubro por vigencia.")
+    parser.add_argument("archivo", help="CSV con " + ", ".join(COLUMNAS_APROPIACION))
+    args = parser.parse_args(argv)
+
+    filas = leer_apropiaciones(args.archivo)
+    cargar_apropiaciones(filas)
+    print(f"{len(filas)} apropiaciones cargadas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+from datetime import date
+
+import streamlit as st
+import catalogo
+import instantaneas
+from almacenamiento import obtener_almacenamiento
+from database import conexion, ejecutar, nombrar_consulta
+from migraciones import asegurar_esquema
+from moneda import formatear_moneda
+
+
+# =====================================================
+# ESTADO DEL PROCESO (UNA SOLA CONSULTA POR RERUN)
+# =====================================================
+# Trae en un solo viaje las filas de procesos, planeacion y contratos del
+# ID_PROCESO, más su última instantánea. El resultado queda en caché unos
+# segundos y se invalida con invalidar_estado_proceso() después de cada
+# guardado. El manifiesto de documentos del proceso (en S3, un LIST más un
+# GET por documento) se guarda en caché igual y se invalida también cuando
+# termina un trabajo de render o una conversión a PDF.
+
+TTL_ESTADO = 60
+
+SQL_ESTADO = nombrar_consulta("estado_proceso", """
+    SELECT
+        (SELECT row_to_json(p)
+           FROM procesos p
+          WHERE p.id_proceso = %(id)s),
+        (SELECT row_to_json(pl)
+           FROM public.planeacion pl
+          WHERE pl.id_proceso = %(id)s
+          LIMIT 1),
+        (SELECT row_to_json(c)
+           FROM contratos c
+          WHERE c.id_proceso = %(id)s
+          ORDER BY c.fecha_firma DESC NULLS LAST
+          LIMIT 1),
+        (SELECT row_to_json(i)
+           FROM instantaneas_proceso i
+          WHERE i.id_proceso = %(id)s
+          ORDER BY i.version DESC
+          LIMIT 1)
+""")
+
+
+@st.cache_data(ttl=TTL_ESTADO, show_spinner=False)
+def cargar_estado_proceso(id_proceso):
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_ESTADO, {"id": id_proceso})
+        proceso, planeacion, contrato, instantanea = cursor.fetchone()
+
+    return {
+        "proceso": proceso,
+        "planeacion": planeacion,
+        "contrato": contrato,
+        "instantanea": instantanea
+    }
+
+
+@st.cache_data(ttl=TTL_ESTADO, show_spinner=False)
+def cargar_manifiesto(id_proceso):
+    return obtener_almacenamiento().manifiesto(id_proceso)
+
+
+def invalidar_estado_proceso():
+    cargar_estado_proceso.clear()
+    formulario_proceso.clear()
+    cargar_manifiesto.clear()
+
+
+# =====================================================
+# FORMULARIO HIDRATADO (CARGAR PROCESO)
+# =====================================================
+# Traduce el estado del proceso a las llaves de session_state de los
+# widgets de las tres etapas. La Etapa 1 sale de la última instantánea;
+# los procesos sin instantánea (importados o anteriores a la tabla) se
+# completan con las columnas de procesos.
+
+# Llave del widget -> columna de la fila
+CAMPOS_PROCESO = {
+    "objeto": "objeto",
+    "justificacion": "justificacion",
+    "necesidad": "necesidad",
+    "caracteristicas_tecnicas": "caracteristicas_tecnicas",
+    "forma_pago": "forma_pago",
+    "analisis": "analisis"
+}
+
+CAMPOS_PLANEACION = {
+    "tipo1": "tipo1",
+    "nombre1": "nombre1",
+    "id1": "identificacion1",
+    "rep1": "representante1",
+    "cc_rep1": "cc_representante1",
+    "tipo2": "tipo2",
+    "nombre2": "nombre2",
+    "id2": "identificacion2",
+    "rep2": "representante2",
+    "cc_rep2": "cc_representante2"
+}
+
+CAMPOS_CONTRATO = {
+    "tipo_contrato": "tipo_contrato",
+    "supervisor": "supervisor",
+    "cdp": "cdp"
+}
+
+# Todas las llaves que un proceso cargado puede traer; al cargar otro
+# proceso se borran primero para que no se mezclen valores
+LLAVES_FORMULARIO = (
+    list(instantaneas.CAMPOS_ETAPA_1)
+    + list(CAMPOS_PLANEACION) + ["valor1", "valor2"]
+    + list(CAMPOS_CONTRATO) + ["fecha_firma"]
+)
+
+
+def _etiqueta(opciones, codigo):
+    # "4100" -> "4100 - REGISTROS PUBLICOS" dentro de las opciones del selectbox
+    prefijo = f"{codigo} - "
+    return next((o for o in opciones if o.startswith(prefijo)), None)
+
+
+def _copiar(fila, campos, valores):
+    for llave, columna in campos.items():
+        if fila.get(columna) is not None:
+            valores[llave] = fila[columna]
+
+
+def _etapa_1_desde_columnas(proceso, valores):
+    _copiar(proceso, CAMPOS_PROCESO, valores)
+
+    if proceso.get("valor") is not None:
+        valores["valor_ep"] = formatear_moneda(proceso["valor"], simbolo=False)
+    if proceso.get("plazo"):
+        valores["plazo"] = int(proceso["plazo"])
+    if proceso.get("fecha_estudio"):
+        valores["fecha_estudio"] = date.fromisoformat(proceso["fecha_estudio"])
+    if proceso.get("modalidad"):
+        valores["modalidad_unica"] = proceso["modalidad"]
+
+    centro = _etiqueta(catalogo.ETIQUETAS_CENTROS, proceso.get("centro_costos"))
+    if centro:
+        valores["centro_costos_select"] = centro
+        programa = _etiqueta(
+            catalogo.programas_de_centro(proceso["centro_costos"]),
+            proceso.get("programa")
+        )
+        if programa:
+            valores["programa_select"] = programa
+            rubro = _etiqueta(
+                catalogo.rubros_de_programa(proceso["programa"]),
+                proceso.get("rubro")
+            )
+            if rubro:
+                valores["rubro_select"] = rubro
+
+
+@st.cache_data(ttl=TTL_ESTADO, show_spinner=False)
+def formulario_proceso(id_proceso):
+    estado = cargar_estado_proceso(id_proceso)
+    valores = {}
+
+    if estado["proceso"]:
+        _etapa_1_desde_columnas(estado["proceso"], valores)
+
+    if estado["instantanea"]:
+        valores.update(instantaneas.restaurar_formulario(
+            estado["instantanea"]["formulario"]
+        ))
+
+    planeacion = estado["planeacion"]
+    if planeacion:
+        _copiar(planeacion, CAMPOS_PLANEACION, valores)
+        for llave in ("valor1", "valor2"):
+            if planeacion.get(llave):
+                valores[llave] = formatear_moneda(planeacion[llave], simbolo=False)
+
+    contrato = estado["contrato"]
+    if contrato:
+        _copiar(contrato, CAMPOS_CONTRATO, valores)
+        if contrato.get("fecha_firma"):
+            valores["fecha_firma"] = date.fromisoformat(contrato["fecha_firma"])
+
+    return valores
+
+
+# =====================================================
+# CARGA MASIVA (GENERACIÓN POR LOTE)
+# =====================================================
+
+SQL_ESTADOS = nombrar_consulta("estados_proceso", """
+    SELECT
+        p.id_proceso,
+        row_to_json(p),
+        (SELECT row_to_json(pl)
+           FROM public.planeacion pl
+          WHERE pl.id_proceso = p.id_proceso
+          LIMIT 1),
+        (SELECT row_to_json(c)
+           FROM contratos c
+          WHERE c.id_proceso = p.id_proceso
+          ORDER BY c.fecha_firma DESC NULLS LAST
+          LIMIT 1),
+        (SELECT row_to_json(i)
+           FROM instantaneas_proceso i
+          WHERE i.id_proceso = p.id_proceso
+          ORDER BY i.version DESC
+          LIMIT 1)
+    FROM procesos p
+    WHERE p.id_proceso = ANY(%s)
+""")
+
+
+def cargar_estados(ids_proceso):
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_ESTADOS, (list(ids_proceso),))
+        filas = cursor.fetchall()
+
+    return {
+        id_proceso: {
+            "proceso": proceso,
+            "planeacion": planeacion,
+            "contrato": contrato,
+            "instantanea": instantanea
+        }
+        for id_proceso, proceso, planeacion, contrato, instantanea in filas
+    }
@@ -0,0 +1,380 @@
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+from letras import valores_en_letras
+from database import conexion
+from migraciones import asegurar_esquema
+
+
+# =====================================================
+# EXTRACCIÓN MASIVA DE PROCESOS (FORMATO procesos.xlsx)
+# =====================================================
+# Para control interno y revisoría fiscal. Las filas salen de un cursor del
+# lado del servidor en bloques de TAM_BLOQUE y se escriben en seguida, así
+# que la memoria no crece con el número de procesos. Las columnas siguen el
+# orden de procesos.xlsx; las que solo viven en el formulario salen de la
+# última instantánea, VALOR_LETRAS se deriva del valor y las que la base
+# aún no guarda salen vacías.
+
+TAM_BLOQUE = 5000
+
+FORMATOS = ["xlsx", "csv", "parquet"]
+
+# (encabezado, expresión SQL, tipo)
+COLUMNAS = [
+    ("ID_PROCESO", "p.id_proceso", "texto"),
+    ("OBJETO", "p.objeto", "texto"),
+    ("NECESIDAD", "p.necesidad", "texto"),
+    ("JUSTIFICACION", "p.justificacion", "texto"),
+    ("CENTRO_DE_COSTOS", "p.centro_costos", "texto"),
+    ("PROGRAMA", "p.programa", "texto"),
+    ("RUBRO", "p.rubro", "texto"),
+    ("CODIGO_PLANEACION", "i.contexto->>'CODIGO_PLANEACION'", "texto"),
+    ("CARACTERÍSTICAS_TÉCNICAS_DEL_BIEN", "p.caracteristicas_tecnicas", "texto"),
+    ("OPORTUNIDAD", "i.contexto->>'OPORTUNIDAD'", "texto"),
+    ("FORMA_DE_PAGO", "p.forma_pago", "texto"),
+    ("MODALIDAD", "p.modalidad", "texto"),
+    ("ARTICULO", "i.contexto->>'ARTICULO'", "texto"),
+    ("NUMERAL", "i.contexto->>'NUMERAL'", "texto"),
+    ("LITERAL", "i.contexto->>'LITERAL'", "texto"),
+    ("VALOR", "p.valor", "numero"),
+    ("VALOR_LETRAS", None, "texto"),
+    ("PLAZO", "p.plazo", "entero"),
+    ("ANÁLISIS_DE_LAS_CONDICIONES_Y_PRECIOS_DEL_MERCADO", "p.analisis", "texto"),
+    ("GARANTIAS", "i.contexto->>'GARANTIAS'", "texto"),
+    ("CONTRATO_DE", "c.tipo_contrato", "texto"),
+    ("CONTRATISTA_PERSONA_NATURAL", None, "texto"),
+    ("CONTRATISTA_PERSONA_JURIDICA", None, "texto"),
+    ("NIT", None, "texto"),
+    ("IDENTIFICACION", None, "texto"),
+    ("N_IDENTIFICACION", None, "texto"),
+    ("DURACION", None, "texto"),
+    ("EMPRESA", None, "texto"),
+    ("SUPERVISOR", "c.supervisor", "texto"),
+    ("DISPONE", None, "texto"),
+    ("CDP", "c.cdp", "texto"),
+    ("FECHA_ESTUDIO", "p.fecha_estudio", "fecha"),
+    ("PROPONENTE_1", "pl.nombre1", "texto"),
+    ("VALOR_PROP_1", "pl.valor1", "numero"),
+    ("PROPONENTE_2", "pl.nombre2", "texto"),
+    ("VALOR_PROP_2", "pl.valor2", "numero"),
+    ("CARACTERISTICAS_TECNICAS", "p.caracteristicas_tecnicas", "texto"),
+    ("IDENTIFICACION_PN", None, "texto"),
+    ("IDENTIFICACION_PJ", None, "texto"),
+    ("FECHA_FIRMA", "c.fecha_firma", "fecha"),
+    ("ANALISIS_MERCADO", "p.analisis", "texto"),
+    ("GARANTIAS_CONTRACTUALES", None, "texto"),
+    ("FECHA", "p.fecha_estudio", "fecha"),
+    ("CENTRO_COSTOS", "p.centro_costos", "texto"),
+    ("CARACTERISTICAS", "p.caracteristicas_tecnicas", "texto"),
+    ("FORMA_PAGO", "p.forma_pago", "texto")
+]
+
+ENCABEZADOS = [encabezado for encabezado, _, _ in COLUMNAS]
+
+POS_VALOR = ENCABEZADOS.index("VALOR")
+POS_VALOR_LETRAS = ENCABEZADOS.index("VALOR_LETRAS")
+
+# planeacion, contratos e instantaneas_proceso se reducen a una fila por
+# proceso con DISTINCT ON, que para una extracción completa es más barato
+# que una subconsulta por fila
+SQL_EXTRACCION = """
+    SELECT {columnas}
+      FROM procesos p
+      LEFT JOIN (
+            SELECT DISTINCT ON (id_proceso) *
+              FROM public.planeacion
+             ORDER BY id_proceso
+      ) pl ON pl.id_proceso = p.id_proceso
+      LEFT JOIN (
+            SELECT DISTINCT ON (id_proceso) *
+              FROM contratos
+             ORDER BY id_proceso, fecha_firma DESC NULLS LAST
+      ) c ON c.id_proceso = p.id_proceso
+      LEFT JOIN (
+            SELECT DISTINCT ON (id_proceso) id_proceso, contexto
+              FROM instantaneas_proceso
+             ORDER BY id_proceso, version DESC
+      ) i ON i.id_proceso = p.id_proceso
+     WHERE {condiciones}
+     ORDER BY p.fecha_estudio, p.id_proceso
+"""
+
+COLUMNAS_SQL = ",\n           ".join(
+    expresion or "NULL" for _, expresion, _ in COLUMNAS
+)
+
+
+def _consulta(vigencia=None, estado=None):
+    condiciones = ["TRUE"]
+    parametros = {}
+
+    if vigencia:
+        condiciones.append(
+            "p.fecha_estudio >= make_date(%(vigencia)s, 1, 1) "
+            "AND p.fecha_estudio < make_date(%(vigencia)s + 1, 1, 1)"
+        )
+        parametros["vigencia"] = int(vigencia)
+
+    if estado:
+        condiciones.append("p.estado = %(estado)s")
+        parametros["estado"] = estado
+
+    sql = SQL_EXTRACCION.format(
+        columnas=COLUMNAS_SQL,
+        condiciones=" AND ".join(condiciones)
+    )
+    return sql, parametros
+
+
+def _con_letras(bloque):
+    # VALOR_LETRAS no se guarda; se calcula por bloque, solo la cifra como
+    # en procesos.xlsx
+    letras = valores_en_letras((fila[POS_VALOR] for fila in bloque), moneda=False)
+    return [
+        fila[:POS_VALOR_LETRAS] + (texto or None,) + fila[POS_VALOR_LETRAS + 1:]
+        for fila, texto in zip(bloque, letras)
+    ]
+
+
+def iterar_bloques(vigencia=None, estado=None, tam_bloque=TAM_BLOQUE):
+    # Genera listas de tuplas en el orden de COLUMNAS
+    sql, parametros = _consulta(vigencia, estado)
+
+    with conexion() as conn:
+        with conn.cursor(name="extraccion_procesos") as cursor:
+            cursor.itersize = tam_bloque
+            cursor.execute(sql, parametros)
+
+            while True:
+                bloque = cursor.fetchmany(tam_bloque)
+                if not bloque:
+                    break
+                yield _con_letras(bloque)
+
+
+# =====================================================
+# ESCRITORES
+# =====================================================
+
+# XLSX mínimo escrito a mano: openpyxl crea un objeto por celda y con
+# cientos de miles de filas tarda casi un minuto. Aquí cada bloque se
+# vuelve XML de una vez y se comprime directo al ZIP.
+XLSX_FIJOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilo 1 = fecha corta (formato integrado 14)
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+}
+
+EPOCA_EXCEL = date(1899, 12, 30)
+
+_CARACTERES_INVALIDOS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _letra_columna(indice):
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+LETRAS = [_letra_columna(i) for i in range(len(COLUMNAS))]
+TIPOS = [tipo for _, _, tipo in COLUMNAS]
+
+
+def _celda_texto(ref, valor):
+    texto = escape(_CARACTERES_INVALIDOS.sub("", str(valor)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(numero, fila):
+    celdas = []
+    for letra, tipo, valor in zip(LETRAS, TIPOS, fila):
+        if valor is None:
+            continue
+        ref = f"{letra}{numero}"
+        if tipo == "fecha":
+            celdas.append(f'<c r="{ref}" s="1"><v>{(valor - EPOCA_EXCEL).days}</v></c>')
+        elif tipo in ("numero", "entero"):
+            celdas.append(f'<c r="{ref}"><v>{valor}</v></c>')
+        else:
+            celdas.append(_celda_texto(ref, valor))
+    return f'<row r="{numero}">{"".join(celdas)}</row>'
+
+
+def _escribir_xlsx(bloques, destino):
+    filas = 0
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as libro:
+        for nombre, contenido in XLSX_FIJOS.items():
+            libro.writestr(nombre, contenido)
+
+        with libro.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as hoja:
+            encabezado = "".join(
+                _celda_texto(f"{letra}1", nombre)
+                for letra, nombre in zip(LETRAS, ENCABEZADOS)
+            )
+            hoja.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<sheetData><row r="1">{encabezado}</row>'
+            ).encode("utf-8"))
+
+            for bloque in bloques:
+                hoja.write("".join(
+                    _fila_xml(filas + i, fila)
+                    for i, fila in enumerate(bloque, start=2)
+                ).encode("utf-8"))
+                filas += len(bloque)
+
+            hoja.write(b"</sheetData></worksheet>")
+
+    return filas
+
+
+def _escribir_csv(bloques, destino):
+    # utf-8-sig para que Excel abra las tildes sin asistente de importación
+    filas = 0
+    with open(destino, "w", newline="", encoding="utf-8-sig") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(ENCABEZADOS)
+        for bloque in bloques:
+            escritor.writerows(bloque)
+            filas += len(bloque)
+    return filas
+
+
+def _escribir_parquet(bloques, destino):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("La exportación a Parquet requiere el paquete pyarrow.")
+
+    tipos = {
+        "texto": pa.string(),
+        "numero": pa.decimal128(20, 2),
+        "entero": pa.int64(),
+        "fecha": pa.date32()
+    }
+    esquema = pa.schema([
+        (encabezado, tipos[tipo]) for encabezado, _, tipo in COLUMNAS
+    ])
+
+    filas = 0
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as escritor:
+        for bloque in bloques:
+            columnas = list(zip(*bloque))
+            escritor.write_batch(pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema
+            ))
+            filas += len(bloque)
+    return filas
+
+
+ESCRITORES = {
+    "xlsx": _escribir_xlsx,
+    "csv": _escribir_csv,
+    "parquet": _escribir_parquet
+}
+
+
+def exportar_procesos(destino, formato=None, vigencia=None, estado=None):
+    # Escribe en un temporal y renombra: un archivo a medias nunca queda con
+    # el nombre final
+    formato = formato or os.path.splitext(destino)[1].lstrip(".").lower()
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato no soportado: {formato}. Use uno de {', '.join(FORMATOS)}.")
+
+    asegurar_esquema()
+
+    inicio = time.perf_counter()
+    temporal = f"{destino}.tmp"
+    try:
+        filas = ESCRITORES[formato](iterar_bloques(vigencia, estado), temporal)
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+    return filas, time.perf_counter() - inicio
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+# python exportacion_procesos.py extracto_2026.xlsx --vigencia 2026
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Exporta los procesos en el formato de columnas de procesos.xlsx."
+    )
+    parser.add_argument("destino", help="Archivo de salida (.xlsx, .csv o .parquet)")
+    parser.add_argument("--formato", choices=FORMATOS)
+    parser.add_argument("--vigencia", type=int)
+    parser.add_argument("--estado")
+    args = parser.parse_args(argv)
+
+    filas, segundos = exportar_procesos(
+        args.destino, args.formato, args.vigencia, args.estado
+    )
+
+    print(
+        f"{filas} procesos exportados a {args.destino} en {segundos:.2f} s "
+        f"({filas / segundos if segundos else 0:,.0f} filas/s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
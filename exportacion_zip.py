@@ -0,0 +1,116 @@
+import io
+import os
+import tempfile
+import zipfile
+
+from almacenamiento import ArchivoDemasiadoGrande, TAM_BLOQUE, obtener_almacenamiento
+
+
+# =====================================================
+# EXPORTACIÓN ZIP EN STREAMING
+# =====================================================
+# El ZIP se construye por bloques: cada archivo se lee en trozos de
+# TAM_BLOQUE y los bytes comprimidos se entregan apenas se producen, así que
+# la memoria usada no depende del tamaño de la carpeta. Los archivos del
+# proceso salen del almacenamiento configurado (disco o S3) según su
+# manifiesto.
+
+
+class _SalidaPorBloques(io.RawIOBase):
+    # Destino no buscable para ZipFile: acumula lo escrito hasta que el
+    # generador lo recoge con vaciar().
+
+    def __init__(self):
+        self._bloques = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._bloques.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b"".join(self._bloques)
+        self._bloques.clear()
+        return datos
+
+
+def iterar_zip(archivos=(), documentos=()):
+    # archivos:   iterable de (nombre_en_zip, iterable_de_bloques)
+    # documentos: iterable de (nombre_en_zip, bytes); puede ser un generador
+    #             que renderiza cada plantilla justo antes de escribirla.
+    salida = _SalidaPorBloques()
+
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as zf:
+
+        for nombre, bloques in archivos:
+            with zf.open(nombre, "w", force_zip64=True) as destino:
+                for bloque in bloques:
+                    destino.write(bloque)
+                    datos = salida.vaciar()
+                    if datos:
+                        yield datos
+
+        for nombre, contenido in documentos:
+            zf.writestr(nombre, contenido)
+            yield salida.vaciar()
+
+    yield salida.vaciar()
+
+
+def _archivos_del_proceso(id_proceso, tam_bloque):
+    almacenamiento = obtener_almacenamiento()
+    for nombre, _ in almacenamiento.documentos(id_proceso):
+        yield nombre, almacenamiento.iterar_documento(id_proceso, nombre, tam_bloque)
+
+
+def iterar_zip_proceso(id_proceso, documentos=(), tam_bloque=TAM_BLOQUE):
+    archivos = _archivos_del_proceso(id_proceso, tam_bloque)
+
+    for datos in iterar_zip(archivos, documentos):
+        if datos:
+            yield datos
+
+
+def exportar_proceso(id_proceso, destino, documentos=()):
+    temporal = f"{destino}.tmp"
+
+    with open(temporal, "wb") as archivo:
+        for datos in iterar_zip_proceso(id_proceso, documentos):
+            archivo.write(datos)
+
+    os.replace(temporal, destino)
+    return destino
+
+
+# =====================================================
+# EXPORTACIÓN PARA DESCARGA WEB
+# =====================================================
+
+def exportar_para_descarga(id_proceso, documentos=()):
+    # Arma el ZIP en un temporal y lo publica en el almacenamiento
+    # configurado: en S3 como URL prefirmada, en disco bajo static/ con un
+    # nombre imposible de adivinar. El almacenamiento local tiene un límite
+    # de tamaño; si la carpeta ya lo supera no se arma el ZIP.
+    almacenamiento = obtener_almacenamiento()
+    nombre = f"Proceso_{id_proceso}.zip"
+
+    if almacenamiento.limite_enlace is not None:
+        tamano = sum(entrada["tamano"] for _, entrada in almacenamiento.documentos(id_proceso))
+        if tamano > almacenamiento.limite_enlace:
+            raise ArchivoDemasiadoGrande(nombre, tamano, almacenamiento.limite_enlace)
+
+    descriptor, temporal = tempfile.mkstemp(suffix=".zip")
+    os.close(descriptor)
+    try:
+        exportar_proceso(id_proceso, temporal, documentos)
+        return almacenamiento.publicar_exportacion(temporal, nombre)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
@@ -0,0 +1,341 @@
+import argparse
+import io
+import os
+import sys
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import motor_plantillas
+import repositorio
+from almacenamiento import obtener_almacenamiento
+from estructura_presupuestal import estructura_presupuestal
+from letras import valor_en_letras
+from moneda import formatear_moneda, parsear_monto
+
+
+# =====================================================
+# GENERACIÓN DEL PAQUETE CONTRACTUAL POR LOTE
+# =====================================================
+# Carga los datos de todos los procesos en una sola consulta y reparte el
+# render de las ocho plantillas entre un pool de procesos. Cada paquete
+# Paquete_<ID>.zip queda en el almacenamiento configurado, o en una carpeta
+# de salida si se indica una (--salida).
+#
+# Los procesos hijos se crean con "spawn", no con fork: el servidor de
+# Streamlit tiene hilos (trabajadores de render, pool de conexiones) que
+# pueden tener candados tomados en el momento del fork, y un hijo que los
+# hereda tomados se bloquea. Cada hijo arranca limpio y carga sus propias
+# plantillas; no abre conexiones a la base.
+
+NOMBRES_ARCHIVO = {
+    "estudio_previo": "Estudio_Previo",
+    "solicitud_cdp": "Solicitud_CDP",
+    "invitacion_cotizar": "Invitacion_Cotizar",
+    "invitacion_1_presentar_propuesta": "Invitacion_1_Presentar_Propuesta",
+    "invitacion_2_presentar_propuesta": "Invitacion_2_Presentar_Propuesta",
+    "acta_recibo_propuestas": "Acta_Recibo_Propuestas",
+    "verificacion_requisitos": "Verificacion_de_Requisitos",
+    "contrato": "Contrato"
+}
+
+
+# (fila del estado, columna de la base, marcador de las plantillas). Solo
+# estas columnas llegan a los documentos; una columna puede alimentar
+# varios marcadores.
+CAMPOS_PLANTILLAS = [
+    ("proceso", "objeto", "OBJETO"),
+    ("proceso", "necesidad", "NECESIDAD"),
+    ("proceso", "justificacion", "JUSTIFICACION"),
+    ("proceso", "valor", "VALOR"),
+    ("proceso", "plazo", "PLAZO"),
+    ("proceso", "fecha_estudio", "FECHA_ESTUDIO"),
+    ("proceso", "modalidad", "MODALIDAD"),
+    ("proceso", "centro_costos", "CENTRO_COSTOS"),
+    ("proceso", "programa", "PROGRAMA"),
+    ("proceso", "rubro", "RUBRO"),
+    ("proceso", "caracteristicas_tecnicas", "CARACTERISTICAS_TECNICAS"),
+    ("proceso", "forma_pago", "FORMA_PAGO"),
+    ("proceso", "analisis", "ANALISIS"),
+    ("planeacion", "nombre1", "PROPONENTE_1"),
+    ("planeacion", "valor1", "VALOR_PROP_1"),
+    ("planeacion", "nombre2", "PROPONENTE_2"),
+    ("planeacion", "valor2", "VALOR_PROP_2"),
+    ("contrato", "tipo_contrato", "TIPO_CONTRATO"),
+    ("contrato", "tipo_contrato", "CONTRATO_DE"),
+    ("contrato", "supervisor", "SUPERVISOR"),
+    ("contrato", "cdp", "CDP"),
+    ("contrato", "fecha_firma", "FECHA_FIRMA")
+]
+
+# Van a las plantillas con separadores COP ("25.000.000")
+MARCADORES_MONTO = ("VALOR", "VALOR_PROP_1", "VALOR_PROP_2")
+
+# procesos.plazo se guarda como entero en días
+UNIDAD_PLAZO = "Días"
+
+FECHA_ZIP = (1980, 1, 1, 0, 0, 0)
+
+
+def _valor_propuesta(propuesta):
+    # Una propuesta sin valor no gana
+    valor = parsear_monto(propuesta["valor"])
+    return float("inf") if valor is None else valor
+
+
+def _contratista(planeacion):
+    # El contrato se adjudica a la propuesta de menor valor. Para persona
+    # jurídica firma el representante legal con su cédula.
+    propuestas = [
+        {campo: planeacion.get(f"{campo}{n}") for campo in repositorio.CAMPOS_PROPONENTE}
+        for n in (1, 2)
+    ]
+    propuestas = [p for p in propuestas if p["nombre"]]
+    if not propuestas:
+        return {}
+
+    ganadora = min(propuestas, key=_valor_propuesta)
+
+    if ganadora["tipo"] == "Persona Jurídica":
+        return {
+            "CONTRATISTA_PERSONA_NATURAL": ganadora["representante"] or "",
+            "CONTRATISTA_PERSONA_JURIDICA": ganadora["nombre"],
+            "IDENTIFICACION": "C.C.",
+            "N_IDENTIFICACION": ganadora["cc_representante"] or "",
+            "NIT": f" / NIT {ganadora['identificacion'] or ''}"
+        }
+
+    return {
+        "CONTRATISTA_PERSONA_NATURAL": ganadora["nombre"],
+        "CONTRATISTA_PERSONA_JURIDICA": "",
+        "IDENTIFICACION": "C.C.",
+        "N_IDENTIFICACION": ganadora["identificacion"] or "",
+        "NIT": ""
+    }
+
+
+def plazo_texto(plazo, unidad):
+    # "1 mes", "45 días"
+    singular = {"Días": "día", "Meses": "mes"}
+    plural = {"Días": "días", "Meses": "meses"}
+    return f"{plazo} {(singular if plazo == 1 else plural).get(unidad, unidad.lower())}"
+
+
+def contexto_documentos(id_proceso, estado):
+    # Contexto para las ocho plantillas a partir de las filas guardadas
+    # (CAMPOS_PLANTILLAS) y de la última instantánea, que prevalece. Los
+    # marcadores sin dato en la base (DISPONE, EMPRESA) quedan por fuera y
+    # aparecen en faltantes_documentos.
+    contexto = {}
+
+    for fila, columna, marcador in CAMPOS_PLANTILLAS:
+        valores = estado.get(fila) or {}
+        if columna in valores:
+            valor = valores[columna]
+            contexto[marcador] = "" if valor is None else valor
+
+    contexto["ID_PROCESO"] = id_proceso
+    contexto["VALOR_LETRAS"] = valor_en_letras(contexto.get("VALOR"), sufijo="")
+
+    for marcador in MARCADORES_MONTO:
+        if marcador in contexto:
+            contexto[marcador] = formatear_moneda(contexto[marcador], simbolo=False)
+
+    contexto.update(_contratista(estado.get("planeacion") or {}))
+
+    centro = estructura_presupuestal.get((estado.get("proceso") or {}).get("centro_costos"))
+    if centro:
+        contexto["AREA_SOLICITANTE"] = centro["nombre"]
+
+    instantanea = estado.get("instantanea")
+    if instantanea:
+        contexto.update(instantanea["contexto"])
+
+    # PLAZO de la instantánea ya trae la unidad ("30 días"); la columna de la
+    # base es un entero en días, la unidad por defecto del formulario
+    plazo = contexto.get("PLAZO")
+    if isinstance(plazo, int):
+        contexto["PLAZO"] = plazo_texto(plazo, UNIDAD_PLAZO)
+    if "PLAZO" in contexto:
+        contexto["DURACION"] = str(contexto["PLAZO"])
+
+    return contexto
+
+
+def faltantes_documentos(contexto):
+    # {plantilla: [marcadores sin valor en el contexto]}, solo las incompletas
+    faltantes = {}
+    for nombre in NOMBRES_ARCHIVO:
+        ausentes = motor_plantillas.faltantes(nombre, contexto)
+        if ausentes:
+            faltantes[nombre] = sorted(ausentes)
+    return faltantes
+
+
+def nombre_paquete(id_proceso):
+    return f"Paquete_{id_proceso}.zip"
+
+
+def generar_paquete(id_proceso, contexto, dir_salida=None, estricto=False):
+    # Devuelve (ubicación, faltantes): la ruta escrita, o
+    # "<ID>/Paquete_<ID>.zip" si quedó en el almacenamiento, y los campos que
+    # cada plantilla no encontró (quedan en blanco). Con estricto, un campo
+    # faltante en cualquiera de las plantillas detiene el paquete antes de
+    # renderizar la primera.
+    faltantes = faltantes_documentos(contexto)
+    if estricto and faltantes:
+        nombre, ausentes = next(iter(faltantes.items()))
+        raise motor_plantillas.ContextoIncompleto(nombre, ausentes)
+
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as paquete:
+        for nombre, prefijo in NOMBRES_ARCHIVO.items():
+            # Fecha fija: el mismo contenido produce el mismo ZIP y el
+            # almacenamiento no guarda un blob nuevo en cada lote
+            paquete.writestr(
+                zipfile.ZipInfo(f"{prefijo}_{id_proceso}.docx", FECHA_ZIP),
+                motor_plantillas.renderizar(nombre, contexto),
+                zipfile.ZIP_DEFLATED
+            )
+
+    nombre = nombre_paquete(id_proceso)
+
+    if dir_salida is None:
+        obtener_almacenamiento().guardar_documento(id_proceso, nombre, buffer.getvalue())
+        return f"{id_proceso}/{nombre}", faltantes
+
+    ruta = os.path.join(dir_salida, id_proceso, nombre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+
+    with open(temporal, "wb") as archivo:
+        archivo.write(buffer.getvalue())
+
+    os.replace(temporal, ruta)
+    return ruta, faltantes
+
+
+def _iniciar_trabajador():
+    motor_plantillas.precargar()
+
+
+def _trabajo(id_proceso, contexto, dir_salida, estricto):
+    try:
+        ruta, faltantes = generar_paquete(id_proceso, contexto, dir_salida, estricto)
+        return id_proceso, ruta, None, faltantes
+    except Exception as e:
+        return id_proceso, None, str(e), {}
+
+
+def generar_lote(ids_proceso, dir_salida=None, trabajadores=None, progreso=None,
+                 estricto=False):
+    # progreso(hechos, total, id_proceso) se llama al terminar cada proceso.
+    # Devuelve {id_proceso: (ubicacion_zip | None, error | None, faltantes)},
+    # con faltantes como en faltantes_documentos.
+    # Import diferido: los procesos hijos solo renderizan, no consultan.
+    from estado_proceso import cargar_estados
+
+    ids_proceso = list(dict.fromkeys(ids_proceso))
+    estados = cargar_estados(ids_proceso)
+
+    resultados = {
+        id_proceso: (None, "El proceso no existe.", {})
+        for id_proceso in ids_proceso
+        if id_proceso not in estados
+    }
+
+    total = len(ids_proceso)
+    hechos = len(resultados)
+
+    with ProcessPoolExecutor(
+        max_workers=trabajadores,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_trabajador
+    ) as pool:
+        futuros = [
+            pool.submit(
+                _trabajo,
+                id_proceso,
+                contexto_documentos(id_proceso, estado),
+                dir_salida,
+                estricto
+            )
+            for id_proceso, estado in estados.items()
+        ]
+
+        for futuro in as_completed(futuros):
+            id_proceso, ruta, error, faltantes = futuro.result()
+            resultados[id_proceso] = (ruta, error, faltantes)
+            hechos += 1
+
+            if progreso:
+                progreso(hechos, total, id_proceso)
+
+    return resultados
+
+
+def describir_faltantes(faltantes):
+    # "contrato: DISPONE, EMPRESA; solicitud_cdp: AREA_SOLICITANTE"
+    return "; ".join(
+        f"{nombre}: {', '.join(ausentes)}"
+        for nombre, ausentes in faltantes.items()
+    )
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+# python generacion_lote.py 001-2026 002-2026 ...
+# python generacion_lote.py --archivo ids.txt --trabajadores 4
+
+def _leer_ids(ruta):
+    with open(ruta, encoding="utf-8") as archivo:
+        return [linea.strip() for linea in archivo if linea.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Genera el paquete contractual (ZIP) de varios procesos."
+    )
+    parser.add_argument("ids", nargs="*", help="IDs de proceso (NNN-AAAA)")
+    parser.add_argument("--archivo", help="Archivo con un ID por línea")
+    parser.add_argument("--salida", help="Carpeta de salida (por defecto, el almacenamiento configurado)")
+    parser.add_argument("--trabajadores", type=int, default=None)
+    parser.add_argument("--estricto", action="store_true",
+                        help="Falla el proceso si a una plantilla le falta un campo")
+    args = parser.parse_args(argv)
+
+    ids_proceso = list(args.ids)
+    if args.archivo:
+        ids_proceso += _leer_ids(args.archivo)
+
+    if not ids_proceso:
+        parser.error("Indique al menos un ID de proceso.")
+
+    def progreso(hechos, total, id_proceso):
+        print(f"[{hechos}/{total}] {id_proceso}", file=sys.stderr)
+
+    resultados = generar_lote(
+        ids_proceso,
+        dir_salida=args.salida,
+        trabajadores=args.trabajadores,
+        progreso=progreso,
+        estricto=args.estricto
+    )
+
+    errores = 0
+    for id_proceso, (ruta, error, faltantes) in resultados.items():
+        if error:
+            errores += 1
+            print(f"{id_proceso}\tERROR\t{error}")
+        elif faltantes:
+            print(f"{id_proceso}\tINCOMPLETO\t{ruta}\t{describir_faltantes(faltantes)}")
+        else:
+            print(f"{id_proceso}\tOK\t{ruta}")
+
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,431 @@
+import argparse
+import csv
+import re
+import sys
+import time
+import unicodedata
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+
+import catalogo
+import ejecucion_presupuestal
+from consecutivos import asignar_ids_tabla
+from database import conexion
+from listado_procesos import MODALIDADES
+from migraciones import asegurar_esquema
+from moneda import parsear_monto
+
+
+# =====================================================
+# IMPORTACIÓN MASIVA DE PROCESOS (FORMATO procesos.xlsx)
+# =====================================================
+# Lee el libro fila por fila en modo de solo lectura (memoria constante),
+# valida contra el catálogo presupuestal y carga todo en una sola
+# transacción: COPY a una tabla temporal y luego un INSERT ... SELECT por
+# tabla destino. Si algo falla no queda nada a medias.
+#
+# Un ID_PROCESO que ya existe se rechaza, salvo con actualizar=True
+# (--actualizar): entonces la fila reemplaza los datos del proceso y el
+# libro presupuestal se ajusta a su nuevo valor y rubro.
+
+TABLA_TEMPORAL = "_importacion_procesos"
+
+COLUMNAS = [
+    "id_proceso", "objeto", "necesidad", "justificacion", "valor", "plazo",
+    "fecha_estudio", "estado", "modalidad", "centro_costos", "programa",
+    "rubro", "caracteristicas_tecnicas", "forma_pago", "analisis",
+    "nombre1", "valor1", "nombre2", "valor2",
+    "tipo_contrato", "supervisor", "cdp", "fecha_firma", "tiene_contrato"
+]
+
+# Encabezado normalizado (mayúsculas, sin tildes) -> campo. Cuando varias
+# columnas alimentan el mismo campo gana la primera con valor.
+ALIAS = {
+    "ID_PROCESO": "id_proceso",
+    "OBJETO": "objeto",
+    "NECESIDAD": "necesidad",
+    "JUSTIFICACION": "justificacion",
+    "VALOR": "valor",
+    "PLAZO": "plazo",
+    "FECHA_ESTUDIO": "fecha_estudio",
+    "FECHA": "fecha_estudio",
+    "MODALIDAD": "modalidad",
+    "CENTRO_COSTOS": "centro_costos",
+    "CENTRO_DE_COSTOS": "centro_costos",
+    "PROGRAMA": "programa",
+    "RUBRO": "rubro",
+    "CARACTERISTICAS_TECNICAS": "caracteristicas_tecnicas",
+    "CARACTERISTICAS_TECNICAS_DEL_BIEN": "caracteristicas_tecnicas",
+    "CARACTERISTICAS": "caracteristicas_tecnicas",
+    "FORMA_PAGO": "forma_pago",
+    "FORMA_DE_PAGO": "forma_pago",
+    "ANALISIS_MERCADO": "analisis",
+    "ANALISIS_DE_LAS_CONDICIONES_Y_PRECIOS_DEL_MERCADO": "analisis",
+    "PROPONENTE_1": "nombre1",
+    "VALOR_PROP_1": "valor1",
+    "PROPONENTE_2": "nombre2",
+    "VALOR_PROP_2": "valor2",
+    "CONTRATO_DE": "tipo_contrato",
+    "SUPERVISOR": "supervisor",
+    "CDP": "cdp",
+    "FECHA_FIRMA": "fecha_firma"
+}
+
+# Modalidad normalizada (mayúsculas, sin tildes) -> valor del catálogo.
+# Además de estas, se acepta cualquier texto que termine en el valor del
+# catálogo ("CONTRATACIÓN DIRECTA", "MODALIDAD PRIVADA").
+ALIAS_MODALIDAD = {
+    "CONTRATACION DIRECTA": "DIRECTA",
+    "INVITACION PRIVADA": "PRIVADA",
+    "CONVOCATORIA PRIVADA": "PRIVADA",
+    "INVITACION ABIERTA": "CONVOCATORIA ABIERTA",
+    "CONVOCATORIA PUBLICA": "CONVOCATORIA ABIERTA"
+}
+
+# Rango de la columna integer de procesos.plazo
+PLAZO_MAXIMO = 2 ** 31 - 1
+
+PATRON_ID = re.compile(r"^\d+-\d{4}$")
+
+SQL_TEMPORAL = f"""
+    CREATE TEMPORARY TABLE {TABLA_TEMPORAL} (
+        fila integer PRIMARY KEY,
+        id_proceso text UNIQUE,
+        objeto text, necesidad text, justificacion text,
+        valor numeric, plazo integer, fecha_estudio date, estado text,
+        modalidad text, centro_costos text, programa text, rubro text,
+        caracteristicas_tecnicas text, forma_pago text, analisis text,
+        nombre1 text, valor1 numeric, nombre2 text, valor2 numeric,
+        tipo_contrato text, supervisor text, cdp text, fecha_firma date,
+        tiene_contrato boolean
+    ) ON COMMIT DROP
+"""
+
+SQL_EXISTENTES = f"""
+    DELETE FROM {TABLA_TEMPORAL} i
+    USING procesos p
+    WHERE p.id_proceso = i.id_proceso
+    RETURNING i.fila, i.id_proceso
+"""
+
+SQL_PROCESOS = f"""
+    INSERT INTO procesos
+    (id_proceso, objeto, necesidad, justificacion, valor, plazo, fecha_estudio,
+     estado, modalidad, centro_costos, programa, rubro,
+     caracteristicas_tecnicas, forma_pago, analisis)
+    SELECT id_proceso, objeto, necesidad, justificacion, valor, plazo, fecha_estudio,
+           estado, modalidad, centro_costos, programa, rubro,
+           caracteristicas_tecnicas, forma_pago, analisis
+    FROM {TABLA_TEMPORAL}
+    ON CONFLICT (id_proceso) DO UPDATE SET
+        objeto = EXCLUDED.objeto,
+        necesidad = EXCLUDED.necesidad,
+        justificacion = EXCLUDED.justificacion,
+        valor = EXCLUDED.valor,
+        plazo = EXCLUDED.plazo,
+        fecha_estudio = EXCLUDED.fecha_estudio,
+        estado = GREATEST(procesos.estado, EXCLUDED.estado),
+        modalidad = EXCLUDED.modalidad,
+        centro_costos = EXCLUDED.centro_costos,
+        programa = EXCLUDED.programa,
+        rubro = EXCLUDED.rubro,
+        caracteristicas_tecnicas = EXCLUDED.caracteristicas_tecnicas,
+        forma_pago = EXCLUDED.forma_pago,
+        analisis = EXCLUDED.analisis
+"""
+
+SQL_PLANEACION = f"""
+    INSERT INTO public.planeacion (id_proceso, nombre1, valor1, nombre2, valor2)
+    SELECT i.id_proceso, i.nombre1, i.valor1, i.nombre2, i.valor2
+    FROM {TABLA_TEMPORAL} i
+    WHERE (i.nombre1 IS NOT NULL OR i.nombre2 IS NOT NULL)
+      AND NOT EXISTS (
+          SELECT 1 FROM public.planeacion p WHERE p.id_proceso = i.id_proceso
+      )
+"""
+
+SQL_CONTRATOS = f"""
+    INSERT INTO contratos (id_proceso, tipo_contrato, supervisor, cdp, fecha_firma)
+    SELECT i.id_proceso, i.tipo_contrato, i.supervisor, i.cdp, i.fecha_firma
+    FROM {TABLA_TEMPORAL} i
+    WHERE i.tiene_contrato
+      AND NOT EXISTS (
+          SELECT 1 FROM contratos c WHERE c.id_proceso = i.id_proceso
+      )
+"""
+
+
+# =====================================================
+# LECTURA Y VALIDACIÓN
+# =====================================================
+
+def normalizar_encabezado(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return texto.strip().upper().replace(" ", "_")
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return texto or None
+
+
+def _codigo(valor):
+    # Acepta "4100" o "4100 - REGISTROS PUBLICOS"
+    texto = _texto(valor)
+    return texto.split(" - ")[0].strip() if texto else None
+
+
+def _numero(valor):
+    if valor is None or valor == "":
+        return None
+    numero = parsear_monto(valor)
+    if numero is None:
+        raise ValueError(f"valor no numérico: {valor!r}")
+    return numero
+
+
+def _entero(valor):
+    # La columna es integer: un 30.5 abortaría el COPY de toda la
+    # importación, así que se rechaza solo la fila
+    numero = _numero(valor)
+    if numero is None:
+        return None
+    if numero != int(numero) or not 0 <= numero <= PLAZO_MAXIMO:
+        raise ValueError(f"no es un número entero de días: {valor!r}")
+    return int(numero)
+
+
+def _modalidad(valor):
+    texto = _texto(valor)
+    if texto is None:
+        return None
+    texto = " ".join(normalizar_encabezado(texto).replace("_", " ").split())
+    texto = ALIAS_MODALIDAD.get(texto, texto)
+    for modalidad in MODALIDADES:
+        if texto == modalidad or texto.endswith(" " + modalidad):
+            return modalidad
+    raise ValueError(f"no corresponde a {', '.join(MODALIDADES)}: {valor!r}")
+
+
+def _fecha(valor):
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"fecha inválida: {valor!r}")
+
+
+def _registro(encabezados, fila):
+    registro = {}
+    for campo, valor in zip(encabezados, fila):
+        if campo and registro.get(campo) in (None, "") and valor not in (None, ""):
+            registro[campo] = valor
+    return registro
+
+
+def validar(registro):
+    # Devuelve (fila_lista_para_copy | None, motivos_de_rechazo)
+    motivos = []
+    fila = dict.fromkeys(COLUMNAS)
+
+    for campo in ("objeto", "necesidad", "justificacion", "caracteristicas_tecnicas",
+                  "forma_pago", "analisis", "nombre1", "nombre2",
+                  "tipo_contrato", "supervisor", "cdp"):
+        fila[campo] = _texto(registro.get(campo))
+
+    id_proceso = _texto(registro.get("id_proceso"))
+    if id_proceso and not PATRON_ID.match(id_proceso):
+        motivos.append(f"ID_PROCESO con formato inválido: {id_proceso}")
+    fila["id_proceso"] = id_proceso
+
+    for campo in ("valor", "valor1", "valor2"):
+        try:
+            fila[campo] = _numero(registro.get(campo))
+        except ValueError as e:
+            motivos.append(f"{campo.upper()}: {e}")
+
+    try:
+        fila["plazo"] = _entero(registro.get("plazo"))
+    except ValueError as e:
+        motivos.append(f"PLAZO: {e}")
+
+    for campo in ("fecha_estudio", "fecha_firma"):
+        try:
+            fila[campo] = _fecha(registro.get(campo))
+        except ValueError as e:
+            motivos.append(f"{campo.upper()}: {e}")
+
+    if fila["fecha_estudio"] is None:
+        motivos.append("FECHA_ESTUDIO es obligatoria")
+
+    if not fila["objeto"]:
+        motivos.append("OBJETO es obligatorio")
+
+    centro = _codigo(registro.get("centro_costos"))
+    programa = _codigo(registro.get("programa"))
+    rubro = _codigo(registro.get("rubro"))
+
+    if centro and not catalogo.centro_valido(centro):
+        motivos.append(f"CENTRO_COSTOS no existe en el catálogo: {centro}")
+    if programa and not catalogo.programa_valido(centro, programa):
+        motivos.append(f"PROGRAMA no pertenece al centro {centro}: {programa}")
+    if rubro and not catalogo.rubro_valido(programa, rubro):
+        motivos.append(f"RUBRO no corresponde al programa {programa}: {rubro}")
+
+    fila["centro_costos"], fila["programa"], fila["rubro"] = centro, programa, rubro
+
+    try:
+        fila["modalidad"] = _modalidad(registro.get("modalidad"))
+    except ValueError as e:
+        motivos.append(f"MODALIDAD: {e}")
+
+    fila["tiene_contrato"] = any(
+        fila[c] is not None
+        for c in ("tipo_contrato", "supervisor", "cdp", "fecha_firma")
+    )
+    if fila["tiene_contrato"]:
+        fila["estado"] = "ETAPA 3"
+    elif fila["nombre1"] or fila["nombre2"]:
+        fila["estado"] = "ETAPA 2"
+    else:
+        fila["estado"] = "ETAPA 1"
+
+    return (None if motivos else fila), motivos
+
+
+def leer_libro(ruta, hoja=None):
+    # Genera (numero_fila, registro) sin cargar el libro en memoria.
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        ws = libro[hoja] if hoja else libro.active
+        filas = ws.iter_rows(values_only=True)
+
+        encabezados = [ALIAS.get(normalizar_encabezado(h)) for h in next(filas, [])]
+
+        for numero, fila in enumerate(filas, start=2):
+            if any(v not in (None, "") for v in fila):
+                yield numero, _registro(encabezados, fila)
+    finally:
+        libro.close()
+
+
+# =====================================================
+# CARGA
+# =====================================================
+
+def importar(ruta, hoja=None, actualizar=False):
+    inicio = time.perf_counter()
+    leidas = 0
+    rechazos = []
+    vistos = set()
+
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_TEMPORAL)
+
+        with cursor.copy(
+            f"COPY {TABLA_TEMPORAL} (fila, {', '.join(COLUMNAS)}) FROM STDIN"
+        ) as copy:
+
+            for numero, registro in leer_libro(ruta, hoja):
+                leidas += 1
+                fila, motivos = validar(registro)
+
+                if fila and fila["id_proceso"] in vistos:
+                    fila, motivos = None, [f"ID_PROCESO repetido: {fila['id_proceso']}"]
+
+                if fila is None:
+                    rechazos.append((numero, motivos))
+                    continue
+
+                if fila["id_proceso"]:
+                    vistos.add(fila["id_proceso"])
+
+                copy.write_row([numero] + [fila[c] for c in COLUMNAS])
+
+        if not actualizar:
+            cursor.execute(SQL_EXISTENTES)
+            for numero, id_proceso in cursor.fetchall():
+                rechazos.append((numero, [
+                    f"ID_PROCESO ya existe: {id_proceso} (use --actualizar para reemplazarlo)"
+                ]))
+            rechazos.sort()
+
+        # Las filas sin ID se numeran aquí, así una importación fallida no
+        # consume consecutivos
+        asignar_ids_tabla(cursor, TABLA_TEMPORAL)
+
+        cursor.execute(SQL_PROCESOS)
+        cargadas = cursor.rowcount
+        cursor.execute(SQL_PLANEACION)
+        cursor.execute(SQL_CONTRATOS)
+        ejecucion_presupuestal.comprometer_importacion(cursor, TABLA_TEMPORAL)
+
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "leidas": leidas,
+        "cargadas": cargadas,
+        "rechazadas": len(rechazos),
+        "rechazos": rechazos,
+        "segundos": segundos,
+        "filas_por_segundo": leidas / segundos if segundos else 0
+    }
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+# python importacion.py procesos.xlsx --rechazos rechazos.csv
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Importa procesos históricos desde un libro con el formato de procesos.xlsx."
+    )
+    parser.add_argument("archivo")
+    parser.add_argument("--hoja", default=None)
+    parser.add_argument(
+        "--actualizar",
+        action="store_true",
+        help="Reemplaza los procesos cuyo ID_PROCESO ya existe"
+    )
+    parser.add_argument("--rechazos", help="CSV donde escribir las filas rechazadas")
+    args = parser.parse_args(argv)
+
+    resultado = importar(args.archivo, hoja=args.hoja, actualizar=args.actualizar)
+
+    print(
+        f"Leídas: {resultado['leidas']} · Cargadas: {resultado['cargadas']} · "
+        f"Rechazadas: {resultado['rechazadas']} · "
+        f"{resultado['segundos']:.2f} s ({resultado['filas_por_segundo']:,.0f} filas/s)"
+    )
+
+    if args.rechazos:
+        with open(args.rechazos, "w", newline="", encoding="utf-8") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(["FILA", "MOTIVOS"])
+            for numero, motivos in resultado["rechazos"]:
+                escritor.writerow([numero, "; ".join(motivos)])
+    else:
+        for numero, motivos in resultado["rechazos"][:20]:
+            print(f"  fila {numero}: {'; '.join(motivos)}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+from datetime import date
+
+from psycopg.types.json import Jsonb
+
+from database import ejecutar, nombrar_consulta
+
+
+# =====================================================
+# INSTANTÁNEAS DEL PROCESO (VERSIONADAS)
+# =====================================================
+# Cada guardado de la Etapa 1 agrega una versión con dos documentos JSONB:
+#   formulario: los valores de los widgets (llaves de session_state), para
+#               devolver la página tal como quedó al CARGAR PROCESO;
+#   contexto:   el contexto completo de la plantilla, para volver a generar
+#               cualquier documento sin depender de la sesión.
+# La última versión se lee por la llave primaria (id_proceso, version).
+
+# El guardado ya bloqueó la fila de procesos con el upsert, así que dos
+# guardados simultáneos del mismo proceso no calculan la misma versión
+SQL_GUARDAR = nombrar_consulta("guardar_instantanea", """
+    INSERT INTO instantaneas_proceso (id_proceso, version, etapa, formulario, contexto)
+    SELECT %(id)s, COALESCE(MAX(version), 0) + 1, %(etapa)s, %(formulario)s, %(contexto)s
+      FROM instantaneas_proceso
+     WHERE id_proceso = %(id)s
+    RETURNING version
+""")
+
+# Llave de session_state -> tipo. Solo estos campos se guardan y se
+# restauran.
+CAMPOS_ETAPA_1 = {
+    "objeto": "texto",
+    "justificacion": "texto",
+    "necesidad": "texto",
+    "valor_ep": "texto",
+    "plazo": "entero",
+    "unidad_plazo": "texto",
+    "fecha_estudio": "fecha",
+    "tipo_presupuesto": "texto",
+    "centro_costos_select": "texto",
+    "programa_select": "texto",
+    "rubro_select": "texto",
+    "actividad_planeacion": "texto",
+    "caracteristicas_tecnicas": "texto",
+    "modalidad_unica": "texto",
+    "numeral_dinamico": "texto",
+    "literal_dinamico": "texto",
+    "meses_oportunidad": "lista",
+    "forma_pago": "texto",
+    "analisis": "texto",
+    "garantias_select": "lista"
+}
+
+
+def _a_json(valor, tipo):
+    if valor is None:
+        return None
+    if tipo == "fecha":
+        return valor.isoformat()
+    if tipo == "entero":
+        return int(valor)
+    if tipo == "lista":
+        return list(valor)
+    return str(valor)
+
+
+def _desde_json(valor, tipo):
+    if valor is None:
+        return None
+    if tipo == "fecha":
+        return date.fromisoformat(valor)
+    if tipo == "entero":
+        return int(valor)
+    if tipo == "lista":
+        return list(valor)
+    return str(valor)
+
+
+def formulario_de(estado, campos=CAMPOS_ETAPA_1):
+    # estado: st.session_state o cualquier mapeo con las mismas llaves
+    return {
+        llave: _a_json(estado.get(llave), tipo)
+        for llave, tipo in campos.items()
+        if estado.get(llave) is not None
+    }
+
+
+def restaurar_formulario(formulario, campos=CAMPOS_ETAPA_1):
+    return {
+        llave: _desde_json(valor, campos[llave])
+        for llave, valor in (formulario or {}).items()
+        if llave in campos
+    }
+
+
+def guardar_instantanea(cursor, id_proceso, etapa, formulario, contexto):
+    # Con el cursor del guardado: la versión existe solo si el guardado se
+    # confirma
+    ejecutar(cursor, SQL_GUARDAR, {
+        "id": id_proceso,
+        "etapa": etapa,
+        "formulario": Jsonb(formulario),
+        "contexto": Jsonb(contexto)
+    })
+    return cursor.fetchone()[0]
@@ -0,0 +1,132 @@
+import argparse
+import random
+import sys
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from num2words import num2words
+
+
+# =====================================================
+# VALORES EN LETRAS (PESOS COLOMBIANOS)
+# =====================================================
+# num2words deja "uno" en todas las posiciones; delante de un sustantivo
+# (mil, millones, pesos) el español exige la forma apocopada:
+# "veintiún millones", "treinta y un mil", "ciento un pesos".
+# "de" solo va cuando la cifra termina en millón/millones/billón/billones:
+# "dos millones de pesos", pero "dos millones quinientos mil pesos".
+
+CACHE_MAX = 4096
+
+APOCOPES = {
+    "uno": "un",
+    "veintiuno": "veintiún"
+}
+
+TERMINAN_EN_DE = {"MILLÓN", "MILLONES", "BILLÓN", "BILLONES"}
+
+SUFIJO = " M/CTE"
+
+
+def _entero(valor):
+    # Redondea al peso; acepta int, float, Decimal o texto numérico
+    if isinstance(valor, int):
+        return valor
+    return int(Decimal(str(valor)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def _palabras(numero):
+    palabras = [APOCOPES.get(p, p) for p in num2words(numero, lang="es").split()]
+    return " ".join(palabras).upper()
+
+
+def valor_en_letras(valor, moneda=True, sufijo=SUFIJO):
+    # moneda=False devuelve solo la cifra (columna VALOR_LETRAS de
+    # procesos.xlsx); las plantillas escriben su propio "M/CTE" y piden
+    # sufijo="".
+    if valor is None or valor == "":
+        return ""
+
+    numero = _entero(valor)
+    if numero == 0:
+        return ""
+
+    signo = "MENOS " if numero < 0 else ""
+    palabras = signo + _palabras(abs(numero))
+    if not moneda:
+        return palabras
+
+    if abs(numero) == 1:
+        return f"{palabras} PESO{sufijo}"
+
+    conector = " DE " if palabras.rsplit(" ", 1)[-1] in TERMINAN_EN_DE else " "
+    return f"{palabras}{conector}PESOS{sufijo}"
+
+
+def valores_en_letras(valores, moneda=True, sufijo=SUFIJO):
+    # Para columnas completas (exportaciones, lotes): cada monto distinto se
+    # convierte una sola vez
+    convertidos = {}
+    resultado = []
+    for valor in valores:
+        clave = valor if isinstance(valor, (int, Decimal)) else str(valor)
+        if clave not in convertidos:
+            convertidos[clave] = valor_en_letras(valor, moneda, sufijo)
+        resultado.append(convertidos[clave])
+    return resultado
+
+
+def limpiar_cache():
+    _palabras.cache_clear()
+
+
+# =====================================================
+# MICRO-BENCHMARK
+# =====================================================
+# python letras.py --montos 20000 --repeticiones 5
+
+def _valor_en_letras_anterior(valor):
+    # Implementación original de app.py, solo como referencia
+    if valor == 0:
+        return ""
+    texto = num2words(valor, lang="es")
+    texto = texto.replace("uno", "un")
+    return texto.upper() + " DE PESOS M/CTE"
+
+
+def _medir(funcion, montos, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(montos)
+    return (time.perf_counter() - inicio) / (repeticiones * len(montos)) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara la conversión de valores a letras.")
+    parser.add_argument("--montos", type=int, default=20000)
+    parser.add_argument("--distintos", type=int, default=2000,
+                        help="Montos distintos entre los generados (los reruns repiten valores)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    generador = random.Random(2026)
+    base = [generador.randrange(1, 10**9) for _ in range(args.distintos)]
+    montos = [generador.choice(base) for _ in range(args.montos)]
+
+    casos = [
+        ("anterior", lambda m: [_valor_en_letras_anterior(v) for v in m]),
+        ("nueva, caché fría", lambda m: (limpiar_cache(), [valor_en_letras(v) for v in m])),
+        ("nueva, caché caliente", lambda m: [valor_en_letras(v) for v in m]),
+        ("nueva, por lote", valores_en_letras)
+    ]
+
+    for nombre, funcion in casos:
+        print(f"{nombre:<24}{_medir(funcion, montos, args.repeticiones):>10.2f} µs/monto")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
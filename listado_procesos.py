@@ -0,0 +1,110 @@
+import busqueda
+from database import conexion, ejecutar, nombrar_consulta
+from migraciones import asegurar_esquema
+
+
+# =====================================================
+# LISTADO DE PROCESOS (PAGINACIÓN POR LLAVE)
+# =====================================================
+# Las páginas se recorren con la llave (fecha_estudio, id_proceso) de la
+# última fila vista en lugar de OFFSET, de modo que cualquier página cuesta
+# lo mismo que la primera. Todos los filtros se resuelven en el servidor,
+# cada uno con su índice (migraciones.py, versiones 3 y 11).
+
+TAM_PAGINA = 25
+
+ESTADOS = ["ETAPA 1", "ETAPA 2", "ETAPA 3"]
+MODALIDADES = ["DIRECTA", "PRIVADA", "CONVOCATORIA ABIERTA"]
+
+# Llave de orden. fecha_estudio admite NULL y una comparación con NULL nunca
+# es verdadera: sin esto, una página que termina en un proceso sin fecha
+# dejaba inalcanzables los siguientes. Los procesos sin fecha van al final.
+# Los índices del listado están sobre esta misma expresión.
+FECHA_ORDEN = "coalesce(fecha_estudio, '-infinity'::date)"
+
+
+def consulta_pagina(
+    vigencia=None,
+    estado=None,
+    modalidad=None,
+    centro_costos=None,
+    texto=None,
+    despues_de=None,
+    tam_pagina=TAM_PAGINA
+):
+    # (sql, parametros) de una página; pide una fila de más para saber si
+    # hay página siguiente
+    condiciones = []
+    parametros = {"limite": tam_pagina + 1}
+
+    if vigencia:
+        condiciones.append(
+            f"{FECHA_ORDEN} >= make_date(%(vigencia)s, 1, 1) "
+            f"AND {FECHA_ORDEN} < make_date(%(vigencia)s + 1, 1, 1)"
+        )
+        parametros["vigencia"] = int(vigencia)
+
+    if estado:
+        condiciones.append("estado = %(estado)s")
+        parametros["estado"] = estado
+
+    if modalidad:
+        condiciones.append("modalidad = %(modalidad)s")
+        parametros["modalidad"] = modalidad
+
+    if centro_costos:
+        condiciones.append("centro_costos = %(centro)s")
+        parametros["centro"] = centro_costos
+
+    if texto and texto.strip():
+        condiciones.append(busqueda.CONDICION_TEXTO)
+        parametros["texto"] = texto.strip()
+
+    if despues_de:
+        condiciones.append(
+            f"({FECHA_ORDEN}, id_proceso) < "
+            "(coalesce(%(fecha_ant)s::date, '-infinity'::date), %(id_ant)s)"
+        )
+        parametros["fecha_ant"], parametros["id_ant"] = despues_de
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    # Una sentencia preparada por combinación de filtros
+    sql = nombrar_consulta("listado_procesos", f"""
+        SELECT id_proceso, fecha_estudio, estado, modalidad, objeto
+        FROM procesos
+        {where}
+        ORDER BY {FECHA_ORDEN} DESC, id_proceso DESC
+        LIMIT %(limite)s
+    """)
+    return sql, parametros
+
+
+def listar_procesos(
+    vigencia=None,
+    estado=None,
+    modalidad=None,
+    centro_costos=None,
+    texto=None,
+    despues_de=None,
+    tam_pagina=TAM_PAGINA
+):
+    # despues_de: (fecha_estudio, id_proceso) de la última fila de la página
+    # anterior. Devuelve (filas, llave_siguiente | None).
+    asegurar_esquema()
+
+    sql, parametros = consulta_pagina(
+        vigencia, estado, modalidad, centro_costos, texto, despues_de, tam_pagina
+    )
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, sql, parametros)
+        filas = cursor.fetchall()
+
+    siguiente = None
+    if len(filas) > tam_pagina:
+        filas = filas[:tam_pagina]
+        siguiente = (filas[-1][1], filas[-1][0])
+
+    return filas, siguiente
@@ -0,0 +1,55 @@
+import functools
+import time
+from collections import deque
+
+import streamlit as st
+
+
+# =====================================================
+# TIEMPO DE SERVIDOR POR INTERACCIÓN
+# =====================================================
+# Guarda en la sesión las últimas VENTANA duraciones de cada sección
+# (fragmento) y del script completo, para comparar lo que cuesta una
+# interacción según su alcance: la última, la mediana y el p95 de cada una.
+# Se consulta en la página de Configuración.
+
+VENTANA = 100
+
+
+def registrar(nombre, segundos):
+    tiempos = st.session_state.setdefault("tiempos_servidor", {})
+    tiempos.setdefault(nombre, deque(maxlen=VENTANA)).append(segundos * 1000)
+
+
+def cronometrar(nombre):
+    def decorador(funcion):
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                registrar(nombre, time.perf_counter() - inicio)
+
+        return envoltura
+    return decorador
+
+
+def _percentil(ordenadas, fraccion):
+    # Rango más cercano; suficiente para una ventana de cien muestras
+    return ordenadas[round(fraccion * (len(ordenadas) - 1))]
+
+
+def tiempos():
+    filas = []
+    for nombre, muestras in st.session_state.get("tiempos_servidor", {}).items():
+        ordenadas = sorted(muestras)
+        filas.append({
+            "SECCIÓN": nombre,
+            "EJECUCIONES": len(muestras),
+            "ÚLTIMA_MS": round(muestras[-1], 1),
+            "P50_MS": round(_percentil(ordenadas, 0.5), 1),
+            "P95_MS": round(_percentil(ordenadas, 0.95), 1)
+        })
+    return filas
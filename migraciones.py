@@ -0,0 +1,614 @@
+import argparse
+import sys
+from datetime import date
+
+import streamlit as st
+from psycopg.types.json import Jsonb
+
+from database import conexion
+
+
+# =====================================================
+# MIGRACIONES DEL ESQUEMA (VERSIONADAS)
+# =====================================================
+# Todo el DDL de la aplicación vive aquí, en MIGRACIONES: (versión, nombre,
+# sentencias), en orden. migraciones_esquema registra las versiones
+# aplicadas; cada migración pendiente corre en su propia transacción junto
+# con su registro, así que queda aplicada entera o no queda. Un candado
+# consultivo evita que dos instancias migren a la vez.
+#
+# Una migración aplicada no se edita: cualquier cambio va en una versión
+# nueva al final de la lista. Las sentencias son idempotentes (IF NOT
+# EXISTS) porque las bases existentes ya tenían estas tablas, creadas a mano
+# o por el asegurar_esquema de cada módulo.
+#
+# Las migraciones corren solo desde la línea de comandos, como paso del
+# despliegue (algunas toman candados sobre procesos o validan llaves
+# foráneas; no deben correr dentro de la petición de un usuario). En
+# ejecución, asegurar_esquema() solo compara versiones y, si falta alguna,
+# levanta EsquemaDesactualizado.
+#
+#     python migraciones.py aplicar
+#     python migraciones.py estado
+#     python migraciones.py verificar   # sale con 1 si alguna consulta
+#                                       # crítica usa Seq Scan
+
+SQL_TABLA_MIGRACIONES = """
+    CREATE TABLE IF NOT EXISTS migraciones_esquema (
+        version      integer     PRIMARY KEY,
+        nombre       text        NOT NULL,
+        aplicada_en  timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+SQL_EXISTE_TABLA_MIGRACIONES = "SELECT to_regclass('migraciones_esquema') IS NOT NULL"
+
+SQL_BLOQUEAR = "SELECT pg_advisory_lock(hashtext('migraciones_esquema'))"
+SQL_DESBLOQUEAR = "SELECT pg_advisory_unlock(hashtext('migraciones_esquema'))"
+
+SQL_APLICADAS = "SELECT version, aplicada_en FROM migraciones_esquema"
+
+SQL_REGISTRAR = "INSERT INTO migraciones_esquema (version, nombre) VALUES (%s, %s)"
+
+
+def _llave_foranea(tabla, nombre):
+    # NOT VALID no revisa las filas existentes (ni bloquea la tabla mientras
+    # tanto); luego se intenta validar. Si hay huérfanos la llave queda sin
+    # validar pero igual rige para las filas nuevas.
+    return f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{nombre}') THEN
+            ALTER TABLE {tabla} ADD CONSTRAINT {nombre}
+                FOREIGN KEY (id_proceso) REFERENCES procesos (id_proceso) NOT VALID;
+        END IF;
+        BEGIN
+            ALTER TABLE {tabla} VALIDATE CONSTRAINT {nombre};
+        EXCEPTION WHEN foreign_key_violation THEN
+            RAISE WARNING '{tabla} tiene filas sin proceso; {nombre} queda sin validar';
+        END;
+    END
+    $$
+    """
+
+
+MIGRACIONES = [
+    (1, "tablas_base", [
+        """
+        CREATE TABLE IF NOT EXISTS procesos (
+            id_proceso     text    PRIMARY KEY,
+            objeto         text,
+            necesidad      text,
+            justificacion  text,
+            valor          numeric,
+            plazo          integer,
+            fecha_estudio  date,
+            estado         text
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS public.planeacion (
+            id_proceso         text,
+            tipo1              text,
+            nombre1            text,
+            identificacion1    text,
+            valor1             numeric,
+            representante1     text,
+            cc_representante1  text,
+            tipo2              text,
+            nombre2            text,
+            identificacion2    text,
+            valor2             numeric,
+            representante2     text,
+            cc_representante2  text
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS contratos (
+            id             serial  PRIMARY KEY,
+            id_proceso     text,
+            tipo_contrato  text,
+            supervisor     text,
+            cdp            text,
+            fecha_firma    date
+        )
+        """
+    ]),
+
+    # procesos.busqueda es un tsvector generado y almacenado (ver busqueda.py).
+    # unaccent no es IMMUTABLE, por eso se envuelve en f_unaccent, que
+    # califica función y diccionario con el esquema donde quedó la extensión
+    # (public por defecto; extensions en Supabase). Donde esta versión ya se
+    # aplicó el esquema era public, así que el resultado no cambia.
+    (2, "busqueda_texto", [
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        """
+        DO $$
+        DECLARE
+            esquema text;
+        BEGIN
+            SELECT extnamespace::regnamespace::text INTO esquema
+            FROM pg_extension
+            WHERE extname = 'unaccent';
+
+            EXECUTE format(
+                'CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+                     LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+                     AS $f$ SELECT %1$s.unaccent(%2$L::regdictionary, $1) $f$',
+                esquema,
+                esquema || '.unaccent'
+            );
+        END
+        $$
+        """,
+        "ALTER TABLE procesos ADD COLUMN IF NOT EXISTS caracteristicas_tecnicas text",
+        "ALTER TABLE procesos ADD COLUMN IF NOT EXISTS forma_pago text",
+        "ALTER TABLE procesos ADD COLUMN IF NOT EXISTS analisis text",
+        """
+        ALTER TABLE procesos ADD COLUMN IF NOT EXISTS busqueda tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('spanish', f_unaccent(coalesce(objeto, ''))), 'A') ||
+                setweight(to_tsvector('spanish', f_unaccent(coalesce(necesidad, ''))), 'B') ||
+                setweight(to_tsvector('spanish', f_unaccent(coalesce(justificacion, ''))), 'B') ||
+                setweight(to_tsvector('spanish', f_unaccent(
+                    coalesce(caracteristicas_tecnicas, '') || ' ' ||
+                    coalesce(forma_pago, '') || ' ' ||
+                    coalesce(analisis, '')
+                )), 'C')
+            ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_procesos_busqueda ON procesos USING gin (busqueda)"
+    ]),
+
+    # Un índice (filtro, fecha_estudio DESC, id_proceso DESC) por filtro del
+    # listado, para la paginación por llave
+    (3, "listado_procesos", [
+        "ALTER TABLE procesos ADD COLUMN IF NOT EXISTS modalidad text",
+        "ALTER TABLE procesos ADD COLUMN IF NOT EXISTS centro_costos text",
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_fecha_id
+            ON procesos (fecha_estudio DESC, id_proceso DESC)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_estado_fecha
+            ON procesos (estado, fecha_estudio DESC, id_proceso DESC)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_modalidad_fecha
+            ON procesos (modalidad, fecha_estudio DESC, id_proceso DESC)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_centro_fecha
+            ON procesos (centro_costos, fecha_estudio DESC, id_proceso DESC)
+        """,
+        # Reemplazado por procesos.busqueda
+        "DROP INDEX IF EXISTS idx_procesos_texto"
+    ]),
+
+    # Resumen por dimensión mantenido por trigger (ver reportes.py). El
+    # candado evita que se escriban procesos entre crear el trigger y la
+    # carga inicial.
+    (4, "resumen_procesos", [
+        "LOCK TABLE procesos IN SHARE ROW EXCLUSIVE MODE",
+        "ALTER TABLE procesos ADD COLUMN IF NOT EXISTS programa text",
+        "ALTER TABLE procesos ADD COLUMN IF NOT EXISTS rubro text",
+        """
+        CREATE TABLE IF NOT EXISTS resumen_procesos (
+            dimension   text    NOT NULL,
+            clave       text    NOT NULL,
+            cantidad    bigint  NOT NULL DEFAULT 0,
+            valor_total numeric NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, clave)
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION aplicar_resumen_proceso(p procesos, signo integer)
+        RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO resumen_procesos (dimension, clave, cantidad, valor_total)
+            SELECT d.dimension, d.clave, signo, signo * coalesce(p.valor, 0)
+            FROM (VALUES
+                ('centro',    coalesce(p.centro_costos, 'SIN DATO')),
+                ('programa',  coalesce(p.programa, 'SIN DATO')),
+                ('rubro',     coalesce(p.rubro, 'SIN DATO')),
+                ('modalidad', coalesce(p.modalidad, 'SIN DATO')),
+                ('estado',    coalesce(p.estado, 'SIN DATO')),
+                ('mes',       coalesce(to_char(p.fecha_estudio, 'YYYY-MM'), 'SIN DATO'))
+            ) AS d (dimension, clave)
+            ON CONFLICT (dimension, clave) DO UPDATE SET
+                cantidad = resumen_procesos.cantidad + EXCLUDED.cantidad,
+                valor_total = resumen_procesos.valor_total + EXCLUDED.valor_total;
+        END
+        $$
+        """,
+        """
+        CREATE OR REPLACE FUNCTION trg_resumen_procesos()
+        RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM aplicar_resumen_proceso(OLD, -1);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM aplicar_resumen_proceso(NEW, 1);
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """,
+        "DROP TRIGGER IF EXISTS resumen_procesos_trg ON procesos",
+        """
+        CREATE TRIGGER resumen_procesos_trg
+            AFTER INSERT OR UPDATE OR DELETE ON procesos
+            FOR EACH ROW EXECUTE FUNCTION trg_resumen_procesos()
+        """,
+        # Carga inicial, solo si el resumen está vacío
+        """
+        SELECT aplicar_resumen_proceso(p, 1)
+        FROM procesos p
+        WHERE NOT EXISTS (SELECT 1 FROM resumen_procesos)
+        """
+    ]),
+
+    # Contador por vigencia (ver consecutivos.py), alineado con los procesos
+    # creados antes de existir la tabla
+    (5, "consecutivos_proceso", [
+        """
+        CREATE TABLE IF NOT EXISTS consecutivos_proceso (
+            vigencia integer PRIMARY KEY,
+            ultimo   integer NOT NULL
+        )
+        """,
+        """
+        INSERT INTO consecutivos_proceso (vigencia, ultimo)
+        SELECT split_part(id_proceso, '-', 2)::integer,
+               MAX(split_part(id_proceso, '-', 1)::integer)
+          FROM procesos
+         WHERE id_proceso ~ '^[0-9]+-[0-9]{4}$'
+         GROUP BY 1
+        ON CONFLICT (vigencia) DO NOTHING
+        """
+    ]),
+
+    (6, "ejecucion_presupuestal", [
+        """
+        CREATE TABLE IF NOT EXISTS movimientos_presupuestales (
+            id             bigserial   PRIMARY KEY,
+            id_proceso     text        NOT NULL,
+            tipo           text        NOT NULL,
+            vigencia       integer     NOT NULL,
+            centro_costos  text        NOT NULL,
+            programa       text        NOT NULL,
+            rubro          text        NOT NULL,
+            valor          numeric     NOT NULL,
+            registrado_en  timestamptz NOT NULL DEFAULT now()
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_movimientos_proceso_tipo
+            ON movimientos_presupuestales (id_proceso, tipo)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS saldos_rubro (
+            vigencia       integer NOT NULL,
+            centro_costos  text    NOT NULL,
+            programa       text    NOT NULL,
+            rubro          text    NOT NULL,
+            comprometido   numeric NOT NULL DEFAULT 0,
+            contratado     numeric NOT NULL DEFAULT 0,
+            apropiado      numeric,
+            PRIMARY KEY (vigencia, centro_costos, programa, rubro)
+        )
+        """
+    ]),
+
+    (7, "trabajos_render", [
+        """
+        CREATE TABLE IF NOT EXISTS trabajos_render (
+            id            bigserial   PRIMARY KEY,
+            id_proceso    text        NOT NULL,
+            plantilla     text        NOT NULL,
+            contexto      jsonb       NOT NULL,
+            destino       text        NOT NULL,
+            estado        text        NOT NULL DEFAULT 'PENDIENTE',
+            error         text,
+            intentos      integer     NOT NULL DEFAULT 0,
+            creado_en     timestamptz NOT NULL DEFAULT now(),
+            tomado_en     timestamptz,
+            terminado_en  timestamptz
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_trabajos_render_pendientes
+            ON trabajos_render (id) WHERE estado = 'PENDIENTE'
+        """
+    ]),
+
+    # La última versión se lee por la llave primaria (id_proceso, version)
+    (8, "instantaneas_proceso", [
+        """
+        CREATE TABLE IF NOT EXISTS instantaneas_proceso (
+            id_proceso   text        NOT NULL,
+            version      integer     NOT NULL,
+            etapa        text        NOT NULL,
+            formulario   jsonb       NOT NULL,
+            contexto     jsonb       NOT NULL,
+            guardado_en  timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id_proceso, version)
+        )
+        """
+    ]),
+
+    # CARGAR PROCESO y cada guardado buscan planeación y contrato por
+    # id_proceso (el contrato más reciente por fecha_firma); sin estos
+    # índices cada búsqueda recorría la tabla completa.
+    (9, "indices_por_proceso", [
+        """
+        CREATE INDEX IF NOT EXISTS idx_planeacion_proceso
+            ON public.planeacion (id_proceso)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_contratos_proceso_firma
+            ON contratos (id_proceso, fecha_firma DESC NULLS LAST)
+        """,
+        # Para la llave foránea: borrar un proceso busca sus trabajos
+        """
+        CREATE INDEX IF NOT EXISTS idx_trabajos_render_proceso
+            ON trabajos_render (id_proceso)
+        """
+    ]),
+
+    # Sin ON DELETE CASCADE: borrar un proceso con documentos, contratos o
+    # movimientos presupuestales debe ser una decisión explícita
+    (10, "llaves_foraneas", [
+        _llave_foranea("public.planeacion", "planeacion_id_proceso_fkey"),
+        _llave_foranea("contratos", "contratos_id_proceso_fkey"),
+        _llave_foranea("instantaneas_proceso", "instantaneas_proceso_id_proceso_fkey"),
+        _llave_foranea("trabajos_render", "trabajos_render_id_proceso_fkey"),
+        _llave_foranea("movimientos_presupuestales", "movimientos_presupuestales_id_proceso_fkey")
+    ]),
+
+    # El listado ordena por coalesce(fecha_estudio, '-infinity') para que
+    # los procesos sin fecha queden al final y la llave de página nunca sea
+    # NULL (ver listado_procesos.FECHA_ORDEN); los índices de la versión 3
+    # pasan a esa expresión
+    (11, "listado_fechas_nulas", [
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_orden
+            ON procesos ((coalesce(fecha_estudio, '-infinity'::date)) DESC, id_proceso DESC)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_estado_orden
+            ON procesos (estado, (coalesce(fecha_estudio, '-infinity'::date)) DESC, id_proceso DESC)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_modalidad_orden
+            ON procesos (modalidad, (coalesce(fecha_estudio, '-infinity'::date)) DESC, id_proceso DESC)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_procesos_centro_orden
+            ON procesos (centro_costos, (coalesce(fecha_estudio, '-infinity'::date)) DESC, id_proceso DESC)
+        """,
+        "DROP INDEX IF EXISTS idx_procesos_fecha_id",
+        "DROP INDEX IF EXISTS idx_procesos_estado_fecha",
+        "DROP INDEX IF EXISTS idx_procesos_modalidad_fecha",
+        "DROP INDEX IF EXISTS idx_procesos_centro_fecha"
+    ]),
+
+    # Los trabajadores de render buscan periódicamente los trabajos tomados
+    # que quedaron colgados (ver cola_render.SQL_RECUPERAR)
+    (12, "trabajos_render_vencidos", [
+        """
+        CREATE INDEX IF NOT EXISTS idx_trabajos_render_en_proceso
+            ON trabajos_render (tomado_en) WHERE estado = 'EN_PROCESO'
+        """
+    ]),
+
+    # Los guardados de las Etapas 2 y 3 no actualizaban procesos.estado y
+    # editar el estudio previo lo devolvía a ETAPA 1; se recalcula desde la
+    # planeación y los contratos (el resumen se ajusta por su trigger)
+    (13, "estado_por_etapa", [
+        """
+        UPDATE procesos p
+        SET estado = CASE
+            WHEN EXISTS (SELECT 1 FROM contratos c WHERE c.id_proceso = p.id_proceso)
+                THEN 'ETAPA 3'
+            ELSE 'ETAPA 2'
+        END
+        WHERE (p.estado IS NULL OR p.estado < 'ETAPA 3')
+          AND (
+              EXISTS (SELECT 1 FROM contratos c WHERE c.id_proceso = p.id_proceso)
+              OR (
+                  (p.estado IS NULL OR p.estado < 'ETAPA 2')
+                  AND EXISTS (SELECT 1 FROM public.planeacion pl WHERE pl.id_proceso = p.id_proceso)
+              )
+          )
+        """
+    ])
+]
+
+
+# =====================================================
+# APLICACIÓN
+# =====================================================
+
+def aplicar(hasta=None):
+    # Devuelve las versiones aplicadas en esta llamada
+    aplicadas = []
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_BLOQUEAR)
+        try:
+            cursor.execute(SQL_TABLA_MIGRACIONES)
+            cursor.execute(SQL_APLICADAS)
+            ya_aplicadas = {version for version, _ in cursor.fetchall()}
+            conn.commit()
+
+            for version, nombre, sentencias in MIGRACIONES:
+                if version in ya_aplicadas or (hasta and version > hasta):
+                    continue
+                with conn.transaction():
+                    for sentencia in sentencias:
+                        cursor.execute(sentencia)
+                    cursor.execute(SQL_REGISTRAR, (version, nombre))
+                aplicadas.append(version)
+        finally:
+            # El candado es de sesión: sobrevive al rollback y hay que soltarlo
+            conn.rollback()
+            cursor.execute(SQL_DESBLOQUEAR)
+
+    return aplicadas
+
+
+class EsquemaDesactualizado(RuntimeError):
+
+    def __init__(self, pendientes):
+        self.pendientes = pendientes
+        super().__init__(
+            "La base de datos no tiene aplicadas las migraciones "
+            f"{', '.join(str(version) for version in pendientes)}. "
+            "Ejecute python migraciones.py aplicar antes de iniciar la aplicación."
+        )
+
+
+def estado():
+    # [(version, nombre, aplicada_en | None)]; solo lee, no crea nada
+    with conexion() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_EXISTE_TABLA_MIGRACIONES)
+        aplicadas = {}
+        if cursor.fetchone()[0]:
+            cursor.execute(SQL_APLICADAS)
+            aplicadas = dict(cursor.fetchall())
+
+    return [
+        (version, nombre, aplicadas.get(version))
+        for version, nombre, _ in MIGRACIONES
+    ]
+
+
+def pendientes():
+    return [version for version, _, aplicada_en in estado() if aplicada_en is None]
+
+
+@st.cache_resource
+def asegurar_esquema():
+    # Una consulta por proceso del servidor; un error no queda en caché, así
+    # que después de migrar la siguiente petición vuelve a verificar
+    faltantes = pendientes()
+    if faltantes:
+        raise EsquemaDesactualizado(faltantes)
+    return True
+
+
+# =====================================================
+# VERIFICACIÓN DE PLANES
+# =====================================================
+# Las consultas de los caminos calientes, con parámetros de ejemplo. Con
+# enable_seqscan apagado el planificador usa un índice siempre que exista
+# uno aplicable, así que un Seq Scan en el plan significa que falta el
+# índice (con tablas pequeñas, sin apagarlo, el Seq Scan sería lo normal).
+# Al agregar una consulta caliente, registrarla aquí.
+
+def consultas_criticas():
+    # Importación diferida: estos módulos importan migraciones
+    import busqueda
+    import catalogo
+    import cola_render
+    import ejecucion_presupuestal
+    import estado_proceso
+    import instantaneas
+    import listado_procesos
+    import repositorio
+
+    id_ejemplo = f"001-{date.today().year}"
+    centro_ejemplo = next(iter(catalogo.PROGRAMAS_POR_CENTRO))
+
+    return [
+        ("estado_proceso", estado_proceso.SQL_ESTADO, {"id": id_ejemplo}),
+        ("estados_proceso", estado_proceso.SQL_ESTADOS, ([id_ejemplo],)),
+        ("listado", *listado_procesos.consulta_pagina()),
+        ("listado_vigencia", *listado_procesos.consulta_pagina(vigencia=date.today().year)),
+        ("listado_estado", *listado_procesos.consulta_pagina(estado=listado_procesos.ESTADOS[0])),
+        ("listado_modalidad", *listado_procesos.consulta_pagina(modalidad=listado_procesos.MODALIDADES[0])),
+        ("listado_centro", *listado_procesos.consulta_pagina(centro_costos=centro_ejemplo)),
+        ("listado_siguiente", *listado_procesos.consulta_pagina(despues_de=(date.today(), id_ejemplo))),
+        ("busqueda", busqueda.SQL_BUSCAR, {"texto": "sillas", "limite": busqueda.LIMITE_RESULTADOS}),
+        ("bloquear_proceso", repositorio.SQL_BLOQUEAR_PROCESO, (id_ejemplo,)),
+        ("existe_planeacion", repositorio.SQL_EXISTE_PLANEACION, (id_ejemplo,)),
+        ("guardar_instantanea", instantaneas.SQL_GUARDAR, {
+            "id": id_ejemplo, "etapa": "ETAPA 1", "formulario": Jsonb({}), "contexto": Jsonb({})
+        }),
+        ("neto_proceso", ejecucion_presupuestal.SQL_NETO_PROCESO, (id_ejemplo, "COMPROMISO")),
+        ("tomar_trabajo_render", cola_render.SQL_TOMAR, None),
+        ("recuperar_trabajos_render", cola_render.SQL_RECUPERAR, {
+            "vencimiento": cola_render.VENCIMIENTO_EN_PROCESO, "maximo": cola_render.MAX_INTENTOS
+        })
+    ]
+
+
+def _nodos(plan):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from _nodos(hijo)
+
+
+def barridos_secuenciales(cursor, sql, parametros=None):
+    # Tablas que el plan de la consulta recorre completas
+    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, parametros)
+    plan = cursor.fetchone()[0][0]["Plan"]
+    return sorted({
+        nodo["Relation Name"]
+        for nodo in _nodos(plan)
+        if nodo["Node Type"] == "Seq Scan"
+    })
+
+
+def verificar_planes(consultas=None):
+    # [(nombre, [tablas con Seq Scan])] de las consultas que fallan
+    asegurar_esquema()
+    fallas = []
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        # EXPLAIN sin ANALYZE no ejecuta nada; igual se descarta la transacción
+        with conn.transaction(force_rollback=True):
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            for nombre, sql, parametros in consultas or consultas_criticas():
+                tablas = barridos_secuenciales(cursor, sql, parametros)
+                if tablas:
+                    fallas.append((nombre, tablas))
+
+    return fallas
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de la base de datos.")
+    parser.add_argument("accion", choices=["aplicar", "estado", "verificar"])
+    parser.add_argument("--hasta", type=int, help="Aplicar solo hasta esta versión")
+    args = parser.parse_args(argv)
+
+    if args.accion == "aplicar":
+        aplicadas = aplicar(args.hasta)
+        print(f"Migraciones aplicadas: {', '.join(map(str, aplicadas)) or 'ninguna'}")
+        return 0
+
+    if args.accion == "estado":
+        for version, nombre, aplicada_en in estado():
+            print(f"{version:>4}\t{nombre}\t{aplicada_en or 'PENDIENTE'}")
+        return 0
+
+    fallas = verificar_planes()
+    for nombre, tablas in fallas:
+        print(f"{nombre}\tSeq Scan en {', '.join(tablas)}")
+    if not fallas:
+        print(f"{len(consultas_criticas())} consultas críticas usan índices.")
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
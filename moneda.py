@@ -0,0 +1,137 @@
+import re
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+
+# =====================================================
+# MONTOS EN PESOS COLOMBIANOS: LECTURA Y FORMATO
+# =====================================================
+# Convención COP: punto para miles y coma para decimales ("$ 25.000.000",
+# "1.250.000,50"). La lectura también acepta lo que la gente pega desde
+# otros sistemas: "25,000,000", "25000000", "$25.000.000 COP",
+# "1,250,000.50", "(2.000)" o "-2.000" para negativos.
+#
+# Regla para un único separador: si aparece varias veces, o una sola vez
+# seguido de exactamente tres dígitos, es de miles; si no, es decimal.
+# Con ambos separadores, el último es el decimal.
+#
+# Los resultados se guardan en caché: los mismos textos y valores se
+# procesan en cada rerun.
+
+CACHE_MAX = 4096
+
+SIMBOLO = "$"
+SEP_MILES = "."
+SEP_DECIMAL = ","
+
+_RUIDO = re.compile(r"[\s$]|COP", re.IGNORECASE)
+_CIFRA = re.compile(r"\d[\d.,]*")
+_GRUPOS_MILES = re.compile(r"\d{1,3}([.,]\d{3})*")
+_A_COP = str.maketrans({",": SEP_MILES, ".": SEP_DECIMAL})
+
+
+def _separador_decimal(texto):
+    posicion = max(texto.rfind("."), texto.rfind(","))
+    if posicion < 0:
+        return None
+
+    separador = texto[posicion]
+    otro = "," if separador == "." else "."
+
+    if otro in texto[:posicion]:
+        return separador
+    if texto.count(separador) > 1:
+        return None
+    return None if len(texto) - posicion - 1 == 3 else separador
+
+
+def _normalizar(numero):
+    # Montos enteros como int; con centavos como Decimal
+    if numero == numero.to_integral_value():
+        return int(numero)
+    return numero
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def _parsear_texto(texto):
+    limpio = _RUIDO.sub("", texto)
+
+    negativo = False
+    if limpio.startswith("(") and limpio.endswith(")"):
+        negativo, limpio = True, limpio[1:-1]
+    if limpio.startswith("-"):
+        negativo, limpio = True, limpio[1:]
+
+    if not _CIFRA.fullmatch(limpio):
+        return None
+
+    separador = _separador_decimal(limpio)
+    if separador:
+        entero, _, fraccion = limpio.rpartition(separador)
+    else:
+        entero, fraccion = limpio, ""
+
+    # Los miles tienen que venir en grupos de tres: "1.23.4" no es un monto
+    if not _GRUPOS_MILES.fullmatch(entero) and not entero.isdigit():
+        return None
+    if not fraccion.isdigit() and fraccion:
+        return None
+
+    entero = entero.replace(".", "").replace(",", "")
+    numero = _normalizar(Decimal(f"{entero}.{fraccion or 0}"))
+    return -numero if negativo else numero
+
+
+def parsear_monto(valor):
+    # Devuelve int, Decimal (si hay centavos) o None si no es un monto
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, (float, Decimal)):
+        try:
+            return _normalizar(Decimal(str(valor)))
+        except InvalidOperation:
+            return None
+    return _parsear_texto(str(valor).strip())
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def formatear_moneda(valor, simbolo=True, decimales=None):
+    # Sin decimales para montos enteros; con centavos, dos
+    numero = parsear_monto(valor)
+    if numero is None:
+        return ""
+
+    if decimales is None:
+        decimales = 0 if isinstance(numero, int) else 2
+
+    texto = f"{abs(numero):,.{decimales}f}".translate(_A_COP)
+    signo = "-" if numero < 0 else ""
+    return f"{signo}{SIMBOLO} {texto}" if simbolo else f"{signo}{texto}"
+
+
+def leer_monto(texto):
+    # Para los campos de la interfaz: (número, texto formateado), o (0, "")
+    # si lo escrito no es un monto
+    numero = parsear_monto(texto)
+    if numero is None:
+        return 0, ""
+    return numero, formatear_moneda(numero)
+
+
+# =====================================================
+# LOTES (IMPORTACIÓN, EXPORTACIÓN, PLANTILLAS)
+# =====================================================
+
+def parsear_montos(valores):
+    return [parsear_monto(valor) for valor in valores]
+
+
+def formatear_montos(valores, simbolo=True, decimales=None):
+    return [formatear_moneda(valor, simbolo, decimales) for valor in valores]
+
+
+def limpiar_cache():
+    _parsear_texto.cache_clear()
+    formatear_moneda.cache_clear()
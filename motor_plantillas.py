@@ -0,0 +1,372 @@
+import copy
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from docx import Document
+from docxtpl import DocxTemplate
+from jinja2 import Environment, meta
+
+
+# =====================================================
+# MOTOR DE PLANTILLAS DOCX
+# =====================================================
+# Cada plantilla de plantillas/ se lee y se analiza una sola vez por
+# proceso. Cada render trabaja sobre una copia del documento ya analizado
+# y reutiliza el XML del cuerpo ya preparado para Jinja y su plantilla
+# compilada. Si el archivo cambia en disco (mtime) se vuelve a cargar.
+#
+# Al cargar, los marcadores se normalizan una sola vez: Word suele partir
+# "{{VALOR}}" en varias corridas <w:r> (las une patch_xml de docxtpl) y
+# varias plantillas usan la forma simple "{OBJETO}", que se convierte a
+# "{{ OBJETO }}". De ahí sale el conjunto de variables que cada plantilla
+# necesita, para validar un contexto antes de renderizar.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIR_PLANTILLAS = os.path.join(BASE_DIR, "plantillas")
+
+PLANTILLAS = {
+    "estudio_previo": "estudio_previo.docx",
+    "solicitud_cdp": "solicitud_cdp.docx",
+    "invitacion_cotizar": "invitacion_cotizar.docx",
+    "invitacion_1_presentar_propuesta": "invitacion_1_presentar_propuesta.docx",
+    "invitacion_2_presentar_propuesta": "invitacion_2_presentar_propuesta.docx",
+    "acta_recibo_propuestas": "acta_recibo_propuestas.docx",
+    "verificacion_requisitos": "Verificacion_de_requisitos.docx",
+    "contrato": "contrato.docx"
+}
+
+MIME_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Caché de documentos ya renderizados, direccionada por contenido:
+# (versión de la plantilla, huella del contexto) -> bytes del .docx
+DIR_CACHE_RENDER = os.path.join(BASE_DIR, "procesos", ".cache_render")
+CACHE_MEMORIA_MAX = 32
+CACHE_DISCO_MAX = 200 * 1024 * 1024  # bytes; sobre esto se borran los menos usados
+PODA_CADA = 50                       # escrituras en disco entre podas
+
+# Cambia cuando cambia la normalización: invalida la caché de renders
+REVISION_NORMALIZACION = "2"
+
+# Marcador en la plantilla -> llave del contexto
+ALIAS_MARCADORES = {
+    "FORMA_DE_PAGO": "FORMA_PAGO",
+    "CARACTERÍSTICAS_TÉCNICAS_DEL_BIEN": "CARACTERISTICAS_TECNICAS"
+}
+
+# "{NOMBRE}" suelto, quizá partido por etiquetas de corrida, que no sea parte
+# de "{{ }}", "{% %}" ni "{# #}" (patch_xml ya los dejó contiguos). Admite
+# letras con tilde: las plantillas usan marcadores como
+# {CARACTERÍSTICAS_TÉCNICAS_DEL_BIEN}.
+_MARCADOR_SIMPLE = re.compile(
+    r"(?<![{%#])\{(?![{%#_])((?:<[^>]*>|[\w ])*?[^\W\d](?:<[^>]*>|[\w ])*?)\}(?![}%#])"
+)
+_ETIQUETA = re.compile(r"<[^>]*>")
+
+
+class ContextoIncompleto(ValueError):
+
+    def __init__(self, nombre, faltantes):
+        self.nombre = nombre
+        self.faltantes = faltantes
+        super().__init__(
+            f"La plantilla {nombre} requiere campos que no vienen en el contexto: "
+            + ", ".join(faltantes)
+        )
+
+
+class _EntornoCompilado(Environment):
+    # docxtpl crea un Template nuevo por cada render; aquí se memoriza la
+    # compilación por texto fuente para que solo se pague una vez.
+
+    @lru_cache(maxsize=64)
+    def from_string(self, source, globals=None, template_class=None):
+        return super().from_string(source, globals, template_class)
+
+
+_entorno = _EntornoCompilado()
+
+
+def _a_jinja(coincidencia):
+    nombre = _ETIQUETA.sub("", coincidencia.group(1)).strip()
+    if not nombre.replace("_", "").isalnum() or " " in nombre:
+        return coincidencia.group(0)
+    return "{{ " + ALIAS_MARCADORES.get(nombre, nombre) + " }}"
+
+
+def normalizar_marcadores(xml):
+    # Recibe el XML ya pasado por patch_xml
+    xml = _MARCADOR_SIMPLE.sub(_a_jinja, xml)
+    for marcador, llave in ALIAS_MARCADORES.items():
+        xml = re.sub(r"\{\{\s*" + marcador + r"\s*\}\}", "{{ " + llave + " }}", xml)
+    return xml
+
+
+class _PlantillaCargada:
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.mtime = os.path.getmtime(ruta)
+
+        with open(ruta, "rb") as archivo:
+            self.contenido = archivo.read()
+
+        self.version = hashlib.sha256(
+            REVISION_NORMALIZACION.encode("ascii") + self.contenido
+        ).hexdigest()
+
+        self.docx = Document(io.BytesIO(self.contenido))
+
+        base = DocxTemplate(io.BytesIO(self.contenido))
+        base.docx = self.docx
+        self.cuerpo_xml = normalizar_marcadores(base.patch_xml(base.get_xml()))
+        self.variables = frozenset(
+            meta.find_undeclared_variables(_entorno.parse(self.cuerpo_xml))
+        )
+
+
+class PlantillaDocx(DocxTemplate):
+
+    def __init__(self, cargada):
+        super().__init__(io.BytesIO(cargada.contenido))
+        self.docx = copy.deepcopy(cargada.docx)
+        self.cargada = cargada
+
+    def build_xml(self, context, jinja_env=None):
+        return self.render_xml_part(
+            self.cargada.cuerpo_xml,
+            self.docx._part,
+            context,
+            jinja_env
+        )
+
+    def render(self, context, jinja_env=None, autoescape=False):
+        if jinja_env is None and not autoescape:
+            jinja_env = _entorno
+        super().render(context, jinja_env, autoescape)
+
+
+# =====================================================
+# REGISTRO
+# =====================================================
+
+_registro = {}
+_lock = threading.Lock()
+
+
+def ruta_plantilla(nombre):
+    return os.path.join(DIR_PLANTILLAS, PLANTILLAS[nombre])
+
+
+def _cargada(nombre):
+    ruta = ruta_plantilla(nombre)
+    mtime = os.path.getmtime(ruta)
+
+    cargada = _registro.get(nombre)
+    if cargada is not None and cargada.mtime == mtime:
+        return cargada
+
+    with _lock:
+        cargada = _registro.get(nombre)
+        if cargada is None or cargada.mtime != mtime:
+            cargada = _PlantillaCargada(ruta)
+            _registro[nombre] = cargada
+
+    return cargada
+
+
+def obtener_plantilla(nombre):
+    return PlantillaDocx(_cargada(nombre))
+
+
+# =====================================================
+# VALIDACIÓN DEL CONTEXTO
+# =====================================================
+# Se hace contra el conjunto de variables calculado al cargar: no renderiza
+# nada, así que un campo faltante se detecta antes de pagar el render.
+
+def variables(nombre):
+    return _cargada(nombre).variables
+
+
+def faltantes(nombre, contexto):
+    return sorted(variables(nombre) - contexto.keys())
+
+
+def validar_contexto(nombre, contexto):
+    ausentes = faltantes(nombre, contexto)
+    if ausentes:
+        raise ContextoIncompleto(nombre, ausentes)
+
+
+def _renderizar_sin_cache(cargada, contexto):
+    doc = PlantillaDocx(cargada)
+    doc.render(contexto)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+# =====================================================
+# CACHÉ DE RENDERS
+# =====================================================
+
+_renders = OrderedDict()
+_escrituras = 0
+
+
+def huella_contexto(contexto):
+    texto = json.dumps(
+        contexto,
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _clave(cargada, contexto):
+    return hashlib.sha256(
+        f"{cargada.version}:{huella_contexto(contexto)}".encode("ascii")
+    ).hexdigest()
+
+
+def clave_render(nombre, contexto):
+    return _clave(_cargada(nombre), contexto)
+
+
+def _guardar_en_memoria(clave, contenido):
+    with _lock:
+        _renders[clave] = contenido
+        _renders.move_to_end(clave)
+        while len(_renders) > CACHE_MEMORIA_MAX:
+            _renders.popitem(last=False)
+
+
+def _leer_de_memoria(clave):
+    with _lock:
+        contenido = _renders.get(clave)
+        if contenido is not None:
+            _renders.move_to_end(clave)
+        return contenido
+
+
+def _ruta_cache(clave):
+    return os.path.join(DIR_CACHE_RENDER, f"{clave}.docx")
+
+
+def _leer_de_disco(clave):
+    ruta = _ruta_cache(clave)
+    try:
+        with open(ruta, "rb") as archivo:
+            contenido = archivo.read()
+    except FileNotFoundError:
+        return None
+
+    # El mtime marca el último uso: la poda borra primero lo que no se lee
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+    return contenido
+
+
+def _guardar_en_disco(clave, contenido):
+    global _escrituras
+
+    os.makedirs(DIR_CACHE_RENDER, exist_ok=True)
+    ruta = _ruta_cache(clave)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    with open(temporal, "wb") as archivo:
+        archivo.write(contenido)
+
+    os.replace(temporal, ruta)
+
+    with _lock:
+        _escrituras += 1
+        podar = _escrituras % PODA_CADA == 1
+    if podar:
+        podar_cache_disco()
+
+
+def podar_cache_disco(maximo=CACHE_DISCO_MAX):
+    # Borra los renders de mtime más viejo hasta que la caché ocupe menos de
+    # maximo bytes. Devuelve cuántos borró.
+    archivos = []
+    try:
+        with os.scandir(DIR_CACHE_RENDER) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith(".docx"):
+                    continue
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                archivos.append((info.st_mtime, info.st_size, entrada.path))
+    except FileNotFoundError:
+        return 0
+
+    total = sum(tamano for _, tamano, _ in archivos)
+    borrados = 0
+    for _, tamano, ruta in sorted(archivos):
+        if total <= maximo:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+        borrados += 1
+    return borrados
+
+
+def renderizar(nombre, contexto, estricto=False):
+    # Un contexto idéntico sobre la misma versión de plantilla se renderiza
+    # una sola vez; cualquier cambio de campo produce otra clave.
+    # estricto=True exige que el contexto traiga todas las variables de la
+    # plantilla (ContextoIncompleto); si no, las ausentes quedan en blanco.
+    if estricto:
+        validar_contexto(nombre, contexto)
+
+    cargada = _cargada(nombre)
+    clave = _clave(cargada, contexto)
+
+    contenido = _leer_de_memoria(clave)
+    if contenido is not None:
+        return contenido
+
+    contenido = _leer_de_disco(clave)
+    if contenido is None:
+        contenido = _renderizar_sin_cache(cargada, contexto)
+        _guardar_en_disco(clave, contenido)
+
+    _guardar_en_memoria(clave, contenido)
+    return contenido
+
+
+def precargar():
+    for nombre in PLANTILLAS:
+        _cargada(nombre)
+
+
+# =====================================================
+# LÍNEA DE COMANDOS
+# =====================================================
+# python motor_plantillas.py            variables de cada plantilla
+
+def main(argv=None):
+    for nombre in sorted(PLANTILLAS):
+        print(f"{nombre}: {', '.join(sorted(variables(nombre)))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import pandas as pd
+import streamlit as st
+from database import conexion, ejecutar, nombrar_consulta
+from migraciones import asegurar_esquema
+
+
+# =====================================================
+# RESÚMENES PRECALCULADOS PARA REPORTES
+# =====================================================
+# resumen_procesos guarda, por dimensión y clave, la cantidad de procesos
+# y el valor total. Un trigger sobre procesos aplica el delta de cada
+# INSERT/UPDATE/DELETE (resta la fila vieja, suma la nueva), así que la
+# página de Reportes lee una tabla de unas cuantas filas y nunca agrupa
+# sobre procesos. La tabla y el trigger se crean en migraciones.py.
+
+DIMENSIONES = ["centro", "programa", "rubro", "modalidad", "estado", "mes"]
+TTL_RESUMEN = 60
+
+SQL_RESUMEN = nombrar_consulta("leer_resumen", """
+    SELECT dimension, clave, cantidad, valor_total
+    FROM resumen_procesos
+    WHERE cantidad > 0
+""")
+
+
+@st.cache_data(ttl=TTL_RESUMEN, show_spinner=False)
+def leer_resumen():
+    asegurar_esquema()
+
+    with conexion() as conn:
+        cursor = conn.cursor()
+        ejecutar(cursor, SQL_RESUMEN)
+        filas = cursor.fetchall()
+
+    resumen = pd.DataFrame(
+        filas,
+        columns=["dimension", "clave", "cantidad", "valor_total"]
+    )
+    resumen["valor_total"] = resumen["valor_total"].astype(float)
+
+    return {
+        dimension: (
+            resumen[resumen["dimension"] == dimension]
+            .drop(columns="dimension")
+            .set_index("clave")
+            .sort_index()
+        )
+        for dimension in DIMENSIONES
+    }
+
+
+def invalidar_resumen():
+    leer_resumen.clear()
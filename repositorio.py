@@ -0,0 +1,176 @@
+from contextlib import contextmanager
+
+from database import conexion, ejecutar, nombrar_consulta
+
+
+# =====================================================
+# ACCESO A DATOS: PROCESOS, PLANEACIÓN Y CONTRATOS
+# =====================================================
+# Las escrituras de la página pasan por aquí: una función por operación,
+# con parámetros por nombre, que recibe el cursor de la transacción. Así un
+# guardado que toca varias tablas (proceso, instantánea, ejecución
+# presupuestal, cola de render) confirma todo o nada:
+#
+#     with repositorio.transaccion() as cursor:
+#         repositorio.guardar_proceso(cursor, ...)
+#         instantaneas.guardar_instantanea(cursor, ...)
+#
+# Cada SQL lleva nombre para las estadísticas de latencia
+# (database.estadisticas_consultas) y se ejecuta como sentencia preparada.
+# Las lecturas viven junto a su página (listado_procesos, busqueda,
+# reportes, estado_proceso, ejecucion_presupuestal.saldo_rubro, cola_render)
+# y siguen la misma regla: SQL con nombrar_consulta y database.ejecutar. Solo
+# el SQL de una sola vez sobre tablas temporales (importación) y el cursor
+# de servidor de la exportación usan cursor.execute directo.
+
+SQL_GUARDAR_PROCESO = nombrar_consulta("guardar_proceso", """
+    INSERT INTO procesos
+    (id_proceso, objeto, necesidad, justificacion, valor, plazo, fecha_estudio, estado,
+     modalidad, centro_costos, caracteristicas_tecnicas, forma_pago, analisis,
+     programa, rubro)
+    VALUES (%(id_proceso)s, %(objeto)s, %(necesidad)s, %(justificacion)s, %(valor)s,
+            %(plazo)s, %(fecha_estudio)s, %(estado)s, %(modalidad)s, %(centro_costos)s,
+            %(caracteristicas_tecnicas)s, %(forma_pago)s, %(analisis)s, %(programa)s,
+            %(rubro)s)
+    ON CONFLICT (id_proceso)
+    DO UPDATE SET
+        objeto = EXCLUDED.objeto,
+        necesidad = EXCLUDED.necesidad,
+        justificacion = EXCLUDED.justificacion,
+        valor = EXCLUDED.valor,
+        plazo = EXCLUDED.plazo,
+        fecha_estudio = EXCLUDED.fecha_estudio,
+        estado = GREATEST(procesos.estado, EXCLUDED.estado),
+        modalidad = EXCLUDED.modalidad,
+        centro_costos = EXCLUDED.centro_costos,
+        caracteristicas_tecnicas = EXCLUDED.caracteristicas_tecnicas,
+        forma_pago = EXCLUDED.forma_pago,
+        analisis = EXCLUDED.analisis,
+        programa = EXCLUDED.programa,
+        rubro = EXCLUDED.rubro
+""")
+
+# El estado solo avanza (ETAPA 1 < ETAPA 2 < ETAPA 3): editar el estudio
+# previo de un proceso con contrato no lo devuelve a la Etapa 1
+SQL_AVANZAR_ESTADO = nombrar_consulta("avanzar_estado", """
+    UPDATE procesos
+    SET estado = %(estado)s
+    WHERE id_proceso = %(id_proceso)s
+      AND (estado IS NULL OR estado < %(estado)s)
+""")
+
+# Serializa los guardados de un mismo proceso hasta el fin de la transacción
+SQL_BLOQUEAR_PROCESO = nombrar_consulta("bloquear_proceso", """
+    SELECT 1 FROM procesos WHERE id_proceso = %s FOR UPDATE
+""")
+
+SQL_EXISTE_PLANEACION = nombrar_consulta("existe_planeacion", """
+    SELECT 1 FROM public.planeacion WHERE id_proceso = %s
+""")
+
+SQL_INSERTAR_PLANEACION = nombrar_consulta("insertar_planeacion", """
+    INSERT INTO public.planeacion
+    (
+        id_proceso,
+        tipo1, nombre1, identificacion1, valor1,
+        representante1, cc_representante1,
+        tipo2, nombre2, identificacion2, valor2,
+        representante2, cc_representante2
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+""")
+
+SQL_INSERTAR_CONTRATO = nombrar_consulta("insertar_contrato", """
+    INSERT INTO contratos
+    (id_proceso, tipo_contrato, supervisor, cdp, fecha_firma)
+    VALUES (%s, %s, %s, %s, %s)
+    RETURNING id
+""")
+
+# Datos de cada proponente de la planeación, en el orden de las columnas
+CAMPOS_PROPONENTE = ("tipo", "nombre", "identificacion", "valor", "representante", "cc_representante")
+
+
+@contextmanager
+def transaccion():
+    # Commit al salir del bloque; rollback si hubo excepción. La conexión
+    # vuelve al pool en ambos casos.
+    with conexion() as conn:
+        with conn.transaction():
+            yield conn.cursor()
+
+
+# =====================================================
+# PROCESOS
+# =====================================================
+
+def guardar_proceso(cursor, id_proceso, *, objeto, necesidad, justificacion, valor, plazo,
+                    fecha_estudio, estado, modalidad, centro_costos, caracteristicas_tecnicas,
+                    forma_pago, analisis, programa, rubro):
+    ejecutar(cursor, SQL_GUARDAR_PROCESO, {
+        "id_proceso": id_proceso,
+        "objeto": objeto,
+        "necesidad": necesidad,
+        "justificacion": justificacion,
+        "valor": valor,
+        "plazo": plazo,
+        "fecha_estudio": fecha_estudio,
+        "estado": estado,
+        "modalidad": modalidad,
+        "centro_costos": centro_costos,
+        "caracteristicas_tecnicas": caracteristicas_tecnicas,
+        "forma_pago": forma_pago,
+        "analisis": analisis,
+        "programa": programa,
+        "rubro": rubro
+    })
+
+
+def avanzar_estado(cursor, id_proceso, estado):
+    ejecutar(cursor, SQL_AVANZAR_ESTADO, {"id_proceso": id_proceso, "estado": estado})
+
+
+def bloquear_proceso(cursor, id_proceso):
+    # True si el proceso existe (y queda bloqueado hasta el commit)
+    ejecutar(cursor, SQL_BLOQUEAR_PROCESO, (id_proceso,))
+    return cursor.fetchone() is not None
+
+
+# =====================================================
+# PLANEACIÓN
+# =====================================================
+
+def registrar_planeacion(cursor, id_proceso, proponente1, proponente2):
+    # proponente1/2: dict con CAMPOS_PROPONENTE. Devuelve False sin escribir
+    # si el proceso ya tiene planeación; con el proceso bloqueado, dos
+    # guardados simultáneos no la registran dos veces.
+    bloquear_proceso(cursor, id_proceso)
+
+    ejecutar(cursor, SQL_EXISTE_PLANEACION, (id_proceso,))
+    if cursor.fetchone() is not None:
+        return False
+
+    ejecutar(cursor, SQL_INSERTAR_PLANEACION, (
+        id_proceso,
+        *(proponente1.get(campo) for campo in CAMPOS_PROPONENTE),
+        *(proponente2.get(campo) for campo in CAMPOS_PROPONENTE)
+    ))
+    avanzar_estado(cursor, id_proceso, "ETAPA 2")
+    return True
+
+
+# =====================================================
+# CONTRATOS
+# =====================================================
+
+def registrar_contrato(cursor, id_proceso, *, tipo_contrato, supervisor, cdp, fecha_firma):
+    ejecutar(cursor, SQL_INSERTAR_CONTRATO, (
+        id_proceso,
+        tipo_contrato,
+        supervisor,
+        cdp,
+        fecha_firma
+    ))
+    id_contrato = cursor.fetchone()[0]
+    avanzar_estado(cursor, id_proceso, "ETAPA 3")
+    return id_contrato
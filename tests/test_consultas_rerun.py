@@ -0,0 +1,60 @@
+import os
+import re
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+
+# =====================================================
+# PRESUPUESTO DE CONSULTAS POR RERUN
+# =====================================================
+# Corre contra una base de pruebas con al menos un proceso guardado:
+#     DATABASE_URL=postgresql://... python -m pytest tests
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Etapa 1: solo el saldo del rubro; el estado del proceso sale del caché
+CONSULTAS_ETAPA_1 = 1
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="requiere DATABASE_URL")
+
+
+def _consultas(at):
+    for caption in at.caption:
+        coincidencia = re.match(r"Consultas a la base de datos en esta ejecución: (\d+)", caption.value)
+        if coincidencia:
+            return int(coincidencia.group(1))
+    raise AssertionError("La página no mostró el contador de consultas.")
+
+
+def _boton(at, etiqueta):
+    for boton in at.button:
+        if boton.label == etiqueta:
+            return boton
+    return None
+
+
+def test_rerun_de_proceso_cargado():
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["DATABASE_URL"] = DATABASE_URL
+    at.run()
+
+    _boton(at, "📁 Proceso").click()
+    at.run()
+
+    cargar = _boton(at, "CARGAR PROCESO")
+    if cargar is None:
+        pytest.skip("La base de pruebas no tiene procesos.")
+    cargar.click()
+    at.run()
+
+    at.run()
+    assert not at.exception
+    assert _consultas(at) <= CONSULTAS_ETAPA_1
+
+    for etapa in ("2 Planeación", "3 Contratación"):
+        at.radio(key="radio_etapas").set_value(etapa)
+        at.run()
+        assert not at.exception
+        assert _consultas(at) == 0